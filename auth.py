@@ -1,19 +1,527 @@
-"""Authentication module with a known bug."""
+"""Authentication module."""
 
+import asyncio
+import base64
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from time import perf_counter_ns
 
-def authenticate(username, password):
-    """Authenticate a user.
+import passwords
+from bounded_executor import BoundedExecutor
+from rehash import Rehasher
+from sessions import SessionStore
+from throttle import ThrottledError
+from tokens import TokenKeyring
+from user_store import UserStore
 
-    BUG: This function always returns True regardless of credentials.
-    It should validate the username and password properly.
+_SEED_USERS = (
+    {"id": 1, "name": "alice", "email": "alice@example.com"},
+    {"id": 2, "name": "bob", "email": "bob@example.com"},
+)
+
+_store = UserStore(_SEED_USERS)
+_hasher = passwords.default_hasher()
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+_async_executor = None
+_verify_cache = None
+_throttle = None
+_rehasher = Rehasher()
+_token_keyring = TokenKeyring()
+_sessions = None
+_latency = None
+_CURSOR = struct.Struct(">q")
+
+
+def get_store():
+    """Return the user backend the module reads from."""
+    return _store
+
+
+def set_store(store):
+    """Replace the user backend (any ``backends.UserBackend``).
+
+    In-flight calls finish on the old one.
     """
-    return True
+    global _store
+    _store = store
 
 
-def get_user(user_id):
-    """Get user by ID."""
-    users = {
-        1: {"id": 1, "name": "alice", "email": "alice@example.com"},
-        2: {"id": 2, "name": "bob", "email": "bob@example.com"},
+def get_hasher():
+    """Return the hasher used for new password hashes."""
+    return _hasher
+
+
+def set_hasher(hasher):
+    """Hash new passwords with ``hasher``; existing hashes stay verifiable."""
+    global _hasher
+    _hasher = hasher
+
+
+def set_verify_cache(cache):
+    """Consult ``cache`` (a VerifyCache, or None to disable) before hashing."""
+    global _verify_cache
+    _verify_cache = cache
+
+
+def set_throttle(throttle):
+    """Rate-limit logins with ``throttle`` (a Throttle, or None to disable)."""
+    global _throttle
+    _throttle = throttle
+
+
+def set_rehasher(rehasher):
+    """Upgrade outdated hashes with ``rehasher`` (a Rehasher, or None to stop)."""
+    global _rehasher
+    _rehasher = rehasher
+
+
+def rehash_stats():
+    """Return upgrade counters and how many stored hashes are outdated."""
+    stats = {} if _rehasher is None else _rehasher.stats()
+    specs = _store.hash_specs()
+    current = _hasher.spec
+    stats["outdated"] = sum(n for spec, n in specs.items() if spec != current)
+    stats["by_spec"] = dict(specs)
+    return stats
+
+
+def stats():
+    """Return the verify-cache and throttle counters, None where disabled."""
+    cache, throttle = _verify_cache, _throttle
+    return {
+        "verify_cache": None if cache is None else cache.stats(),
+        "throttle_rejections": None if throttle is None else throttle.rejections,
     }
-    return users.get(user_id)
+
+
+def get_latency():
+    """Return the LatencyRecorder in use, or None while recording is off."""
+    return _latency
+
+
+def set_latency(recorder):
+    """Record per-call latencies in ``recorder`` (a LatencyRecorder, or None).
+
+    While disabled, which is the default, each entry point pays one global
+    lookup for the check.
+    """
+    global _latency
+    _latency = recorder
+
+
+def latency_stats(reset=False):
+    """Return ``{name: HistogramSnapshot}`` of the recorded latencies.
+
+    Names are the entry points plus the login phases ``authenticate.lookup``,
+    ``authenticate.cache`` and ``authenticate.hash`` (KDF and constant-time
+    compare); rejected logins are also recorded as ``authenticate.failed``.
+    ``reset`` starts the next interval from zero.
+    """
+    recorder = _latency
+    return {} if recorder is None else recorder.snapshot(reset)
+
+
+def set_password(user_id, password):
+    """Store a salted hash of ``password`` for ``user_id``."""
+    store = _store
+    store.set_password_hash(user_id, _hasher.hash(password))
+    cache = _verify_cache
+    if cache is not None:
+        cache.invalidate(store.get(user_id)["name"])
+
+
+def authenticate(username, password, *, source=None):
+    """Return True if ``password`` is correct for ``username``.
+
+    Unknown users and users without a password still pay for one hash, so
+    response time does not reveal which usernames exist. With a throttle
+    installed, attempts over the limit for ``username`` or ``source`` raise
+    ThrottledError before any hashing.
+
+    A successful login whose stored hash uses outdated parameters queues a
+    background rehash with the current hasher.
+    """
+    latency = _latency
+    if latency is None:
+        _check_throttle(username, source)
+        return _verify(_store, _hasher, username, password)
+    start = perf_counter_ns()
+    _check_throttle(username, source)
+    ok = _verify(_store, _hasher, username, password, latency)
+    _record_login(latency, "authenticate", perf_counter_ns() - start, ok)
+    return ok
+
+
+def authenticate_many(pairs, *, executor=None):
+    """Authenticate ``(username, password)`` pairs; results keep input order.
+
+    The hashing fans out over ``executor``, by default a shared thread pool
+    with one worker per core: hashlib releases the GIL while it hashes, so
+    threads scale across cores. A ProcessPoolExecutor works as well.
+    Pairs rejected by the throttle come back False without being hashed.
+    """
+    latency = _latency
+    if latency is None:
+        return _authenticate_many(pairs, executor)
+    start = perf_counter_ns()
+    results = _authenticate_many(pairs, executor)
+    latency.record("authenticate_many", perf_counter_ns() - start)
+    return results
+
+
+def issue_token(user_id, ttl=3600):
+    """Return a signed session token for ``user_id`` valid for ``ttl`` seconds."""
+    return _token_keyring.issue(user_id, ttl)
+
+
+def verify_token(token):
+    """Return the user id a token was issued for, or None.
+
+    Checks only the signature and expiry: no store lookup and no KDF.
+    """
+    latency = _latency
+    if latency is None:
+        return _token_keyring.verify(token)
+    start = perf_counter_ns()
+    user_id = _token_keyring.verify(token)
+    latency.record("verify_token", perf_counter_ns() - start)
+    return user_id
+
+
+def set_token_keyring(keyring):
+    """Sign and verify tokens with ``keyring``.
+
+    The default keyring holds one random key, so tokens do not survive a
+    restart or work across processes until a shared keyring is installed.
+    """
+    global _token_keyring
+    _token_keyring = keyring
+
+
+def create_session(user_id, ttl=None, data=None):
+    """Start a revocable server-side session for an existing user."""
+    if _store.get(user_id) is None:
+        raise KeyError(user_id)
+    return _get_sessions().create(user_id, ttl, data)
+
+
+def get_session(session_id):
+    """Return the live Session for ``session_id``, or None."""
+    return _get_sessions().get(session_id)
+
+
+def revoke_session(session_id):
+    """End one session; return False if it did not exist."""
+    return _get_sessions().revoke(session_id)
+
+
+def revoke_user_sessions(user_id):
+    """End every session of ``user_id``; return how many were ended."""
+    return _get_sessions().revoke_user(user_id)
+
+
+def set_session_store(sessions):
+    """Keep server-side sessions in ``sessions`` (a SessionStore)."""
+    global _sessions
+    _sessions = sessions
+
+
+async def authenticate_async(username, password, *, source=None, timeout=None):
+    """Asyncio variant of ``authenticate``.
+
+    The throttle is checked on the event loop; the user lookup and the
+    hash run together as one job on the bounded async executor, so the
+    loop never waits on the store. Raises BusyError when the executor
+    queue is full and TimeoutError after ``timeout`` seconds. Cancelling
+    the caller drops the job if it has not started yet.
+    """
+    latency = _latency
+    start = perf_counter_ns()
+    _check_throttle(username, source)
+    ok = await _run_async(
+        timeout, _verify, _store, _hasher, username, password, latency
+    )
+    if latency is not None:
+        _record_login(latency, "authenticate_async", perf_counter_ns() - start, ok)
+    return ok
+
+
+async def get_user_async(user_id, *, timeout=None):
+    """Asyncio variant of ``get_user``, run on the bounded async executor.
+
+    A store with its own ``get_async`` (a ``read_cache.CachedBackend``)
+    answers cache hits without leaving the event loop and sends only
+    misses to the executor.
+    """
+    store = _store
+    get_async = getattr(store, "get_async", None)
+    if get_async is None:
+        return await _run_async(timeout, store.get, user_id)
+    return await asyncio.wait_for(get_async(user_id, submit=_submit_async), timeout)
+
+
+async def get_users_async(user_ids, missing="none", *, timeout=None):
+    """Asyncio variant of ``get_users``: one ``get_many`` on the bounded
+    async executor. ``batch_loader.UserLoader`` builds these batches out
+    of concurrent single-id lookups."""
+    return await _run_async(timeout, _store.get_many, list(user_ids), missing)
+
+
+def set_async_executor(executor):
+    """Use ``executor`` (a BoundedExecutor) for the ``*_async`` entry points."""
+    global _async_executor
+    _async_executor = executor
+
+
+async def _run_async(timeout, fn, *args):
+    future = asyncio.wrap_future(_submit_async(fn, *args))
+    return await asyncio.wait_for(future, timeout)
+
+
+def _submit_async(fn, *args):
+    executor = _async_executor
+    if executor is None:
+        with _hash_pool_lock:
+            if _async_executor is None:
+                set_async_executor(BoundedExecutor())
+            executor = _async_executor
+    return executor.submit(fn, *args)
+
+
+def _authenticate_many(pairs, executor):
+    hasher, store, throttle = _hasher, _store, _throttle
+    results = []
+    pending = []
+    for username, password in pairs:
+        if throttle is not None and not throttle.allow(username):
+            results.append(False)
+            continue
+        user_id, encoded, hit = _lookup(store, username, password)
+        if hit:
+            results.append(True)
+        else:
+            pending.append((len(results), user_id, username, password, encoded))
+            results.append(None)
+    if not pending:
+        return results
+    _, _, _, given, stored = zip(*pending)
+    if len(pending) == 1:
+        verdicts = map(_check, repeat(hasher), given, stored)
+    else:
+        executor = executor or _get_hash_pool()
+        verdicts = executor.map(_check, repeat(hasher), given, stored)
+    for (index, user_id, username, password, encoded), ok in zip(pending, verdicts):
+        results[index] = ok
+        if ok:
+            _accepted(store, user_id, username, password, encoded)
+    return results
+
+
+def _verify(store, hasher, username, password, latency=None):
+    # The login flow behind authenticate and authenticate_async: look the
+    # user up, try the verify cache, else run the KDF, and remember a
+    # success. ``_authenticate_many`` runs the same steps, with the KDFs
+    # of a batch fanned out. ``latency`` also records each phase.
+    user_id, encoded, hit = _lookup(store, username, password, latency)
+    if hit:
+        return True
+    if latency is None:
+        ok = _check(hasher, password, encoded)
+    else:
+        start = perf_counter_ns()
+        ok = _check(hasher, password, encoded)
+        latency.record("authenticate.hash", perf_counter_ns() - start)
+    if ok:
+        _accepted(store, user_id, username, password, encoded)
+    return ok
+
+
+def _lookup(store, username, password, latency=None):
+    # The stored credentials, and whether the verify cache vouches for them.
+    if latency is None:
+        user_id, encoded = _credentials(store, username)
+        return user_id, encoded, _cache_hit(username, password, encoded)
+    start = perf_counter_ns()
+    user_id, encoded = _credentials(store, username)
+    looked_up = perf_counter_ns()
+    hit = _cache_hit(username, password, encoded)
+    latency.record("authenticate.lookup", looked_up - start)
+    latency.record("authenticate.cache", perf_counter_ns() - looked_up)
+    return user_id, encoded, hit
+
+
+def _record_login(latency, name, elapsed, ok):
+    latency.record(name, elapsed)
+    if not ok:
+        latency.record("authenticate.failed", elapsed)
+
+
+def _check_throttle(username, source):
+    throttle = _throttle
+    if throttle is not None and not throttle.allow(username, source):
+        raise ThrottledError(f"too many login attempts for {username!r}")
+
+
+def _credentials(store, username):
+    user = store.get_by_name(username)
+    if user is None:
+        return None, None
+    return user.id, store.password_hash(user.id)
+
+
+def _cache_hit(username, password, encoded):
+    cache = _verify_cache
+    return (
+        cache is not None
+        and encoded is not None
+        and cache.check(username, password, encoded)
+    )
+
+
+def _accepted(store, user_id, username, password, encoded):
+    cache = _verify_cache
+    if cache is not None:
+        cache.add(username, password, encoded)
+    hasher, rehasher = _hasher, _rehasher
+    if rehasher is not None and passwords.spec_of(encoded) != hasher.spec:
+        rehasher.schedule(store, hasher, user_id, password, encoded)
+
+
+def _check(hasher, password, encoded):
+    if encoded is None:
+        return hasher.dummy_verify(password)
+    return passwords.verify(password, encoded)
+
+
+def _encode_cursor(user_id):
+    data = base64.urlsafe_b64encode(_CURSOR.pack(user_id)).rstrip(b"=")
+    return "u1." + data.decode("ascii")
+
+
+def _decode_cursor(cursor):
+    version, _, data = cursor.partition(".")
+    try:
+        if version != "u1":
+            raise ValueError
+        packed = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+        return _CURSOR.unpack(packed)[0]
+    except (ValueError, struct.error):
+        raise ValueError(f"invalid cursor {cursor!r}") from None
+
+
+def _get_sessions():
+    if _sessions is None:
+        with _hash_pool_lock:
+            if _sessions is None:
+                set_session_store(SessionStore())
+    return _sessions
+
+
+def _get_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1, thread_name_prefix="auth-hash"
+                )
+    return _hash_pool
+
+
+def get_user(user_id):
+    """Get user by ID.
+
+    The returned record is a read-only mapping shared with the store.
+    """
+    latency = _latency
+    if latency is None:
+        return _store.get(user_id)
+    start = perf_counter_ns()
+    user = _store.get(user_id)
+    latency.record("get_user", perf_counter_ns() - start)
+    return user
+
+
+def get_user_by_name(name):
+    """Get user by name, or None."""
+    latency = _latency
+    if latency is None:
+        return _store.get_by_name(name)
+    start = perf_counter_ns()
+    user = _store.get_by_name(name)
+    latency.record("get_user_by_name", perf_counter_ns() - start)
+    return user
+
+
+def get_user_by_email(email):
+    """Get user by email, or None.
+
+    Addresses match after NFKC normalisation and case folding.
+    """
+    latency = _latency
+    if latency is None:
+        return _store.get_by_email(email)
+    start = perf_counter_ns()
+    user = _store.get_by_email(email)
+    latency.record("get_user_by_email", perf_counter_ns() - start)
+    return user
+
+
+def iter_users(after_id=None, batch_size=1000, *, cursor=None):
+    """Yield every user in ascending id order, ``batch_size`` at a time.
+
+    Pages are keyset queries (ids above the last one seen), so memory holds
+    one page and a page deep into the scan costs the same as the first.
+    Writes during the scan never shift a page: every user present for the
+    whole scan is yielded exactly once, and users added or removed
+    meanwhile may or may not be. The scan stays on the store current when
+    it started, so on an immutable store (a frozen UserStore, a
+    SnapshotStore) it is one point-in-time view even across ``set_store``.
+
+    Start after ``after_id``, or after the page a ``cursor`` from
+    ``iter_user_pages`` came with.
+    """
+    for users, _ in iter_user_pages(after_id, batch_size, cursor=cursor):
+        yield from users
+
+
+def iter_user_pages(after_id=None, batch_size=1000, *, cursor=None):
+    """Like ``iter_users``, but yield ``(users, cursor)`` per page.
+
+    The cursor is an opaque string; pass it back as ``cursor=`` to resume
+    after that page, in this process or another.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    if cursor is not None:
+        if after_id is not None:
+            raise ValueError("pass after_id or cursor, not both")
+        after_id = _decode_cursor(cursor)
+    store = _store
+    while True:
+        users = store.scan(after_id, batch_size)
+        if not users:
+            return
+        after_id = users[-1].id
+        yield users, _encode_cursor(after_id)
+        if len(users) < batch_size:
+            return
+
+
+def get_users(user_ids, missing="none"):
+    """Get users for an iterable of IDs, in input order.
+
+    ``missing`` is ``"none"`` (None for unknown ids), ``"skip"`` or
+    ``"raise"`` (KeyError).
+    """
+    latency = _latency
+    if latency is None:
+        return _store.get_many(user_ids, missing)
+    start = perf_counter_ns()
+    users = _store.get_many(user_ids, missing)
+    latency.record("get_users", perf_counter_ns() - start)
+    return users
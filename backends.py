@@ -0,0 +1,332 @@
+"""Storage backends behind auth.get_user and auth.authenticate."""
+
+import queue
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Protocol, runtime_checkable
+
+from passwords import spec_of
+from user_store import User, normalize_email, resolve_many
+
+
+@runtime_checkable
+class UserBackend(Protocol):
+    """What the auth module needs from a user store.
+
+    Records are ``user_store.User`` objects. ``user_store.UserStore`` is
+    the in-memory implementation.
+    """
+
+    def __len__(self): ...
+
+    def __contains__(self, user_id): ...
+
+    def __iter__(self):
+        """Yield every user."""
+
+    def get(self, user_id):
+        """Return the user with ``user_id``, or None."""
+
+    def get_many(self, user_ids, missing="none"):
+        """Return the users for ``user_ids`` in input order."""
+
+    def scan(self, after_id, limit):
+        """Return up to ``limit`` users with ids above ``after_id`` (None for
+        the start), in ascending id order; fewer only at the end."""
+
+    def get_by_name(self, name):
+        """Return the user called ``name``, or None."""
+
+    def get_by_email(self, email):
+        """Return the user with ``email``, or None."""
+
+    def add(self, user):
+        """Insert ``user``; raise ValueError if its id, name or email is taken."""
+
+    def add_many(self, users):
+        """Insert a batch of users, all or none; ValueError on a duplicate.
+
+        A mapping with a ``password_hash`` key has that hash stored too.
+        """
+
+    def remove(self, user_id):
+        """Delete and return the user with ``user_id``; KeyError if absent."""
+
+    def password_hash(self, user_id):
+        """Return the encoded password hash of ``user_id``, or None."""
+
+    def set_password_hash(self, user_id, encoded):
+        """Store the password hash of ``user_id``; KeyError if absent."""
+
+    def replace_password_hash(self, user_id, old, new):
+        """Swap the hash of ``user_id`` from ``old`` to ``new``; False if it
+        is no longer ``old``.
+        """
+
+    def hash_specs(self):
+        """Return a mapping of hasher spec to the number of hashes using it."""
+
+
+class SQLiteBackend:
+    """User backend on a sqlite3 database.
+
+    Connections come from a fixed-size pool and run in WAL mode, so readers
+    do not block behind the writer. Every query is a constant SQL string,
+    which keeps it in sqlite3's per-connection prepared-statement cache.
+    ``name`` and ``email_key`` (the normalised email) each have a covering
+    index that carries the other record columns, so lookups by either never
+    touch the table (the UNIQUE indexes only enforce uniqueness); ``id`` is
+    the rowid and needs no index of its own. Every write that changes a
+    password hash also adjusts a per-spec count in the ``hash_specs``
+    table, in the same transaction, so ``hash_specs()`` reads a few rows
+    instead of grouping the whole table.
+
+    ``path=":memory:"`` opens a private shared-cache in-memory database.
+    """
+
+    _COLUMNS = "id, name, email"
+    _BATCH = 256
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS users ("
+        " id INTEGER PRIMARY KEY,"
+        " name TEXT NOT NULL UNIQUE,"
+        " email TEXT NOT NULL,"
+        " email_key TEXT NOT NULL UNIQUE,"
+        " password_hash TEXT,"
+        " hash_spec TEXT)",
+        "CREATE INDEX IF NOT EXISTS users_name_email ON users (name, email)",
+        "CREATE INDEX IF NOT EXISTS users_email_key ON users (email_key, name, email)",
+        "CREATE TABLE IF NOT EXISTS hash_specs ("
+        " spec TEXT PRIMARY KEY,"
+        " count INTEGER NOT NULL)",
+    )
+    # Fills hash_specs for a database written before it existed.
+    _BACKFILL_SPECS = (
+        "INSERT INTO hash_specs SELECT hash_spec, COUNT(*) FROM users"
+        " WHERE hash_spec IS NOT NULL GROUP BY hash_spec"
+    )
+    _GET = f"SELECT {_COLUMNS} FROM users WHERE id = ?"
+    _GET_BATCH = (
+        f"SELECT {_COLUMNS} FROM users WHERE id IN ({', '.join('?' * _BATCH)})"
+    )
+    _GET_BY_NAME = (
+        f"SELECT {_COLUMNS} FROM users INDEXED BY users_name_email WHERE name = ?"
+    )
+    _GET_BY_EMAIL = (
+        f"SELECT {_COLUMNS} FROM users INDEXED BY users_email_key WHERE email_key = ?"
+    )
+    _SCAN = f"SELECT {_COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?"
+    _SCAN_FIRST = f"SELECT {_COLUMNS} FROM users ORDER BY id LIMIT ?"
+    _COUNT_SPEC = (
+        "INSERT INTO hash_specs VALUES (?, ?)"
+        " ON CONFLICT (spec) DO UPDATE SET count = count + excluded.count"
+    )
+    _INSERT = (
+        "INSERT INTO users (id, name, email, email_key, password_hash, hash_spec)"
+        " VALUES (?, ?, ?, ?, ?, ?)"
+    )
+
+    def __init__(self, path, *, pool_size=4):
+        if path == ":memory:":
+            path = f"file:auth-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        self._connections = [self._connect() for _ in range(pool_size)]
+        for connection in self._connections:
+            self._pool.put(connection)
+        with self._writer() as db:
+            new = not db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'hash_specs'"
+            ).fetchone()
+            for statement in self._SCHEMA:
+                db.execute(statement)
+            if new:
+                db.execute(self._BACKFILL_SPECS)
+
+    def __len__(self):
+        with self._connection() as db:
+            return db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __iter__(self):
+        after = None
+        while True:
+            users = self.scan(after, self._BATCH)
+            yield from users
+            if len(users) < self._BATCH:
+                return
+            after = users[-1].id
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+    def get(self, user_id):
+        with self._connection() as db:
+            return _user(db.execute(self._GET, (user_id,)).fetchone())
+
+    def get_many(self, user_ids, missing="none"):
+        user_ids = list(user_ids)
+        wanted = list(dict.fromkeys(user_ids))
+        found = {}
+        with self._connection() as db:
+            for start in range(0, len(wanted), self._BATCH):
+                chunk = wanted[start : start + self._BATCH]
+                # Pad to the fixed batch width so the statement stays cached.
+                chunk += [None] * (self._BATCH - len(chunk))
+                for row in db.execute(self._GET_BATCH, chunk):
+                    found[row[0]] = User(*row)
+        return resolve_many(found, user_ids, missing)
+
+    def scan(self, after_id, limit):
+        with self._connection() as db:
+            if after_id is None:
+                rows = db.execute(self._SCAN_FIRST, (limit,)).fetchall()
+            else:
+                rows = db.execute(self._SCAN, (after_id, limit)).fetchall()
+        return [User(*row) for row in rows]
+
+    def get_by_name(self, name):
+        with self._connection() as db:
+            return _user(db.execute(self._GET_BY_NAME, (name,)).fetchone())
+
+    def get_by_email(self, email):
+        with self._connection() as db:
+            row = db.execute(self._GET_BY_EMAIL, (normalize_email(email),)).fetchone()
+        return _user(row)
+
+    def add(self, user):
+        user = User.from_mapping(user)
+        self.add_many((user,))
+        return user
+
+    def add_many(self, users):
+        rows = list(map(_insert_row, users))
+        with self._writer() as db:
+            try:
+                db.executemany(self._INSERT, rows)
+            except sqlite3.IntegrityError as exc:
+                raise ValueError(str(exc)) from exc
+            _count_specs(db, Counter(row[5] for row in rows))
+
+    def remove(self, user_id):
+        with self._writer() as db:
+            row = db.execute(
+                f"SELECT {self._COLUMNS}, hash_spec FROM users WHERE id = ?",
+                (user_id,),
+            ).fetchone()
+            if row is None:
+                raise KeyError(user_id)
+            db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            _count_specs(db, {row[3]: -1})
+        return User(*row[:3])
+
+    def password_hash(self, user_id):
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT password_hash FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_password_hash(self, user_id, encoded):
+        with self._writer() as db:
+            row = db.execute(
+                "SELECT hash_spec FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(user_id)
+            db.execute(
+                "UPDATE users SET password_hash = ?, hash_spec = ? WHERE id = ?",
+                (encoded, _spec(encoded), user_id),
+            )
+            _count_specs(db, _moved(row[0], _spec(encoded)))
+
+    def replace_password_hash(self, user_id, old, new):
+        with self._writer() as db:
+            cursor = db.execute(
+                "UPDATE users SET password_hash = ?, hash_spec = ?"
+                " WHERE id = ? AND password_hash IS ?",
+                (new, _spec(new), user_id, old),
+            )
+            if cursor.rowcount != 1:
+                return False
+            _count_specs(db, _moved(_spec(old), _spec(new)))
+            return True
+
+    def hash_specs(self):
+        with self._connection() as db:
+            rows = db.execute(
+                "SELECT spec, count FROM hash_specs WHERE count > 0"
+            ).fetchall()
+        return dict(rows)
+
+    def _connect(self):
+        db = sqlite3.connect(
+            self.path,
+            uri=self.path.startswith("file:"),
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256,
+        )
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        return db
+
+    @contextmanager
+    def _connection(self):
+        db = self._pool.get()
+        try:
+            yield db
+        finally:
+            self._pool.put(db)
+
+    @contextmanager
+    def _writer(self):
+        with self._write_lock, self._connection() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+
+def _count_specs(db, deltas):
+    db.executemany(
+        SQLiteBackend._COUNT_SPEC,
+        [(spec, n) for spec, n in deltas.items() if spec is not None and n],
+    )
+
+
+def _moved(old, new):
+    deltas = Counter({new: 1})
+    deltas[old] -= 1
+    return deltas
+
+
+def _spec(encoded):
+    return None if encoded is None else spec_of(encoded)
+
+
+def _insert_row(user):
+    email = user["email"]
+    encoded = user.get("password_hash") or None
+    return (
+        user["id"],
+        user["name"],
+        email,
+        normalize_email(email),
+        encoded,
+        _spec(encoded),
+    )
+
+
+def _user(row):
+    return None if row is None else User(*row)
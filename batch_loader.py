@@ -0,0 +1,108 @@
+"""DataLoader-style micro-batching of single-user lookups on an event loop."""
+
+import asyncio
+
+import auth
+
+
+class _Batch:
+    """Lookups collected on one event loop and not yet dispatched."""
+
+    __slots__ = ("loop", "waiters", "handle")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.waiters = []
+        self.handle = None
+
+
+class UserLoader:
+    """Turns concurrent ``load(user_id)`` calls into batched lookups.
+
+    Calls made on one event loop are collected and resolved with a single
+    ``fetch_many(ids)`` call, a coroutine function returning the users for
+    ``ids`` in order (None for unknown ids). The default is
+    ``auth.get_users_async``: one ``get_many`` on the current store, run
+    on the bounded async executor, which against SQLite is one query.
+
+    With ``window=0`` a batch holds the calls made in the same event-loop
+    tick, so handlers started together (by ``gather``, or by one read of
+    a socket) share a round trip at no added latency. A positive
+    ``window``, in seconds, holds the batch open that long after its first
+    call to catch stragglers; a batch reaching ``max_batch`` ids is sent
+    at once. Repeated ids are fetched once.
+
+    Every caller waits on its own future, so cancelling one caller leaves
+    the rest of its batch alone. An exception from ``fetch_many`` goes to
+    every caller in the batch. The loader caches nothing; put a
+    ``read_cache.CachedBackend`` under it for that.
+    """
+
+    def __init__(self, fetch_many=None, *, window=0.0, max_batch=1000):
+        self.fetch_many = fetch_many or auth.get_users_async
+        self.window = window
+        self.max_batch = max_batch
+        self.loads = 0
+        self.batches = 0
+        self._batch = None
+        self._tasks = set()
+
+    async def load(self, user_id):
+        """Return the user with ``user_id``, or None."""
+        loop = asyncio.get_running_loop()
+        batch = self._batch
+        if batch is None or batch.loop is not loop:
+            batch = self._batch = _Batch(loop)
+            if self.window > 0:
+                batch.handle = loop.call_later(self.window, self._dispatch, batch)
+            else:
+                batch.handle = loop.call_soon(self._dispatch, batch)
+        future = loop.create_future()
+        batch.waiters.append((user_id, future))
+        self.loads += 1
+        if len(batch.waiters) >= self.max_batch:
+            batch.handle.cancel()
+            self._dispatch(batch)
+        return await future
+
+    async def load_many(self, user_ids):
+        """Return the users for ``user_ids`` in order, None for unknown ids.
+
+        The ids join the current batch like separate ``load`` calls.
+        """
+        return await asyncio.gather(*(self.load(user_id) for user_id in user_ids))
+
+    def stats(self):
+        """Return the load and batch counters."""
+        return {
+            "loads": self.loads,
+            "batches": self.batches,
+            "mean_batch": self.loads / self.batches if self.batches else 0.0,
+        }
+
+    def _dispatch(self, batch):
+        if self._batch is batch:
+            self._batch = None
+        waiters = [(u, f) for u, f in batch.waiters if not f.done()]
+        if waiters:
+            self.batches += 1
+            task = batch.loop.create_task(self._resolve(waiters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, waiters):
+        ids = list(dict.fromkeys(user_id for user_id, _ in waiters))
+        try:
+            users = dict(zip(ids, await self.fetch_many(ids)))
+        except Exception as exc:
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        except BaseException:
+            for _, future in waiters:
+                future.cancel()
+            raise
+        for user_id, future in waiters:
+            if not future.done():
+                future.set_result(users[user_id])
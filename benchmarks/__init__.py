@@ -0,0 +1,5 @@
+"""Benchmarks for the auth module.
+
+Run one from the repository root with ``python -m benchmarks.<name>``, or
+the whole scenario suite, reported as JSON, with ``python -m benchmarks``.
+"""
@@ -0,0 +1,62 @@
+"""Helpers shared by the benchmark scripts."""
+
+import time
+import timeit
+import tracemalloc
+
+
+def calls_per_sec(fn, *, number=100_000, repeat=5):
+    """Return the best observed call rate of ``fn``."""
+    return number / min(timeit.repeat(fn, number=number, repeat=repeat))
+
+
+def alloc_bytes_per_call(fn, *, samples=200):
+    """Return the mean peak bytes allocated while ``fn`` runs once.
+
+    Objects served from CPython's free lists bypass tracemalloc, so this is
+    a lower bound on allocator traffic.
+    """
+    fn()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn()
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / samples
+
+
+def latencies_ns(fn, samples):
+    """Return the sorted wall-clock durations of ``samples`` calls of ``fn``."""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+    return timings
+
+
+def percentile(sorted_values, q):
+    """Return the ``q`` quantile (0..1) of already sorted values."""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def print_table(headers, rows):
+    """Print ``rows`` as a left-aligned text table."""
+    cells = [list(map(str, headers))] + [[_fmt(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for row in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
@@ -0,0 +1,99 @@
+"""Load test: event-loop lag under concurrent async logins.
+
+A ticker task asks to wake every millisecond and records how late it
+actually wakes. Blocking ``authenticate`` calls stall the loop for a full
+KDF each; ``authenticate_async`` should keep the lag near the tick.
+"""
+
+import argparse
+import asyncio
+import time
+
+import auth
+import passwords
+from benchmarks._util import percentile, print_table
+from bounded_executor import BoundedExecutor, BusyError
+
+TICK = 0.001
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(login, clients, logins_per_client):
+    lags, latencies, rejected = [], [], 0
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+
+    async def client():
+        nonlocal rejected
+        for _ in range(logins_per_client):
+            start = time.perf_counter()
+            try:
+                await login("alice", "correct horse")
+            except BusyError:
+                rejected += 1
+                await asyncio.sleep(0.01)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    lags.sort()
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        rejected,
+        percentile(lags, 0.5) * 1e3,
+        percentile(lags, 0.99) * 1e3,
+        lags[-1] * 1e3,
+        percentile(latencies, 0.99) * 1e3,
+    )
+
+
+async def blocking_login(username, password):
+    return auth.authenticate(username, password)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=4, help="per client")
+    parser.add_argument("--spec", default="pbkdf2_sha256$i=20000")
+    parser.add_argument("--max-pending", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    auth.set_hasher(passwords.hasher_from_spec(args.spec))
+    auth.set_password(1, "correct horse")
+    auth.set_async_executor(BoundedExecutor(max_pending=args.max_pending))
+    rows = []
+    for label, login in (
+        ("blocking authenticate", blocking_login),
+        ("authenticate_async", auth.authenticate_async),
+    ):
+        stats = asyncio.run(run(login, args.clients, args.logins))
+        rows.append((label,) + stats)
+    print(f"{args.clients} clients x {args.logins} logins, {args.spec}")
+    print_table(
+        (
+            "mode",
+            "logins/s",
+            "rejected",
+            "lag p50 ms",
+            "lag p99 ms",
+            "lag max ms",
+            "login p99 ms",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Measure authenticate latency per hasher and outcome.
+
+Known-good, wrong-password and unknown-user logins should cost the same;
+a gap between them is a timing oracle.
+"""
+
+import argparse
+
+import auth
+import passwords
+from benchmarks._util import latencies_ns, percentile, print_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument(
+        "--spec",
+        action="append",
+        help="hasher spec to measure (repeatable)",
+    )
+    args = parser.parse_args(argv)
+    specs = args.spec or ["pbkdf2_sha256$i=100000", "scrypt$n=16384,r=8,p=1"]
+
+    rows = []
+    for spec in specs:
+        auth.set_hasher(passwords.hasher_from_spec(spec))
+        auth.set_password(1, "correct horse")
+        cases = (
+            ("success", lambda: auth.authenticate("alice", "correct horse")),
+            ("wrong password", lambda: auth.authenticate("alice", "battery")),
+            ("unknown user", lambda: auth.authenticate("mallory", "battery")),
+        )
+        for label, fn in cases:
+            timings = latencies_ns(fn, args.samples)
+            p50, p99 = percentile(timings, 0.5) / 1e6, percentile(timings, 0.99) / 1e6
+            rows.append((spec, label, p50, p99, 1000 / p50))
+    print_table(("hasher", "outcome", "p50 ms", "p99 ms", "logins/s/core"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare authenticate_many with sequential authenticate calls."""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import auth
+import passwords
+from benchmarks._util import print_table
+
+
+def row(label, batch, elapsed, sequential):
+    return label, elapsed * 1e3, batch / elapsed, sequential / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--spec", default="pbkdf2_sha256$i=20000")
+    args = parser.parse_args(argv)
+
+    auth.set_hasher(passwords.hasher_from_spec(args.spec))
+    auth.set_password(1, "correct horse")
+    pairs = [
+        [("alice", "correct horse"), ("alice", "battery"), ("mallory", "staple")][i % 3]
+        for i in range(args.batch)
+    ]
+
+    start = time.perf_counter()
+    expected = [auth.authenticate(username, password) for username, password in pairs]
+    sequential = time.perf_counter() - start
+    rows = [row("sequential authenticate", args.batch, sequential, sequential)]
+
+    auth.authenticate_many(pairs[:2])
+    start = time.perf_counter()
+    assert auth.authenticate_many(pairs) == expected
+    rows.append(row("thread pool", args.batch, time.perf_counter() - start, sequential))
+
+    with ProcessPoolExecutor() as pool:
+        auth.authenticate_many(pairs[:2], executor=pool)
+        start = time.perf_counter()
+        assert auth.authenticate_many(pairs, executor=pool) == expected
+        elapsed = time.perf_counter() - start
+    rows.append(row("process pool", args.batch, elapsed, sequential))
+
+    print(f"{args.batch} logins, {args.spec}, {os.cpu_count()} cores")
+    print_table(("mode", "batch ms", "logins/s", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare point-lookup latency and memory across user backends.
+
+The default sizes finish in a few minutes; add ``--sizes 10000000`` for
+the 10M-user run if the machine has the memory for the dict store.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import tracemalloc
+
+from backends import SQLiteBackend
+from benchmarks._util import latencies_ns, percentile, print_table
+from user_store import UserStore
+
+
+def users(count):
+    return (
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    )
+
+
+def lookup_stats(backend, size, samples):
+    rng = random.Random(0)
+    ids = [rng.randrange(size) for _ in range(samples)]
+    it = iter(ids)
+    timings = latencies_ns(lambda: backend.get(next(it)), samples)
+    return percentile(timings, 0.5) / 1e3, percentile(timings, 0.99) / 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--samples", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        tracemalloc.start()
+        store = UserStore(users(size))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rows.append(
+            ("UserStore", size, *lookup_stats(store, size, args.samples), memory / size)
+        )
+        del store
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            backend = SQLiteBackend(path)
+            backend.add_many(users(size))
+            with backend._connection() as db:
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            on_disk = os.path.getsize(path)
+            stats = lookup_stats(backend, size, args.samples)
+            rows.append(("SQLiteBackend", size, *stats, on_disk / size))
+            backend.close()
+    print_table(("backend", "users", "get p50 us", "get p99 us", "bytes/user"), rows)
+    print("bytes/user: traced heap for UserStore, database file for SQLite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare batch_loader.UserLoader with one executor job per get_user call.
+
+``python -m benchmarks.batch_loader [CONCURRENCY]``; the default is 1000.
+That many asyncio tasks look up random users from a 100k-user SQLite
+database in a loop. The table counts backend round trips (``get`` and
+``get_many`` calls) against lookups and shows the latency each task sees.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import auth
+from backends import SQLiteBackend
+from batch_loader import UserLoader
+from benchmarks._util import percentile, print_table
+from bounded_executor import BoundedExecutor
+
+USERS = 100_000
+LOOKUPS = 50_000
+
+
+class CountingBackend:
+    """Forwards to ``backend``, counting ``get`` and ``get_many`` calls."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.round_trips = 0
+
+    def get(self, user_id):
+        self.round_trips += 1
+        return self.backend.get(user_id)
+
+    def get_many(self, user_ids, missing="none"):
+        self.round_trips += 1
+        return self.backend.get_many(user_ids, missing)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+async def run(lookup, concurrency):
+    latencies = []
+    per_task = LOOKUPS // concurrency
+
+    async def client():
+        for _ in range(per_task):
+            user_id = random.randrange(USERS)
+            start = time.perf_counter()
+            await lookup(user_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies), elapsed, latencies
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    auth.set_async_executor(BoundedExecutor(max_workers=4, max_pending=concurrency))
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite = SQLiteBackend(os.path.join(directory, "users.db"))
+        sqlite.add_many(
+            {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+            for i in range(USERS)
+        )
+        backend = CountingBackend(sqlite)
+        auth.set_store(backend)
+        rows = []
+        for label, lookup in (
+            ("get_user_async", auth.get_user_async),
+            ("UserLoader (same tick)", UserLoader().load),
+            ("UserLoader (0.5 ms window)", UserLoader(window=0.0005).load),
+        ):
+            backend.round_trips = 0
+            done, elapsed, latencies = asyncio.run(run(lookup, concurrency))
+            rows.append(
+                (
+                    label,
+                    done / elapsed,
+                    done / backend.round_trips,
+                    percentile(latencies, 0.5) * 1e3,
+                    percentile(latencies, 0.99) * 1e3,
+                )
+            )
+        sqlite.close()
+    print_table(
+        ("lookup", "lookups/s", "lookups/round trip", "p50 ms", "p99 ms"), rows
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measure Bloom filter false-positive rate and lookup throughput."""
+
+import time
+
+from backends import SQLiteBackend
+from benchmarks._util import print_table
+from bloom import BloomFilter, BloomFilteredBackend
+
+USERS = 100_000
+PROBES = 200_000
+
+
+def rate(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return len(keys) / (time.perf_counter() - start)
+
+
+def main():
+    names = [f"user{i}" for i in range(USERS)]
+    strangers = [f"stranger{i}" for i in range(PROBES)]
+    rows = []
+    for fp_rate in (0.1, 0.01, 0.001):
+        bloom = BloomFilter.from_items(names, fp_rate, headroom=1.0)
+        measured = sum(name in bloom for name in strangers) / PROBES
+        rows.append(
+            (
+                fp_rate,
+                measured,
+                bloom.size / USERS,
+                bloom.hashes,
+                rate(bloom.__contains__, strangers),
+            )
+        )
+    print_table(
+        ("target fp", "measured fp", "bits/user", "hashes", "checks/s"),
+        [(f"{t:.3f}", f"{m:.4f}", b, k, r) for t, m, b, k, r in rows],
+    )
+
+    backend = SQLiteBackend(":memory:")
+    backend.add_many(
+        {"id": i, "name": name, "email": f"{name}@example.com"}
+        for i, name in enumerate(names)
+    )
+    unknown = strangers[:20_000]
+    filtered = BloomFilteredBackend(backend)
+    print()
+    print_table(
+        ("unknown-name lookup", "lookups/s"),
+        [
+            ("SQLiteBackend", rate(backend.get_by_name, unknown)),
+            ("BloomFilteredBackend(SQLite)", rate(filtered.get_by_name, unknown)),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Compare get_user against the original per-call dict rebuild."""
+
+import auth
+from benchmarks._util import alloc_bytes_per_call, calls_per_sec, print_table
+
+
+def legacy_get_user(user_id):
+    users = {
+        1: {"id": 1, "name": "alice", "email": "alice@example.com"},
+        2: {"id": 2, "name": "bob", "email": "bob@example.com"},
+    }
+    return users.get(user_id)
+
+
+def main():
+    rows = []
+    cases = (("legacy dict rebuild", legacy_get_user), ("UserStore", auth.get_user))
+    for label, fn in cases:
+        call = lambda: fn(1)  # noqa: E731
+        rows.append((label, calls_per_sec(call), alloc_bytes_per_call(call)))
+    print_table(("get_user", "calls/s", "alloc bytes/call"), rows)
+
+
+if __name__ == "__main__":
+    main()
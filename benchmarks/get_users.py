@@ -0,0 +1,45 @@
+"""Compare get_users against calling get_user in a loop."""
+
+import random
+import time
+
+import auth
+from benchmarks._util import print_table
+from benchmarks.get_user import legacy_get_user
+from user_store import UserStore
+
+STORE_SIZE = 100_000
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    auth.set_store(
+        UserStore(
+            {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+            for i in range(STORE_SIZE)
+        )
+    )
+    rng = random.Random(0)
+    rows = []
+    for size in (1, 100, 10_000, 1_000_000):
+        # About one id in ten is unknown, to exercise the missing-id path.
+        ids = [rng.randrange(STORE_SIZE + STORE_SIZE // 10) for _ in range(size)]
+        repeat = 5 if size < 1_000_000 else 2
+        legacy = best_time(lambda: [legacy_get_user(i) for i in ids], repeat)
+        loop = best_time(lambda: [auth.get_user(i) for i in ids], repeat)
+        batch = best_time(lambda: auth.get_users(ids), repeat)
+        rows.append((size, size / legacy, size / loop, size / batch, loop / batch))
+    headers = ("ids", "legacy loop ids/s", "get_user loop ids/s", "get_users ids/s")
+    print_table(headers + ("speedup",), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measure a bulk import of generated users into an on-disk SQLiteBackend.
+
+``python -m benchmarks.importer [ROWS]``; the default is 10 million rows.
+The CSV is generated row by row into a temporary directory, so neither it
+nor the database has to fit in memory.
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from backends import SQLiteBackend
+from importer import import_users
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "users.csv")
+        start = time.perf_counter()
+        with open(source, "w", encoding="utf-8", newline="") as f:
+            f.write("id,name,email,password_hash\n")
+            for i in range(rows):
+                f.write(f"{i},user{i},user{i}@example.com,\n")
+        print(
+            f"generated {rows:,} rows ({os.path.getsize(source) / 2**20:,.0f} MiB)"
+            f" in {time.perf_counter() - start:.1f}s"
+        )
+
+        store = SQLiteBackend(os.path.join(directory, "users.db"), pool_size=1)
+        report = import_users(store, source, batch_size=50_000)
+        store.close()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"imported {report.imported:,} rows in {report.elapsed:.1f}s:"
+            f" {report.rows_per_sec:,.0f} rows/s, peak RSS {peak:,.0f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
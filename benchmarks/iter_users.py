@@ -0,0 +1,88 @@
+"""Measure a full iter_users scan on each backend.
+
+``python -m benchmarks.iter_users [USERS]``; the default is 10 million.
+The snapshot and SQLite stores are built on disk from a generator, so
+only the in-memory UserStore (capped at 1 million users here) holds the
+table in RAM. The last row scans a mutable UserStore while one user is
+added and one removed per page.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+import auth
+from backends import SQLiteBackend
+from benchmarks._util import print_table
+from snapshot import SnapshotStore, write_snapshot
+from user_store import UserStore
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, "users.snap")
+        write_snapshot(snapshot, _users(count))
+        sqlite = SQLiteBackend(os.path.join(directory, "users.db"), pool_size=1)
+        users = _users(count)
+        while batch := list(islice(users, 100_000)):
+            sqlite.add_many(batch)
+
+        in_memory = min(count, 1_000_000)
+        stores = [
+            (f"UserStore ({in_memory:,})", UserStore(_users(in_memory))),
+            (f"SnapshotStore ({count:,})", SnapshotStore(snapshot)),
+            (f"SQLiteBackend ({count:,})", sqlite),
+        ]
+        rows = []
+        for label, store in stores:
+            auth.set_store(store)
+            start = time.perf_counter()
+            scanned = sum(1 for _ in auth.iter_users(batch_size=1000))
+            elapsed = time.perf_counter() - start
+            rows.append((label, scanned / elapsed, elapsed, _heap_peak_kib()))
+        sqlite.close()
+    store = UserStore(_users(in_memory), frozen=False)
+    auth.set_store(store)
+    start = time.perf_counter()
+    scanned = _scan_while_writing(store)
+    elapsed = time.perf_counter() - start
+    rows.append(
+        (f"UserStore + writes ({in_memory:,})", scanned / elapsed, elapsed, "-")
+    )
+    print_table(("store", "users/s", "seconds", "heap peak KiB"), rows)
+
+
+def _users(count):
+    return (
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    )
+
+
+def _scan_while_writing(store):
+    scanned = 0
+    pages = auth.iter_user_pages(batch_size=1000)
+    for page, (users, _) in enumerate(pages):
+        scanned += sum(1 for _ in users)
+        store.remove(users[0].id)
+        # Negative ids sort before the cursor, so the scan still ends.
+        store.add({"id": -1 - page, "name": f"new{page}", "email": f"new{page}@x"})
+    return scanned
+
+
+def _heap_peak_kib():
+    # Peak Python heap while scanning 100k users: stays at about one page.
+    tracemalloc.start()
+    for _ in islice(auth.iter_users(batch_size=1000), 100_000):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+if __name__ == "__main__":
+    main()
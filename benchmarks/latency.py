@@ -0,0 +1,35 @@
+"""Measure the cost of latency recording on get_user and authenticate."""
+
+import auth
+import passwords
+from benchmarks._util import calls_per_sec, print_table
+from latency import LatencyRecorder
+
+
+def main():
+    auth.set_hasher(passwords.hasher_from_spec("pbkdf2_sha256$i=1000"))
+    auth.set_password(1, "correct horse")
+    lookup = lambda: auth.get_user(1)  # noqa: E731
+    login = lambda: auth.authenticate("alice", "correct horse")  # noqa: E731
+    recorder = LatencyRecorder()
+    record = lambda: recorder.record("x", 12_345)  # noqa: E731
+
+    rows = []
+    for label, setting in (("off", None), ("on", recorder)):
+        auth.set_latency(setting)
+        rows.append(
+            (
+                label,
+                calls_per_sec(lookup, number=200_000),
+                calls_per_sec(login, number=200, repeat=3),
+            )
+        )
+    auth.set_latency(None)
+    print_table(("recording", "get_user/s", "authenticate/s"), rows)
+    print(f"record(): {calls_per_sec(record, number=200_000):,.0f}/s")
+    for name, histogram in recorder.snapshot().items():
+        print(name, histogram.as_dict())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Measure the cost of one Prometheus scrape of the auth metrics."""
+
+import auth
+from benchmarks._util import alloc_bytes_per_call, calls_per_sec
+from prometheus import PrometheusExporter
+
+
+def main():
+    exporter = PrometheusExporter()
+    for user_id in range(1, 3):
+        auth.get_user(user_id)
+        auth.get_users([user_id])
+        auth.get_user_by_name("alice")
+        auth.get_user_by_email("bob@example.com")
+        auth.verify_token(auth.issue_token(user_id))
+        auth.authenticate("mallory", "x")
+    text = exporter.render()
+    rate = calls_per_sec(exporter.render, number=200, repeat=3)
+    print(f"{len(text.splitlines())} lines, {len(text):,} bytes per scrape")
+    allocated = alloc_bytes_per_call(exporter.render)
+    print(f"render: {1e6 / rate:,.0f} us, {allocated:,.0f} bytes allocated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measure read_cache.CachedBackend against a slow backend under a stampede.
+
+``python -m benchmarks.read_cache [CALLERS]``; the default is 500. The
+backend sleeps 1 ms per lookup and counts the calls it serves. Every
+round, all callers ask for one id that is not cached, first as threads
+and then as asyncio tasks, so without the cache each of them queries the
+backend. The async executor gets room for every caller, so the uncached
+run queues rather than shedding load with BusyError.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+import auth
+from benchmarks._util import calls_per_sec, print_table
+from bounded_executor import BoundedExecutor
+from read_cache import CachedBackend
+from user_store import UserStore
+
+ROUNDS = 20
+
+
+class SlowBackend:
+    """Forwards to a UserStore after ``delay`` seconds, counting lookups."""
+
+    def __init__(self, store, delay=0.001):
+        self.store = store
+        self.delay = delay
+        self.calls = 0
+
+    def get(self, user_id):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.store.get(user_id)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def main():
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    store = UserStore(
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(10_000)
+    )
+    auth.set_async_executor(BoundedExecutor(max_workers=32, max_pending=callers))
+    rows = []
+    for label, cached in (("uncached", False), ("CachedBackend", True)):
+        slow = SlowBackend(store)
+        backend = CachedBackend(slow) if cached else slow
+        auth.set_store(backend)
+        for mode, stampede in (("threads", _threads), ("asyncio", _tasks)):
+            slow.calls = 0
+            start = time.perf_counter()
+            for round in range(ROUNDS):
+                # A fresh id each round: every round starts with a miss.
+                stampede(backend, callers, round)
+            elapsed = time.perf_counter() - start
+            rows.append(
+                (
+                    label,
+                    mode,
+                    slow.calls / ROUNDS,
+                    elapsed / ROUNDS * 1e3,
+                    callers * ROUNDS / elapsed,
+                )
+            )
+    print_table(
+        ("store", "callers", "backend calls/round", "ms/round", "lookups/s"), rows
+    )
+
+    slow = SlowBackend(store)
+    backend = CachedBackend(slow)
+    backend.get(1)
+    auth.set_store(backend)
+    print()
+    print_table(
+        ("hit path", "calls/s"),
+        [
+            ("CachedBackend.get", calls_per_sec(lambda: backend.get(1))),
+            ("auth.get_user", calls_per_sec(lambda: auth.get_user(1))),
+            ("UserStore.get", calls_per_sec(lambda: store.get(1))),
+        ],
+    )
+
+
+def _threads(backend, callers, user_id):
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        backend.get(user_id)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _tasks(backend, callers, user_id):
+    async def stampede():
+        await asyncio.gather(
+            *(auth.get_user_async(user_id + 1000) for _ in range(callers))
+        )
+
+    asyncio.run(stampede())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Report bytes per user for candidate record representations.
+
+Each representation holds the same 100k users; the figure is traced heap
+divided by the user count, strings included.
+"""
+
+import tracemalloc
+from array import array
+from types import MappingProxyType
+
+from benchmarks._util import print_table
+from user_store import User
+
+COUNT = 100_000
+
+
+def fields():
+    for i in range(COUNT):
+        yield i, f"user{i}", f"user{i}@example.com"
+
+
+def as_dicts():
+    return [{"id": i, "name": n, "email": e} for i, n, e in fields()]
+
+
+def as_proxies():
+    return [MappingProxyType({"id": i, "name": n, "email": e}) for i, n, e in fields()]
+
+
+def as_users():
+    return [User(i, n, e) for i, n, e in fields()]
+
+
+def as_tuples():
+    return [(i, n, e) for i, n, e in fields()]
+
+
+def as_columns():
+    ids = array("q")
+    offsets = array("Q", [0])
+    heap = bytearray()
+    for i, n, e in fields():
+        ids.append(i)
+        heap += n.encode()
+        offsets.append(len(heap))
+        heap += e.encode()
+        offsets.append(len(heap))
+    return ids, offsets, bytes(heap)
+
+
+def main():
+    rows = []
+    for label, build in (
+        ("dict", as_dicts),
+        ("MappingProxyType(dict)", as_proxies),
+        ("User (slots dataclass)", as_users),
+        ("tuple", as_tuples),
+        ("columnar arrays + utf-8 heap", as_columns),
+    ):
+        tracemalloc.start()
+        data = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del data
+        rows.append((label, size / COUNT))
+    print_table(("representation", "bytes/user"), rows)
+
+
+if __name__ == "__main__":
+    main()
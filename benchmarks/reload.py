@@ -0,0 +1,81 @@
+"""Measure hot reloads while a reader thread keeps calling get_user.
+
+``python -m benchmarks.reload [USERS]``; the default is 1 million. Each
+source is reloaded three times; the reader records get_user latency the
+whole time, and nothing it reads may be None.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import auth
+from benchmarks._util import percentile, print_table
+from reload import Reloader, load_file
+from snapshot import write_snapshot
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl = os.path.join(directory, "users.jsonl")
+        with open(jsonl, "w", encoding="utf-8") as f:
+            for user in _users(count):
+                f.write(json.dumps(user) + "\n")
+        snapshot = os.path.join(directory, "users.snap")
+        write_snapshot(snapshot, _users(count))
+
+        rows = []
+        for label, path in (("snapshot", snapshot), ("jsonl", jsonl)):
+            reloader = Reloader(load_file(path))
+            reloader.reload()
+            timings, stop = [], threading.Event()
+            reader = threading.Thread(target=_read, args=(count, timings, stop))
+            reader.start()
+            for _ in range(3):
+                stats = reloader.reload()
+                if stats.error:
+                    raise RuntimeError(stats.error)
+                rows.append(
+                    (
+                        label,
+                        stats.duration * 1000,
+                        (stats.rss_peak - stats.rss_before) / 2**20,
+                        (stats.rss_after - stats.rss_before) / 2**20,
+                    )
+                )
+            stop.set()
+            reader.join()
+            timings.sort()
+            print(
+                f"{label}: {len(timings):,} reads during reloads,"
+                f" p50 {percentile(timings, 0.5) / 1000:.1f} us,"
+                f" p99 {percentile(timings, 0.99) / 1000:.1f} us"
+            )
+    print_table(("source", "reload ms", "peak RSS +MiB", "RSS after +MiB"), rows)
+
+
+def _read(count, timings, stop):
+    clock = time.perf_counter_ns
+    user_id = 0
+    while not stop.is_set():
+        start = clock()
+        user = auth.get_user(user_id)
+        timings.append(clock() - start)
+        if user is None:
+            raise AssertionError(f"user {user_id} missing during reload")
+        user_id = (user_id + 7919) % count
+
+
+def _users(count):
+    return (
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    )
+
+
+if __name__ == "__main__":
+    main()
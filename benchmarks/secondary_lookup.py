@@ -0,0 +1,52 @@
+"""Compare indexed name/email lookups with a linear scan of the table."""
+
+import random
+import time
+
+from benchmarks._util import print_table
+from user_store import UserStore, normalize_email
+
+
+def scan_by_name(store, name):
+    return next((user for user in store if user.name == name), None)
+
+
+def scan_by_email(store, email):
+    key = normalize_email(email)
+    return next((u for u in store if normalize_email(u.email) == key), None)
+
+
+def per_lookup_us(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    rows = []
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        store = UserStore(
+            {"id": i, "name": f"user{i}", "email": f"User{i}@Example.com"}
+            for i in range(size)
+        )
+        picks = [rng.randrange(size) for _ in range(5 if size >= 100_000 else 50)]
+        names = [f"user{i}" for i in picks]
+        emails = [f"user{i}@example.COM" for i in picks]
+        rows.append(
+            (
+                size,
+                per_lookup_us(store.get_by_name, names * 1000),
+                per_lookup_us(lambda n: scan_by_name(store, n), names),
+                per_lookup_us(store.get_by_email, emails * 1000),
+                per_lookup_us(lambda e: scan_by_email(store, e), emails),
+            )
+        )
+    print_table(
+        ("users", "by name us", "name scan us", "by email us", "email scan us"), rows
+    )
+
+
+if __name__ == "__main__":
+    main()
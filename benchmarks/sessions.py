@@ -0,0 +1,55 @@
+"""Compare timing-wheel session expiry with scanning the session table.
+
+Sessions get TTLs spread over an hour; the clock then moves one second at
+a time and each step expires whatever is due. The wheel's cost follows
+the number of sessions expiring, a scan's follows the table size.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks._util import print_table
+from sessions import SessionStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--steps", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    clock = [0.0]
+    store = SessionStore(clock=lambda: clock[0])
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        store.create(i % 50_000, ttl=rng.uniform(1, 3600))
+    create_us = (time.perf_counter() - start) / args.sessions * 1e6
+
+    table = {s.id: s for shard in store._shards for s in shard.sessions.values()}
+    wheel_ms, scan_ms, expired = [], [], 0
+    for _ in range(args.steps):
+        clock[0] += 1
+        start = time.perf_counter()
+        due = [sid for sid, s in table.items() if s.expires <= clock[0]]
+        for sid in due:
+            del table[sid]
+        scan_ms.append((time.perf_counter() - start) * 1e3)
+        start = time.perf_counter()
+        expired += store.expire()
+        wheel_ms.append((time.perf_counter() - start) * 1e3)
+
+    print(f"{args.sessions:,} sessions, create {create_us:.1f} us each")
+    print(f"{expired:,} expired over {args.steps} steps")
+    print_table(
+        ("expiry per 1 s step", "mean ms", "max ms"),
+        [
+            ("timing wheel", sum(wheel_ms) / len(wheel_ms), max(wheel_ms)),
+            ("full scan", sum(scan_ms) / len(scan_ms), max(scan_ms)),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Measure sharded.ShardedStore from 1 to N shards, and rebalancing.
+
+``python -m benchmarks.sharded [USERS] [MAX_SHARDS]``; the defaults are
+1 million users and 8 shards. For each shard count, four threads issue
+single ``get`` calls and then ``get_many`` batches of 1000 random ids.
+Throughput can only scale with shards up to the number of CPU cores,
+which the output prints. The second table counts the users one
+``add_shard`` and one ``remove_shard`` move, against the ideal 1/N.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+from benchmarks._util import print_table
+from sharded import ShardedStore
+
+THREADS = 4
+SECONDS = 3.0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    max_shards = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"{count:,} users, {os.cpu_count()} CPU cores, {THREADS} threads")
+    rows, moves = [], []
+    shards = 1
+    while shards <= max_shards:
+        store = ShardedStore(shards, _users(count))
+        rows.append(
+            (
+                shards,
+                _rate(lambda: store.get(random.randrange(count))),
+                _rate(
+                    lambda: store.get_many(random.sample(range(count), 1000)),
+                    per_call=1000,
+                ),
+            )
+        )
+        start = time.perf_counter()
+        added = store.add_shard()
+        add_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        removed = store.remove_shard(store.nodes[0])
+        moves.append(
+            (
+                f"{shards} -> {shards + 1} -> {shards}",
+                added / count * 100,
+                100 / (shards + 1),
+                add_seconds,
+                removed / count * 100,
+                time.perf_counter() - start,
+            )
+        )
+        store.close()
+        shards *= 2
+    print_table(("shards", "get/s", "get_many users/s"), rows)
+    print()
+    print_table(
+        (
+            "shards",
+            "add moved %",
+            "ideal %",
+            "add s",
+            "remove moved %",
+            "remove s",
+        ),
+        moves,
+    )
+
+
+def _rate(call, per_call=1):
+    done = [0] * THREADS
+    deadline = time.perf_counter() + SECONDS
+
+    def run(slot):
+        while time.perf_counter() < deadline:
+            call()
+            done[slot] += 1
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(done) * per_call / (time.perf_counter() - start)
+
+
+def _users(count):
+    return (
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Compare sidecar calls over a Unix socket with in-process auth calls.
+
+``python -m benchmarks.sidecar [USERS]``; the default is 100k. The users
+go into a snapshot file that a ``python -m sidecar`` child process
+serves, and that this process also loads for the in-process rows. Every
+sidecar row uses one SidecarClient with 4 pooled connections. The
+"in flight" column is how many calls run concurrently: 1 means every
+call waits for the one before it, higher numbers are pipelined and
+multiplexed over the pool. The server's auth executor queue holds 1024
+jobs; calls it still refuses are counted as busy. Logins use a cheap
+PBKDF2 spec so the protocol cost stays visible next to the hash.
+"""
+
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import auth
+import passwords
+from benchmarks._util import latencies_ns, percentile, print_table
+from bounded_executor import BusyError
+from sidecar import SidecarClient
+from snapshot import SnapshotStore, write_snapshot
+
+SPEC = "pbkdf2_sha256$i=1000"
+PASSWORD = "correct horse"
+CALLS = 20_000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    hasher = passwords.hasher_from_spec(SPEC)
+    encoded = hasher.hash(PASSWORD)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.snap")
+        write_snapshot(path, _users(count, encoded))
+        socket = os.path.join(directory, "auth.sock")
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "sidecar",
+                socket,
+                "--users",
+                path,
+                "--max-pending",
+                "1024",
+            ],
+            env=dict(os.environ, AUTH_PASSWORD_HASHER=SPEC),
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(socket):
+                time.sleep(0.05)
+            rows = _in_process(path, count, hasher) + asyncio.run(
+                _sidecar(socket, count)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+    print_table(
+        ("call", "via", "in flight", "calls/s", "busy", "p50 us", "p99 us"), rows
+    )
+
+
+def _in_process(path, count, hasher):
+    auth.set_store(SnapshotStore(path))
+    auth.set_hasher(hasher)
+    ids = [random.randrange(count) for _ in range(100)]
+    rows = []
+    for label, call, samples in (
+        ("get_user", lambda: auth.get_user(random.randrange(count)), CALLS),
+        ("get_users x100", lambda: auth.get_users(ids), CALLS // 10),
+        ("authenticate", lambda: auth.authenticate("user1", PASSWORD), 2000),
+    ):
+        timings = latencies_ns(call, samples)
+        rows.append(
+            (
+                label,
+                "in process",
+                1,
+                samples / (sum(timings) / 1e9),
+                0,
+                percentile(timings, 0.5) / 1e3,
+                percentile(timings, 0.99) / 1e3,
+            )
+        )
+    return rows
+
+
+async def _sidecar(socket, count):
+    client = SidecarClient(socket)
+    ids = [random.randrange(count) for _ in range(100)]
+    scenarios = (
+        ("get_user", lambda: client.get_user(random.randrange(count)), CALLS),
+        ("get_users x100", lambda: client.get_users(ids), CALLS // 10),
+        ("authenticate", lambda: client.authenticate("user1", PASSWORD), 2000),
+    )
+    rows = []
+    for label, call, calls in scenarios:
+        for in_flight in (1, 16, 256):
+            rate, busy, timings = await _drive(call, calls, in_flight)
+            rows.append(
+                (
+                    label,
+                    "sidecar",
+                    in_flight,
+                    rate,
+                    busy,
+                    percentile(timings, 0.5) / 1e3,
+                    percentile(timings, 0.99) / 1e3,
+                )
+            )
+    await client.close()
+    return rows
+
+
+async def _drive(call, calls, in_flight):
+    timings = []
+    busy = 0
+
+    async def worker():
+        nonlocal busy
+        for _ in range(calls // in_flight):
+            start = time.perf_counter_ns()
+            try:
+                await call()
+            except BusyError:
+                busy += 1
+                continue
+            timings.append(time.perf_counter_ns() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(in_flight)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return len(timings) / elapsed, busy, timings
+
+
+def _users(count, encoded):
+    for i in range(count):
+        yield {
+            "id": i,
+            "name": f"user{i}",
+            "email": f"user{i}@example.com",
+            "password_hash": encoded if i < 100 else None,
+        }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare worker startup and memory: mmap snapshot vs loading into dicts.
+
+Each worker loads the table, serves a burst of random lookups and then
+waits for its siblings, so the PSS figures (proportional set size, which
+splits shared pages between the processes mapping them) are taken while
+all workers are resident. Linux only.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks._util import print_table
+from snapshot import SnapshotStore, write_snapshot
+from user_store import UserStore
+
+
+def memory_kib():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                fields[key] = int(value.split()[0])
+    return fields["Rss"], fields["Pss"]
+
+
+def worker(mode, path, count, barrier, results):
+    start = time.perf_counter()
+    if mode == "snapshot":
+        store = SnapshotStore(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            store = UserStore(json.loads(line) for line in f)
+    ready = time.perf_counter() - start
+    rng = random.Random(os.getpid())
+    for _ in range(10_000):
+        store.get(rng.randrange(count))
+    barrier.wait()
+    results.put((ready, *memory_kib()))
+    barrier.wait()
+
+
+def run(mode, path, count, workers):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(mode, path, count, barrier, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    stats = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    ready = max(s[0] for s in stats)
+    rss = sum(s[1] for s in stats) / workers / 1024
+    pss = sum(s[2] for s in stats) / workers / 1024
+    return ready * 1e3, rss, pss
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "users.jsonl")
+        snap = os.path.join(tmp, "users.snap")
+        users = [
+            {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+            for i in range(args.users)
+        ]
+        with open(jsonl, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(user) + "\n" for user in users)
+        write_snapshot(snap, users)
+        del users
+
+        rows = [
+            ("load into UserStore", *run("dicts", jsonl, args.users, args.workers)),
+            ("mmap snapshot", *run("snapshot", snap, args.users, args.workers)),
+        ]
+    print(f"{args.users:,} users, {args.workers} workers")
+    print_table(("mode", "startup ms", "RSS MiB/worker", "PSS MiB/worker"), rows)
+
+
+if __name__ == "__main__":
+    main()
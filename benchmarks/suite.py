@@ -0,0 +1,255 @@
+"""Repeatable benchmark scenarios for the auth module, reported as JSON.
+
+Each scenario builds its own auth state, then is timed call by call with
+``perf_counter_ns``. The report gives latency percentiles per call,
+throughput in operations per second (a batched call counts each item),
+and allocation figures from tracemalloc. Run it with ``python -m
+benchmarks`` and keep the JSON from each release to compare.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from itertools import cycle
+
+import auth
+import passwords
+from benchmarks._util import alloc_bytes_per_call, latencies_ns, percentile
+from rehash import Rehasher
+from user_store import UserStore
+from verify_cache import VerifyCache
+
+USERS = 100_000
+PASSWORD = "correct horse"
+SCENARIOS = {}
+
+
+def scenario(name, *, ops_per_call=1, threads=1, samples=None):
+    """Register a setup function that returns the callable to time."""
+
+    def register(setup):
+        SCENARIOS[name] = {
+            "setup": setup,
+            "ops_per_call": ops_per_call,
+            "threads": threads,
+            "samples": samples,
+        }
+        return setup
+
+    return register
+
+
+def reset(hasher_spec):
+    """Put auth back into a known state: USERS users, the first 16 with
+    ``PASSWORD`` hashed by ``hasher_spec``."""
+    auth.set_store(
+        UserStore(
+            {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+            for i in range(USERS)
+        )
+    )
+    auth.set_hasher(passwords.hasher_from_spec(hasher_spec))
+    auth.set_verify_cache(None)
+    auth.set_throttle(None)
+    auth.set_rehasher(Rehasher())
+    for user_id in range(16):
+        auth.set_password(user_id, PASSWORD)
+
+
+def _rotate(items):
+    # Unlike cycle(), does not copy its first pass, which would show up as
+    # retained memory in the measurement.
+    while True:
+        yield from items
+
+
+@scenario("get_user.hit")
+def _get_user_hit():
+    ids = _rotate(range(0, USERS, 7))
+    return lambda: auth.get_user(next(ids))
+
+
+@scenario("get_user.miss")
+def _get_user_miss():
+    return lambda: auth.get_user(-1)
+
+
+@scenario("get_user_by_email")
+def _get_user_by_email():
+    emails = _rotate([f"User{i}@Example.com" for i in range(0, USERS, 7)])
+    return lambda: auth.get_user_by_email(next(emails))
+
+
+@scenario("get_users.batch100", ops_per_call=100)
+def _get_users_100():
+    ids = list(range(0, 100 * 97, 97))
+    return lambda: auth.get_users(ids)
+
+
+@scenario("get_users.batch10k", ops_per_call=10_000, samples=200)
+def _get_users_10k():
+    ids = list(range(0, USERS, USERS // 10_000))
+    return lambda: auth.get_users(ids)
+
+
+@scenario("authenticate.success", samples=50)
+def _authenticate_success():
+    return lambda: auth.authenticate("user1", PASSWORD)
+
+
+@scenario("authenticate.wrong_password", samples=50)
+def _authenticate_failure():
+    return lambda: auth.authenticate("user1", "battery staple")
+
+
+@scenario("authenticate.unknown_user", samples=50)
+def _authenticate_unknown():
+    return lambda: auth.authenticate("mallory", PASSWORD)
+
+
+def _cache_mix(hit_ratio):
+    def setup():
+        auth.set_verify_cache(VerifyCache())
+        # Failed attempts are never cached, so each wrong password pays
+        # for a full hash while the right ones are served from the cache.
+        misses = round(10 * (1 - hit_ratio))
+        attempts = cycle([PASSWORD] * (10 - misses) + ["battery staple"] * misses)
+        return lambda: auth.authenticate("user1", next(attempts))
+
+    return setup
+
+
+for _ratio in (1.0, 0.9, 0.5):
+    scenario(f"authenticate.cache_hit_{int(_ratio * 100)}pct", samples=200)(
+        _cache_mix(_ratio)
+    )
+
+
+@scenario("verify_token")
+def _verify_token():
+    token = auth.issue_token(1)
+    return lambda: auth.verify_token(token)
+
+
+@scenario("get_user.threads4", threads=4)
+def _get_user_threads():
+    return lambda: auth.get_user(12345)
+
+
+@scenario("authenticate.threads4", threads=4, samples=100)
+def _authenticate_threads():
+    return lambda: auth.authenticate("user1", PASSWORD)
+
+
+def run_scenario(name, spec, samples, hasher_spec):
+    """Time one registered scenario and return its report entry."""
+    reset(hasher_spec)
+    fn = spec["setup"]()
+    samples = spec["samples"] or samples
+    threads = spec["threads"]
+    for _ in range(min(samples, 100)):
+        fn()
+    gc.collect()
+    per_thread = max(1, samples // threads)
+    results = [None] * threads
+
+    def work(i):
+        results[i] = latencies_ns(fn, per_thread)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter_ns()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter_ns() - start
+    timings = sorted(t for result in results for t in result)
+    ops = len(timings) * spec["ops_per_call"]
+    return {
+        "name": name,
+        "threads": threads,
+        "ops_per_call": spec["ops_per_call"],
+        "calls": len(timings),
+        "throughput_ops_per_s": ops / (elapsed / 1e9),
+        "latency_ns": {
+            "mean": sum(timings) / len(timings),
+            "p50": percentile(timings, 0.50),
+            "p90": percentile(timings, 0.90),
+            "p99": percentile(timings, 0.99),
+            "p999": percentile(timings, 0.999),
+            "max": timings[-1],
+        },
+        "alloc_bytes_per_call": alloc_bytes_per_call(fn, samples=min(samples, 200)),
+        "retained_blocks_per_call": _retained_blocks(fn, min(samples, 1000)),
+    }
+
+
+def _retained_blocks(fn, count):
+    gc.collect()
+    before = sys.getallocatedblocks()
+    for _ in range(count):
+        fn()
+    gc.collect()
+    return (sys.getallocatedblocks() - before) / count
+
+
+def environment(hasher_spec):
+    """Describe the machine and build, so reports can be compared fairly."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "users": USERS,
+        "hasher": hasher_spec,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="name substring to select")
+    parser.add_argument("-n", "--samples", type=int, default=20_000)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument(
+        "--hasher",
+        default="pbkdf2_sha256$i=10000",
+        help="hasher spec for authenticate scenarios",
+    )
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in SCENARIOS if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return
+    report = {
+        "environment": environment(args.hasher),
+        "scenarios": [
+            run_scenario(name, SCENARIOS[name], args.samples, args.hasher)
+            for name in names
+        ],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,30 @@
+"""Measure the per-call cost of the login throttle and its memory per key."""
+
+import tracemalloc
+
+from benchmarks._util import calls_per_sec, print_table
+from throttle import Throttle, TokenBuckets
+
+
+def main():
+    throttle = Throttle(per_user=(1e9, 1e9), per_source=(1e9, 1e9))
+    hot = lambda: throttle.allow("alice", "10.0.0.1")  # noqa: E731
+    keys = iter(range(10**9))
+    fresh = lambda: throttle.allow(next(keys), "10.0.0.1")  # noqa: E731
+    rows = [
+        ("same user and source", 1e9 / calls_per_sec(hot, number=200_000)),
+        ("new user every call", 1e9 / calls_per_sec(fresh, number=200_000)),
+    ]
+    print_table(("throttle.allow", "ns/call"), rows)
+
+    tracemalloc.start()
+    buckets = TokenBuckets(1e9, 1e9, max_keys=10**7)
+    for key in range(1_000_000):
+        buckets.allow(f"user{key}")
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"\n{len(buckets):,} idle keys: {size / len(buckets):.0f} bytes/key")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Measure verify_token throughput on one core against a password login."""
+
+import auth
+import passwords
+from benchmarks._util import calls_per_sec, print_table
+
+
+def main():
+    token = auth.issue_token(1)
+    forged = token[:-2] + "AA"
+    auth.set_hasher(passwords.hasher_from_spec(passwords.DEFAULT_SPEC))
+    auth.set_password(1, "correct horse")
+    rows = [
+        ("verify_token (valid)", calls_per_sec(lambda: auth.verify_token(token))),
+        ("verify_token (forged)", calls_per_sec(lambda: auth.verify_token(forged))),
+        ("issue_token", calls_per_sec(lambda: auth.issue_token(1))),
+        (
+            f"authenticate ({passwords.DEFAULT_SPEC})",
+            calls_per_sec(
+                lambda: auth.authenticate("alice", "correct horse"), number=3, repeat=1
+            ),
+        ),
+    ]
+    print_table(("operation", "ops/s/core"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Measure authenticate with the verification cache on and off."""
+
+import auth
+import passwords
+from benchmarks._util import calls_per_sec, print_table
+from verify_cache import VerifyCache
+
+
+def main():
+    auth.set_hasher(passwords.hasher_from_spec("pbkdf2_sha256$i=20000"))
+    auth.set_password(1, "correct horse")
+    login = lambda: auth.authenticate("alice", "correct horse")  # noqa: E731
+
+    auth.set_verify_cache(None)
+    rows = [("no cache", calls_per_sec(login, number=20, repeat=3))]
+    cache = VerifyCache()
+    auth.set_verify_cache(cache)
+    rows.append(("cache hit", calls_per_sec(login, number=20_000, repeat=3)))
+    print_table(("authenticate", "logins/s"), rows)
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Bloom filter that rejects unknown usernames before the backend sees them."""
+
+import hashlib
+import math
+import secrets
+import threading
+
+
+class BloomFilter:
+    """Bloom filter over strings, sized for ``capacity`` items at ``fp_rate``.
+
+    Bit positions come from a BLAKE2b digest keyed with a per-process
+    secret, so an attacker cannot precompute names that collide.
+    """
+
+    __slots__ = ("capacity", "fp_rate", "size", "hashes", "count", "_bits", "_key")
+
+    def __init__(self, capacity, fp_rate=0.01):
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be between 0 and 1")
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        bits = -self.capacity * math.log(fp_rate) / math.log(2) ** 2
+        self.size = max(8, math.ceil(bits))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._key = secrets.token_bytes(16)
+
+    @classmethod
+    def from_items(cls, items, fp_rate=0.01, *, headroom=1.25, extra=0):
+        """Build a filter holding ``items`` with room for ``headroom`` times
+        more, counting ``extra`` items still to be added."""
+        items = list(items)
+        bloom = cls(math.ceil((len(items) + extra) * headroom), fp_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def __contains__(self, item):
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item):
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(
+            item.encode("utf-8"), digest_size=16, key=self._key
+        ).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+
+class BloomFilteredBackend:
+    """UserBackend wrapper whose ``get_by_name`` checks a Bloom filter first.
+
+    A name the filter has never seen is answered with None without
+    touching the wrapped backend, so credential-stuffing traffic for
+    nonexistent users costs no backend round trip. ``authenticate`` still
+    runs its dummy hash for those names, so timing is unchanged.
+
+    Inserts through the wrapper add the name to the filter before the
+    backend, so a reader can never see a stored user the filter rejects.
+    Removals cannot clear bits, so the filter is rebuilt from the backend
+    once removals pass ``stale_ratio`` of the population or inserts outgrow
+    its capacity; writes wait while that runs, lookups do not. Writes made
+    to the wrapped backend directly need ``rebuild()``.
+    """
+
+    def __init__(self, backend, fp_rate=0.01, *, stale_ratio=0.25):
+        self.backend = backend
+        self.fp_rate = fp_rate
+        self.stale_ratio = stale_ratio
+        self.rejects = 0
+        self.rebuilds = 0
+        self._lock = threading.RLock()
+        self._removed = 0
+        self._filter = None
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.backend)
+
+    def __contains__(self, user_id):
+        return user_id in self.backend
+
+    def __iter__(self):
+        return iter(self.backend)
+
+    @property
+    def filter(self):
+        return self._filter
+
+    def rebuild(self):
+        """Rebuild the filter from every name in the wrapped backend."""
+        self._rebuild(0)
+
+    def get(self, user_id):
+        return self.backend.get(user_id)
+
+    def get_many(self, user_ids, missing="none"):
+        return self.backend.get_many(user_ids, missing)
+
+    def scan(self, after_id, limit):
+        return self.backend.scan(after_id, limit)
+
+    def get_by_name(self, name):
+        if name not in self._filter:
+            self.rejects += 1
+            return None
+        return self.backend.get_by_name(name)
+
+    def get_by_email(self, email):
+        return self.backend.get_by_email(email)
+
+    def add(self, user):
+        with self._lock:
+            self._note_names((user["name"],))
+            return self.backend.add(user)
+
+    def add_many(self, users):
+        users = list(users)
+        with self._lock:
+            self._note_names([user["name"] for user in users])
+            self.backend.add_many(users)
+
+    def remove(self, user_id):
+        with self._lock:
+            record = self.backend.remove(user_id)
+            self._removed += 1
+            # Names added since the last rebuild, less removals: close
+            # enough to the population without asking the backend.
+            population = self._filter.count - self._removed
+            if self._removed > self.stale_ratio * max(1, population):
+                self.rebuild()
+        return record
+
+    def password_hash(self, user_id):
+        return self.backend.password_hash(user_id)
+
+    def set_password_hash(self, user_id, encoded):
+        self.backend.set_password_hash(user_id, encoded)
+
+    def replace_password_hash(self, user_id, old, new):
+        return self.backend.replace_password_hash(user_id, old, new)
+
+    def hash_specs(self):
+        return self.backend.hash_specs()
+
+    def _rebuild(self, extra):
+        with self._lock:
+            names = (user.name for user in self.backend)
+            self._filter = BloomFilter.from_items(names, self.fp_rate, extra=extra)
+            self._removed = 0
+            self.rebuilds += 1
+
+    def _note_names(self, names):
+        if self._filter.count + len(names) > self._filter.capacity:
+            # Grow first, sized for the backend plus this batch; the names
+            # are not in the backend yet, so they are added below.
+            self._rebuild(len(names))
+        bloom = self._filter
+        for name in names:
+            bloom.add(name)
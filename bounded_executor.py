@@ -0,0 +1,45 @@
+"""Thread pool with a hard cap on queued work."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BusyError(RuntimeError):
+    """Raised when a BoundedExecutor has no room for more work."""
+
+
+class BoundedExecutor:
+    """Thread pool that rejects submissions once its queue is full.
+
+    At most ``max_workers`` jobs run and ``max_pending`` more wait; beyond
+    that ``submit`` raises BusyError at once, so callers shed load instead
+    of queueing behind work that will finish too late to matter. A slot is
+    freed when its job finishes or is cancelled before it starts.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = 4 * self.max_workers if max_pending is None else max_pending
+        self._pool = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="auth-async"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+
+    def submit(self, fn, *args):
+        """Schedule ``fn(*args)`` and return its Future, or raise BusyError."""
+        if not self._slots.acquire(blocking=False):
+            raise BusyError("auth executor queue is full")
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _release(self, future):
+        self._slots.release()
@@ -0,0 +1,236 @@
+"""Streaming bulk import of users from CSV or JSONL into a user backend.
+
+::
+
+    python -m importer users.csv --sqlite users.db
+    zcat users.jsonl.gz | python -m importer - --format jsonl --sqlite users.db
+
+Build a read-only snapshot from the result with ``python -m snapshot build
+OUT --sqlite users.db``.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+
+from backends import SQLiteBackend
+from user_store import normalize_email
+
+FORMATS = ("csv", "jsonl")
+MAX_ERRORS = 100
+
+
+@dataclass(slots=True)
+class ImportReport:
+    """Counters for one import; ``errors`` holds the first ``MAX_ERRORS``
+    problems as ``(line, message)`` pairs."""
+
+    rows: int = 0
+    imported: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def note(self, line, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def import_users(store, source, *, format=None, batch_size=10_000, progress=None):
+    """Load users from ``source`` into ``store`` and return an ImportReport.
+
+    ``source`` is a path, ``"-"`` for stdin, or an open text stream; the
+    format comes from the file extension unless ``format`` names it. Rows
+    are read, validated and committed through a chain of generators, so
+    memory holds one batch however large the file. Each batch goes in with
+    one ``add_many`` call (a single transaction on SQLiteBackend).
+
+    Invalid rows and duplicates are skipped and counted; the first row
+    with a given id, name or email wins. Duplicates inside a batch are
+    dropped before the commit. Those against earlier batches or rows
+    already in the store are found by the store's own unique indexes: a
+    rejected batch is split in halves until the offending rows are
+    isolated, which costs O(log batch_size) extra commits per duplicate.
+    ``progress``, if given, is called with the report after every batch.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    with _open(source) as stream:
+        rows = validate(read_rows(stream, format or _format_of(source)), report)
+        for batch in batches(rows, batch_size, report):
+            _commit(store, batch, report)
+            report.batches += 1
+            report.elapsed = time.perf_counter() - start
+            if progress is not None:
+                progress(report)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def read_rows(stream, format):
+    """Yield ``(line, record)`` for each row; ``record`` is a dict, or a
+    ValueError for a line that does not parse."""
+    if format == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        for row in reader:
+            if row:
+                yield reader.line_num, dict(zip(header, row))
+    elif format == "jsonl":
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as exc:
+                record = ValueError(f"invalid JSON: {exc}")
+            else:
+                if not isinstance(record, dict):
+                    record = ValueError("not a JSON object")
+            yield line, record
+    else:
+        raise ValueError(f"unknown format {format!r}; expected one of {FORMATS}")
+
+
+def validate(rows, report):
+    """Yield ``(line, user)`` for the rows that make valid users."""
+    for line, record in rows:
+        report.rows += 1
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            yield line, _user(record)
+        except ValueError as exc:
+            report.invalid += 1
+            report.note(line, str(exc))
+
+
+def batches(rows, size, report):
+    """Group ``(line, user)`` rows into lists of up to ``size``, dropping
+    rows whose id, name or email repeats one earlier in the same list."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        ids, names, emails = set(), set(), set()
+        batch = []
+        for line, user in chunk:
+            email = normalize_email(user["email"])
+            if user["id"] in ids or user["name"] in names or email in emails:
+                report.duplicates += 1
+                report.note(line, f"duplicate of an earlier row: {user['id']!r}")
+                continue
+            ids.add(user["id"])
+            names.add(user["name"])
+            emails.add(email)
+            batch.append((line, user))
+        yield batch
+
+
+def _user(record):
+    user_id = record.get("id")
+    if isinstance(user_id, str):
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            raise ValueError(f"id {user_id!r} is not an integer") from None
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError(f"id {user_id!r} is not an integer")
+    if not -(2**63) <= user_id < 2**63:
+        raise ValueError(f"id {user_id} is out of range")
+    name = record.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError("name is missing")
+    email = record.get("email")
+    if not isinstance(email, str) or "@" not in email:
+        raise ValueError(f"email {email!r} is not an address")
+    encoded = record.get("password_hash") or None
+    if encoded is not None and (
+        not isinstance(encoded, str) or encoded.count("$") < 3
+    ):
+        raise ValueError("password_hash is not an encoded hash")
+    return {"id": user_id, "name": name, "email": email, "password_hash": encoded}
+
+
+def _commit(store, batch, report):
+    if not batch:
+        return
+    try:
+        store.add_many([user for _, user in batch])
+    except ValueError as exc:
+        if len(batch) == 1:
+            report.duplicates += 1
+            report.note(batch[0][0], str(exc))
+            return
+        middle = len(batch) // 2
+        _commit(store, batch[:middle], report)
+        _commit(store, batch[middle:], report)
+    else:
+        report.imported += len(batch)
+
+
+def _format_of(source):
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"cannot tell the format of {name!r}; pass format=")
+
+
+@contextmanager
+def _open(source):
+    if not isinstance(source, str):
+        yield source
+    elif source == "-":
+        yield sys.stdin
+    else:
+        with open(source, encoding="utf-8", newline="") as stream:
+            yield stream
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m importer")
+    parser.add_argument("source", help="CSV or JSONL file ('-' for stdin)")
+    parser.add_argument("--sqlite", required=True, help="database to load into")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    def progress(report):
+        print(
+            f"\r{report.rows:,} rows, {report.rows_per_sec:,.0f} rows/s",
+            end="",
+            file=sys.stderr,
+        )
+
+    store = SQLiteBackend(args.sqlite, pool_size=1)
+    report = import_users(
+        store,
+        args.source,
+        format=args.format,
+        batch_size=args.batch_size,
+        progress=progress,
+    )
+    store.close()
+    print(file=sys.stderr)
+    for line, message in report.errors:
+        print(f"line {line}: {message}", file=sys.stderr)
+    print(
+        f"imported {report.imported:,} of {report.rows:,} rows"
+        f" ({report.invalid:,} invalid, {report.duplicates:,} duplicates)"
+        f" in {report.elapsed:.1f}s, {report.rows_per_sec:,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Log-linear latency histograms recorded per thread and merged on read."""
+
+import threading
+
+_SUB_BITS = 5
+_MAX_NS = (1 << 40) - 1
+_BUCKETS = ((_MAX_NS.bit_length() - _SUB_BITS) << _SUB_BITS) + (1 << _SUB_BITS)
+
+
+def bucket_index(ns):
+    """Return the bucket holding a duration of ``ns`` nanoseconds.
+
+    Values below 64 get a bucket each; above that every power of two is
+    split into 32 equal buckets, so as in an HDR histogram a bucket is
+    never wider than 1/32 of its lower bound. Durations are clamped to
+    about 18 minutes.
+    """
+    if ns > _MAX_NS:
+        ns = _MAX_NS
+    shift = ns.bit_length() - _SUB_BITS - 1
+    if shift <= 0:
+        return ns
+    return (shift << _SUB_BITS) + (ns >> shift)
+
+
+def bucket_bounds(index):
+    """Return the ``[low, high)`` nanosecond range of bucket ``index``."""
+    shift = (index >> _SUB_BITS) - 1
+    if shift <= 0:
+        return index, index + 1
+    mantissa = index - (shift << _SUB_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class _Shard:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.total = 0
+        self.max = 0
+
+
+class HistogramSnapshot:
+    """Merged counts of one latency histogram at a point in time."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self, counts, total, max_ns):
+        self.counts = counts
+        self.count = sum(counts)
+        self.total = total
+        self.max = max_ns
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Return the upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_bounds(index)[1] - 1, self.max)
+        return self.max
+
+    def buckets(self):
+        """Yield ``(upper_bound_ns, cumulative_count)`` for non-empty buckets."""
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n:
+                seen += n
+                yield bucket_bounds(index)[1], seen
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "p999": self.percentile(0.999),
+            "max": self.max,
+        }
+
+
+class LatencyRecorder:
+    """Named latency histograms that threads record into without locking.
+
+    Each thread writes to its own shard per name, found through a
+    ``threading.local``, so recording is a few list and attribute updates
+    with no lock and no contention. ``snapshot`` sums the shards of every
+    thread; shards of threads that have exited are folded into one, so
+    thread churn does not grow the list. ``snapshot(reset=True)`` swaps in
+    fresh shards; a sample recorded at the same instant may be lost.
+
+    ``auth`` records each entry point under its function name and the
+    phases of a login as ``authenticate.lookup``, ``authenticate.cache``
+    and ``authenticate.hash``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads = []
+        self._retired = {}
+
+    def record(self, name, ns):
+        """Add one duration of ``ns`` nanoseconds under ``name``."""
+        try:
+            shard = self._local.shards[name]
+        except (AttributeError, KeyError):
+            shard = self._shard(name)
+        # bucket_index(), inlined: this runs on every instrumented call.
+        shift = ns.bit_length() - _SUB_BITS - 1
+        if shift <= 0:
+            shard.counts[ns] += 1
+        elif ns <= _MAX_NS:
+            shard.counts[(shift << _SUB_BITS) + (ns >> shift)] += 1
+        else:
+            shard.counts[-1] += 1
+        shard.total += ns
+        if ns > shard.max:
+            shard.max = ns
+
+    def snapshot(self, reset=False):
+        """Return ``{name: HistogramSnapshot}`` for every name recorded."""
+        with self._lock:
+            threads, retired = self._threads, self._retired
+            if reset:
+                self._local = threading.local()
+                self._threads = []
+                self._retired = {}
+            else:
+                self._threads = [t for t in threads if t[0].is_alive()]
+                for thread, shards in threads:
+                    if not thread.is_alive():
+                        _fold_all(retired, shards)
+                threads = self._threads
+            merged = {}
+            _fold_all(merged, retired)
+            for _, shards in threads:
+                _fold_all(merged, shards)
+        return {
+            name: HistogramSnapshot(shard.counts, shard.total, shard.max)
+            for name, shard in sorted(merged.items())
+        }
+
+    def _shard(self, name):
+        local = self._local
+        shards = getattr(local, "shards", None)
+        if shards is None:
+            shards = local.shards = {}
+            with self._lock:
+                self._threads.append((threading.current_thread(), shards))
+        # Only this thread adds to ``shards``; readers copy it first.
+        shard = shards[name] = _Shard()
+        return shard
+
+
+def _fold_all(into, shards):
+    for name, shard in list(shards.items()):
+        target = into.get(name)
+        if target is None:
+            target = into[name] = _Shard()
+        counts = target.counts
+        for index, n in enumerate(shard.counts):
+            if n:
+                counts[index] += n
+        target.total += shard.total
+        target.max = max(target.max, shard.max)
@@ -0,0 +1,245 @@
+"""Salted password hashing with pluggable key-derivation functions.
+
+Hashes are stored as ``<algorithm>$<params>$<salt>$<digest>`` strings, so a
+hash is always verified with the parameters it was made with. The part
+before the salt is the hasher's *spec*; the same string configures the
+deployment through the ``AUTH_PASSWORD_HASHER`` environment variable, e.g.
+``pbkdf2_sha256$i=600000`` or ``scrypt$n=16384,r=8,p=1``.
+
+Throughput budget: the KDF dominates login cost. The default,
+PBKDF2-SHA256 at 600 000 iterations (the OWASP 2023 floor), takes about
+0.3 s of one core per verify, so each core sustains roughly 3 logins/s;
+everything else in ``auth.authenticate`` is a few microseconds. Run
+``python -m passwords calibrate --target-p99-ms N`` on the production
+machine to pick the work factor that fits a latency target instead.
+"""
+
+import argparse
+import base64
+import functools
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+DEFAULT_SPEC = "pbkdf2_sha256$i=600000"
+
+
+class KDFHasher:
+    """Base class for hashers; subclasses implement ``_derive``."""
+
+    algorithm = None
+    salt_size = 16
+
+    def __init__(self):
+        self._dummy_salt = secrets.token_bytes(self.salt_size)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.spec}>"
+
+    @property
+    def spec(self):
+        """The ``<algorithm>$<params>`` prefix of hashes made by this hasher."""
+        return f"{self.algorithm}${self.params}"
+
+    @property
+    def params(self):
+        raise NotImplementedError
+
+    def hash(self, password):
+        """Return the encoded salted hash of ``password``."""
+        salt = secrets.token_bytes(self.salt_size)
+        digest = self._derive(_to_bytes(password), salt)
+        return f"{self.spec}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password, encoded):
+        """Return True if ``password`` matches ``encoded``.
+
+        ``encoded`` must have been made with this hasher's parameters; use
+        the module-level ``verify`` for hashes of any spec.
+        """
+        spec, salt, digest = _split(encoded)
+        if spec != self.spec:
+            raise ValueError(f"hash spec {spec!r} does not match {self.spec!r}")
+        return hmac.compare_digest(self._derive(_to_bytes(password), salt), digest)
+
+    def dummy_verify(self, password):
+        """Spend the cost of one ``verify`` and return False."""
+        digest = self._derive(_to_bytes(password), self._dummy_salt)
+        hmac.compare_digest(digest, bytes(len(digest)))
+        return False
+
+    @property
+    def cost(self):
+        """The work factor ``calibrate`` scales."""
+        raise NotImplementedError
+
+    def with_cost(self, cost):
+        """Return a copy of this hasher with work factor ``cost``."""
+        raise NotImplementedError
+
+    def _derive(self, password, salt):
+        raise NotImplementedError
+
+
+class PBKDF2Hasher(KDFHasher):
+    """PBKDF2-HMAC; the work factor is the iteration count."""
+
+    def __init__(self, iterations=600_000, *, digest="sha256"):
+        if iterations < 1:
+            raise ValueError("iterations must be positive")
+        super().__init__()
+        self.iterations = iterations
+        self.digest = digest
+        self.algorithm = f"pbkdf2_{digest}"
+
+    @property
+    def params(self):
+        return f"i={self.iterations}"
+
+    @property
+    def cost(self):
+        return self.iterations
+
+    def with_cost(self, cost):
+        return PBKDF2Hasher(max(1, int(cost)), digest=self.digest)
+
+    def _derive(self, password, salt):
+        return hashlib.pbkdf2_hmac(self.digest, password, salt, self.iterations)
+
+
+class ScryptHasher(KDFHasher):
+    """scrypt; the work factor is the CPU/memory cost ``n``."""
+
+    algorithm = "scrypt"
+
+    def __init__(self, n=2**14, r=8, p=1):
+        if n < 2 or n & (n - 1):
+            raise ValueError("n must be a power of two greater than 1")
+        super().__init__()
+        self.n = n
+        self.r = r
+        self.p = p
+        self._maxmem = 129 * r * (n + p) + 2**20
+
+    @property
+    def params(self):
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    @property
+    def cost(self):
+        return self.n
+
+    def with_cost(self, cost):
+        n = 1 << max(1, int(cost).bit_length() - 1)
+        return ScryptHasher(n, self.r, self.p)
+
+    def _derive(self, password, salt):
+        return hashlib.scrypt(
+            password, salt=salt, n=self.n, r=self.r, p=self.p, maxmem=self._maxmem
+        )
+
+
+@functools.lru_cache(maxsize=32)
+def hasher_from_spec(spec):
+    """Build the hasher described by ``spec``, e.g. ``scrypt$n=16384,r=8,p=1``."""
+    algorithm, _, params = spec.partition("$")
+    fields = dict(item.split("=", 1) for item in params.split(",") if item)
+    try:
+        values = {key: int(value) for key, value in fields.items()}
+        if algorithm.startswith("pbkdf2_"):
+            return PBKDF2Hasher(values["i"], digest=algorithm[len("pbkdf2_"):])
+        if algorithm == "scrypt":
+            return ScryptHasher(values["n"], values["r"], values["p"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"invalid hasher spec {spec!r}") from exc
+    raise ValueError(f"unknown hash algorithm {algorithm!r}")
+
+
+def default_hasher():
+    """Return the hasher configured by ``AUTH_PASSWORD_HASHER``."""
+    return hasher_from_spec(os.environ.get("AUTH_PASSWORD_HASHER", DEFAULT_SPEC))
+
+
+def verify(password, encoded):
+    """Return True if ``password`` matches ``encoded``, whatever its spec."""
+    return hasher_from_spec(spec_of(encoded)).verify(password, encoded)
+
+
+def spec_of(encoded):
+    """Return the ``<algorithm>$<params>`` prefix of ``encoded``."""
+    return encoded.rsplit("$", 2)[0]
+
+
+def calibrate(hasher, target_p99_ms, *, samples=30):
+    """Return ``(hasher, p99_ms)`` for the costliest variant of ``hasher``
+    whose verify p99 on this machine stays within ``target_p99_ms``.
+    """
+    probe = hasher.with_cost(hasher.cost)
+    probe_ms = _p99_ms(probe, 5)
+    candidate = probe.with_cost(probe.cost * target_p99_ms * 0.9 / probe_ms)
+    while True:
+        p99 = _p99_ms(candidate, samples)
+        if p99 <= target_p99_ms or candidate.cost <= 2:
+            return candidate, p99
+        smaller = candidate.with_cost(candidate.cost * target_p99_ms * 0.95 / p99)
+        if smaller.cost >= candidate.cost:
+            smaller = candidate.with_cost(candidate.cost // 2)
+        candidate = smaller
+
+
+def _p99_ms(hasher, samples):
+    encoded = hasher.hash("calibration")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter_ns()
+        hasher.verify("calibration", encoded)
+        timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+    return timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1e6
+
+
+def _split(encoded):
+    spec, salt, digest = encoded.rsplit("$", 2)
+    return spec, _b64decode(salt), _b64decode(digest)
+
+
+def _to_bytes(password):
+    return password if isinstance(password, bytes) else password.encode("utf-8")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m passwords")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cal = commands.add_parser(
+        "calibrate", help="pick the work factor for a target p99 verify latency"
+    )
+    cal.add_argument(
+        "--algorithm",
+        choices=("pbkdf2_sha256", "pbkdf2_sha512", "scrypt"),
+        default="pbkdf2_sha256",
+    )
+    cal.add_argument("--target-p99-ms", type=float, default=250.0)
+    cal.add_argument("--samples", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.algorithm == "scrypt":
+        start = ScryptHasher(2**12)
+    else:
+        start = PBKDF2Hasher(10_000, digest=args.algorithm[len("pbkdf2_"):])
+    hasher, p99 = calibrate(start, args.target_p99_ms, samples=args.samples)
+    print(f"# verify p99 {p99:.1f} ms (~{1000 / p99:.1f} logins/s per core)")
+    print(f"AUTH_PASSWORD_HASHER='{hasher.spec}'")
+
+
+if __name__ == "__main__":
+    main()
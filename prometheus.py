@@ -0,0 +1,233 @@
+"""Prometheus text-format exporter for the auth module, with no client library.
+
+Serve ``/metrics`` on a local port, or write the same text to a file for
+node_exporter's textfile collector::
+
+    python -m prometheus serve --port 9464
+    python -m prometheus write /var/lib/node_exporter/auth.prom --interval 15
+
+Creating the exporter installs a LatencyRecorder in ``auth`` if none is
+set, since call counts and latencies come from its histograms.
+"""
+
+import argparse
+import bisect
+import http.server
+import os
+import tempfile
+import threading
+
+import auth
+from latency import LatencyRecorder, bucket_bounds
+
+# Upper bounds, in seconds, of the exported histogram buckets.
+BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3,
+    2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+_COUNTERS = (
+    ("login_failures_total", "Logins rejected for a wrong password or user."),
+    ("verify_cache_hits_total", "Logins served from the verify cache."),
+    ("verify_cache_misses_total", "Logins the verify cache could not serve."),
+    ("verify_cache_evictions_total", "Entries evicted from the verify cache."),
+    ("throttle_rejections_total", "Login attempts refused by the throttle."),
+    ("rehash_completed_total", "Password hashes upgraded to the current spec."),
+)
+_GAUGES = (
+    ("verify_cache_entries", "Entries in the verify cache."),
+    ("rehash_pending", "Hash upgrades queued."),
+    ("outdated_hashes", "Stored hashes made with an outdated spec."),
+)
+
+
+class PrometheusExporter:
+    """Renders auth's counters, gauges and latency histograms as text.
+
+    Everything but the numbers is rendered once: HELP and TYPE lines,
+    metric names and label sets, per entry point the ``le`` prefix of
+    every bucket line, and for every latency bucket the exported bucket
+    it falls in. A scrape then formats only the values. Latency
+    histograms export as ``auth_call_duration_seconds{entry="..."}``. The
+    entries are auth's entry points plus the login phases recorded by
+    LatencyRecorder. The source buckets are 1/32 of their value wide, so
+    a sample near a bound may be counted in the next bucket up.
+    """
+
+    def __init__(self, prefix="auth"):
+        self.prefix = prefix
+        self._entries = {}
+        self._slots = None
+        if auth.get_latency() is None:
+            auth.set_latency(LatencyRecorder())
+        self._names = {
+            name: _help(f"{prefix}_{name}", text, kind) + f"{prefix}_{name} "
+            for group, kind in ((_COUNTERS, "counter"), (_GAUGES, "gauge"))
+            for name, text in group
+        }
+        self._calls_header = _help(
+            f"{prefix}_calls_total", "Calls per auth entry point.", "counter"
+        )
+        self._latency_header = _help(
+            f"{prefix}_call_duration_seconds",
+            "Latency of auth entry points and login phases.",
+            "histogram",
+        )
+
+    def render(self):
+        """Return the current metrics in Prometheus text exposition format."""
+        latencies = auth.latency_stats()
+        failed = latencies.pop("authenticate.failed", None)
+        names = self._names
+        out = []
+        for name, value in self._values(failed).items():
+            out.append(names[name])
+            out.append(f"{value}\n")
+        entries = [
+            (self._entries.get(entry) or self._entry_lines(entry), snapshot)
+            for entry, snapshot in latencies.items()
+        ]
+        out.append(self._calls_header)
+        for (calls, *_), snapshot in entries:
+            out.append(f"{calls}{snapshot.count}\n")
+        out.append(self._latency_header)
+        for (_, buckets, infinite, total, count), snapshot in entries:
+            for prefix, n in zip(buckets, self._cumulative(snapshot.counts)):
+                out.append(f"{prefix}{n}\n")
+            out.append(f"{infinite}{snapshot.count}\n")
+            out.append(f"{total}{snapshot.total / 1e9!r}\n")
+            out.append(f"{count}{snapshot.count}\n")
+        return "".join(out)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve ``/metrics`` on a daemon thread; return the HTTP server."""
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="auth-metrics", daemon=True
+        ).start()
+        return server
+
+    def write(self, path):
+        """Write the metrics to ``path`` atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def write_every(self, path, interval=15.0):
+        """Rewrite ``path`` every ``interval`` seconds on a daemon thread.
+
+        Returns an Event; set it to stop.
+        """
+        stop = threading.Event()
+
+        def run():
+            while True:
+                self.write(path)
+                if stop.wait(interval):
+                    return
+
+        threading.Thread(target=run, name="auth-metrics", daemon=True).start()
+        return stop
+
+    def _values(self, failed):
+        counters = auth.stats()
+        cache = counters["verify_cache"] or {}
+        rehash = auth.rehash_stats()
+        return {
+            "login_failures_total": 0 if failed is None else failed.count,
+            "verify_cache_hits_total": cache.get("hits", 0),
+            "verify_cache_misses_total": cache.get("misses", 0),
+            "verify_cache_evictions_total": cache.get("evictions", 0),
+            "throttle_rejections_total": counters["throttle_rejections"] or 0,
+            "rehash_completed_total": rehash.get("completed", 0),
+            "verify_cache_entries": cache.get("size", 0),
+            "rehash_pending": rehash.get("pending", 0),
+            "outdated_hashes": rehash["outdated"],
+        }
+
+    def _entry_lines(self, entry):
+        labels = f'entry="{_escape(entry)}"'
+        name = f"{self.prefix}_call_duration_seconds"
+        lines = (
+            f"{self.prefix}_calls_total{{{labels}}} ",
+            tuple(f'{name}_bucket{{{labels},le="{le!r}"}} ' for le in BUCKETS),
+            f'{name}_bucket{{{labels},le="+Inf"}} ',
+            f"{name}_sum{{{labels}}} ",
+            f"{name}_count{{{labels}}} ",
+        )
+        self._entries[entry] = lines
+        return lines
+
+    def _cumulative(self, counts):
+        if self._slots is None:
+            # Index of the exported bucket every latency bucket falls in.
+            limits = [round(le * 1e9) for le in BUCKETS]
+            self._slots = [
+                bisect.bisect_left(limits, bucket_bounds(index)[1] - 1)
+                for index in range(len(counts))
+            ]
+        totals = [0] * len(BUCKETS)
+        for n, slot in zip(counts, self._slots):
+            if n and slot < len(totals):
+                totals[slot] += n
+        running = 0
+        for i, n in enumerate(totals):
+            running += n
+            totals[i] = running
+        return totals
+
+
+def _help(name, text, kind):
+    return f"# HELP {name} {text}\n# TYPE {name} {kind}\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m prometheus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve /metrics over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9464)
+    write = commands.add_parser("write", help="rewrite a textfile periodically")
+    write.add_argument("path")
+    write.add_argument("--interval", type=float, default=15.0)
+    args = parser.parse_args(argv)
+
+    exporter = PrometheusExporter()
+    if args.command == "serve":
+        server = exporter.serve(args.port, args.host)
+        print(f"serving http://{args.host}:{server.server_port}/metrics")
+        threading.Event().wait()
+    else:
+        exporter.write_every(args.path, args.interval).wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Read-through cache for user lookups, with single-flight misses."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+from user_store import resolve_many
+
+
+class _Flight:
+    """One backend fetch in progress, shared by every caller that missed."""
+
+    __slots__ = ("future", "stale")
+
+    def __init__(self):
+        self.future = Future()
+        # A running future cannot be cancelled, so one waiter giving up
+        # never cancels the fetch for the others.
+        self.future.set_running_or_notify_cancel()
+        self.stale = False
+
+
+class CachedBackend:
+    """UserBackend wrapper that caches ``get`` and ``get_many`` results.
+
+    Found users are kept for ``ttl`` seconds and ids the backend does not
+    have for ``negative_ttl``, so a flood of lookups for missing ids does
+    not reach the backend either. Concurrent misses for one id are
+    coalesced: the first caller fetches, the rest wait for its result
+    (single-flight), whether they are threads calling ``get``, coroutines
+    awaiting ``get_async`` or ``get_many`` calls. ``get_many`` waits on
+    the fetches already in flight for its ids and fetches the rest in one
+    backend ``get_many``. A failed fetch is passed to every waiter and
+    not cached.
+
+    Fetches are versioned against invalidation: ``invalidate``, and every
+    write through the wrapper, drops the entry and marks stale a fetch in
+    flight for that id, so a read that raced the write reaches its
+    callers but is never cached. Writes made to the wrapped backend
+    directly need ``invalidate`` or ``clear``.
+
+    Hits take no lock. Past ``max_size`` entries the oldest filled go
+    first. Name and email lookups and password hashes pass straight
+    through.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl=60.0,
+        negative_ttl=5.0,
+        *,
+        max_size=100_000,
+        clock=time.monotonic,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.backend)
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __iter__(self):
+        return iter(self.backend)
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > self._clock():
+            self.hits += 1
+            return entry[1]
+        flight, leader = self._join(user_id)
+        if leader:
+            self._fetch(user_id, flight)
+        return flight.future.result()
+
+    async def get_async(self, user_id, *, submit=None):
+        """Asyncio variant of ``get``.
+
+        A miss runs the backend fetch through ``submit(fn, *args)``, which
+        must return a concurrent.futures.Future; by default it goes to the
+        event loop's default executor.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > self._clock():
+            self.hits += 1
+            return entry[1]
+        flight, leader = self._join(user_id)
+        if leader:
+            try:
+                if submit is None:
+                    loop = asyncio.get_running_loop()
+                    loop.run_in_executor(None, self._fetch, user_id, flight)
+                else:
+                    submit(self._fetch, user_id, flight)
+            except BaseException as exc:
+                self._land(user_id, flight)
+                flight.future.set_exception(exc)
+                raise
+        return await asyncio.wrap_future(flight.future)
+
+    def get_many(self, user_ids, missing="none"):
+        user_ids = list(user_ids)
+        now = self._clock()
+        found = {}
+        for user_id in user_ids:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                found[user_id] = entry[1]
+        wanted = [u for u in dict.fromkeys(user_ids) if u not in found]
+        self.hits += len(found)
+        if wanted:
+            flights, led = self._join_many(wanted)
+            if led:
+                self._fetch_many(led)
+            for user_id, flight in flights.items():
+                found[user_id] = flight.future.result()
+        # Cached and fetched misses are None; drop them so ``missing`` sees
+        # them as absent.
+        found = {k: user for k, user in found.items() if user is not None}
+        return resolve_many(found, user_ids, missing)
+
+    def get_by_name(self, name):
+        return self.backend.get_by_name(name)
+
+    def get_by_email(self, email):
+        return self.backend.get_by_email(email)
+
+    def scan(self, after_id, limit):
+        return self.backend.scan(after_id, limit)
+
+    def add(self, user):
+        try:
+            return self.backend.add(user)
+        finally:
+            self.invalidate(user["id"])
+
+    def add_many(self, users):
+        users = list(users)
+        try:
+            self.backend.add_many(users)
+        finally:
+            for user in users:
+                self.invalidate(user["id"])
+
+    def remove(self, user_id):
+        try:
+            return self.backend.remove(user_id)
+        finally:
+            self.invalidate(user_id)
+
+    def password_hash(self, user_id):
+        return self.backend.password_hash(user_id)
+
+    def set_password_hash(self, user_id, encoded):
+        self.backend.set_password_hash(user_id, encoded)
+
+    def replace_password_hash(self, user_id, old, new):
+        return self.backend.replace_password_hash(user_id, old, new)
+
+    def hash_specs(self):
+        return self.backend.hash_specs()
+
+    def invalidate(self, user_id):
+        """Drop the cached result for ``user_id`` and any fetch in flight."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            flight = self._flights.get(user_id)
+            if flight is not None:
+                flight.stale = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for flight in self._flights.values():
+                flight.stale = True
+
+    def stats(self):
+        """Return the hit, miss, coalesced and eviction counters and the size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def _join(self, user_id):
+        with self._lock:
+            flight = self._flights.get(user_id)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            self.misses += 1
+            flight = self._flights[user_id] = _Flight()
+            return flight, True
+
+    def _join_many(self, user_ids):
+        # Every flight for ``user_ids``, and the new ones this caller leads.
+        flights, led = {}, {}
+        with self._lock:
+            for user_id in user_ids:
+                flight = self._flights.get(user_id)
+                if flight is not None:
+                    self.coalesced += 1
+                else:
+                    self.misses += 1
+                    flight = led[user_id] = self._flights[user_id] = _Flight()
+                flights[user_id] = flight
+        return flights, led
+
+    def _fetch(self, user_id, flight):
+        self._resolve({user_id: flight}, lambda: [self.backend.get(user_id)])
+
+    def _fetch_many(self, led):
+        self._resolve(led, lambda: self.backend.get_many(list(led)))
+
+    def _resolve(self, led, fetch):
+        # Settle the ``led`` flights with the users ``fetch`` returns.
+        try:
+            users = fetch()
+        except BaseException as exc:
+            for user_id, flight in led.items():
+                self._land(user_id, flight)
+                flight.future.set_exception(exc)
+            return
+        with self._lock:
+            for (user_id, flight), user in zip(led.items(), users):
+                if self._flights.get(user_id) is flight:
+                    del self._flights[user_id]
+                if not flight.stale:
+                    self._put(user_id, user)
+        for flight, user in zip(led.values(), users):
+            flight.future.set_result(user)
+
+    def _land(self, user_id, flight):
+        with self._lock:
+            if self._flights.get(user_id) is flight:
+                del self._flights[user_id]
+
+    def _put(self, user_id, user):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        entries = self._entries
+        entries.pop(user_id, None)
+        entries[user_id] = (self._clock() + ttl, user)
+        while len(entries) > self.max_size:
+            del entries[next(iter(entries))]
+            self.evictions += 1
@@ -0,0 +1,73 @@
+"""Background upgrade of password hashes made with outdated parameters."""
+
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Rehasher:
+    """Rehashes passwords with the current hasher after a successful login.
+
+    The login that notices an outdated hash only queues the work; a single
+    background thread pays for the second KDF run. The new hash is written
+    with ``replace_password_hash``, so a password changed in the meantime
+    is never overwritten. At most ``max_pending`` upgrades are queued; the
+    rest are skipped and picked up on the user's next login. Stores that
+    reject writes with TypeError (read-only snapshots) are not retried.
+    """
+
+    def __init__(self, max_pending=1024):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="auth-rehash")
+        self._pending = set()
+        self._read_only = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def schedule(self, store, hasher, user_id, password, encoded):
+        """Queue an upgrade of ``encoded``; return False if it was skipped."""
+        with self._lock:
+            if (
+                user_id in self._pending
+                or len(self._pending) >= self.max_pending
+                or store in self._read_only
+            ):
+                self.skipped += 1
+                return False
+            self._pending.add(user_id)
+            self.scheduled += 1
+        self._pool.submit(self._upgrade, store, hasher, user_id, password, encoded)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _upgrade(self, store, hasher, user_id, password, encoded):
+        try:
+            replaced = store.replace_password_hash(
+                user_id, encoded, hasher.hash(password)
+            )
+        except TypeError:
+            replaced = False
+            self._read_only.add(store)
+        except Exception:
+            replaced = False
+        with self._lock:
+            self._pending.discard(user_id)
+            if replaced:
+                self.completed += 1
+            else:
+                self.failed += 1
@@ -0,0 +1,177 @@
+"""Hot reload of the user table by building a new store and swapping it in."""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import auth
+import importer
+from snapshot import SnapshotStore
+from user_store import UserStore
+
+
+@dataclass(slots=True)
+class ReloadStats:
+    """Outcome of one reload. RSS figures are in bytes, None where the
+    platform does not expose them; ``error`` is set if the load failed."""
+
+    started: float
+    duration: float = 0.0
+    users: int = 0
+    rss_before: int = None
+    rss_peak: int = None
+    rss_after: int = None
+    error: str = None
+
+
+class Reloader:
+    """Builds a fresh user store off to the side and publishes it in one step.
+
+    ``load`` returns a complete new backend; ``publish`` installs it, by
+    default with ``auth.set_store``. That is a single reference
+    assignment, and every auth call reads the store reference once, so
+    the swap is RCU-style: calls already running finish on the old store
+    without taking a lock, new calls see the new one, and the old store
+    is freed (a SnapshotStore unmapped) when the last of them drops it. A
+    load that raises leaves the old store in place.
+
+    ``start`` runs reloads on a daemon thread: whenever ``watch`` (a path)
+    changes, or every ``interval`` seconds if there is nothing to watch,
+    and at once after ``request``. Peak RSS during a reload, when old and
+    new tables coexist, is sampled from /proc every few milliseconds.
+    """
+
+    def __init__(self, load, *, publish=auth.set_store, watch=None, interval=5.0):
+        self.load = load
+        self.publish = publish
+        self.watch = watch
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.last = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._seen = _signature(watch)
+
+    def reload(self):
+        """Load and publish a new store now; return its ReloadStats."""
+        with self._lock:
+            stats = ReloadStats(time.time(), rss_before=_rss())
+            sampler = _PeakSampler()
+            start = time.perf_counter()
+            store = None
+            try:
+                store = self.load()
+                self.publish(store)
+            except Exception as exc:
+                stats.error = f"{type(exc).__name__}: {exc}"
+                self.failures += 1
+            else:
+                stats.users = len(store)
+                self.reloads += 1
+            finally:
+                stats.duration = time.perf_counter() - start
+                stats.rss_peak = sampler.stop()
+            store = None
+            stats.rss_after = _rss()
+            self.last = stats
+            return stats
+
+    def request(self):
+        """Ask the background thread to reload as soon as it can."""
+        self._wake.set()
+
+    def start(self):
+        """Start reloading in the background; see the class docstring."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="auth-reload", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            requested = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            if self.watch is not None and not requested:
+                signature = _signature(self.watch)
+                if signature == self._seen:
+                    continue
+                self._seen = signature
+            self.reload()
+
+
+def load_file(path):
+    """Return a loader for ``path``: a snapshot file is mapped, a CSV or
+    JSONL file is imported into a new frozen UserStore.
+
+    Password hashes come from the file, so hashes set through
+    ``auth.set_password`` since it was written do not survive a reload.
+    """
+
+    def load():
+        if path.endswith((".csv", ".jsonl", ".ndjson")):
+            store = UserStore(frozen=False)
+            report = importer.import_users(store, path, batch_size=50_000)
+            if report.invalid or report.duplicates:
+                line, message = (report.errors or [(None, "rejected rows")])[0]
+                raise ValueError(f"{path} line {line}: {message}")
+            store.freeze()
+            return store
+        return SnapshotStore(path)
+
+    return load
+
+
+def _signature(path):
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _rss():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class _PeakSampler:
+    """Samples RSS on a thread until ``stop``, which returns the peak."""
+
+    def __init__(self, period=0.005):
+        self.peak = _rss()
+        self._done = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, args=(period,))
+            self._thread.start()
+
+    def _run(self, period):
+        while not self._done.wait(period):
+            self.peak = max(self.peak, _rss())
+
+    def stop(self):
+        if self._thread is None:
+            return None
+        self._done.set()
+        self._thread.join()
+        return max(self.peak, _rss())
@@ -0,0 +1,146 @@
+"""Revocable server-side sessions with timing-wheel expiry."""
+
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+
+from timing_wheel import TimingWheel
+
+
+@dataclass(slots=True)
+class Session:
+    """A live session; ``expires`` is on the store's clock."""
+
+    id: str
+    user_id: int
+    expires: float
+    data: dict = field(default_factory=dict)
+
+
+class _Shard:
+    __slots__ = ("lock", "sessions", "wheel")
+
+    def __init__(self, tick, now):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.wheel = TimingWheel(tick, start=now)
+
+
+class SessionStore:
+    """Sessions keyed by opaque random ids, sharded with a lock per shard.
+
+    Each shard files its sessions in a ``TimingWheel``, so expiry costs
+    O(1) per expired session instead of a scan of the table; a shard
+    advances its wheel whenever it is touched, and ``expire()`` advances
+    them all. Lookups also compare the deadline directly, so a session is
+    never served past ``expires`` even between wheel ticks.
+
+    A second, separately striped index maps user ids to their session ids
+    for ``revoke_user``. Locks are always taken shard first, index second;
+    ``revoke_user`` detaches the user's ids before revoking them, so a
+    session created for that user while it runs may survive.
+    """
+
+    def __init__(self, ttl=3600.0, *, shards=16, tick=1.0, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        now = clock()
+        self._shards = [_Shard(tick, now) for _ in range(shards)]
+        self._user_locks = [threading.Lock() for _ in range(shards)]
+        self._by_user = [{} for _ in range(shards)]
+
+    def __len__(self):
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def create(self, user_id, ttl=None, data=None):
+        """Start a session for ``user_id`` and return its id."""
+        session_id = secrets.token_urlsafe(24)
+        expires = self._clock() + (self.ttl if ttl is None else ttl)
+        session = Session(session_id, user_id, expires, data or {})
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._advance(shard)
+            shard.sessions[session_id] = session
+            shard.wheel.schedule(session_id, expires)
+            index, lock = self._user_index(user_id)
+            with lock:
+                index.setdefault(user_id, set()).add(session_id)
+        return session_id
+
+    def get(self, session_id):
+        """Return the live Session for ``session_id``, or None."""
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._advance(shard)
+            session = shard.sessions.get(session_id)
+            if session is None or session.expires <= self._clock():
+                return None
+            return session
+
+    def touch(self, session_id, ttl=None):
+        """Push the expiry of a live session out by ``ttl``; False if gone."""
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._advance(shard)
+            session = shard.sessions.get(session_id)
+            now = self._clock()
+            if session is None or session.expires <= now:
+                return False
+            session.expires = now + (self.ttl if ttl is None else ttl)
+            shard.wheel.schedule(session_id, session.expires)
+            return True
+
+    def revoke(self, session_id):
+        """End a session; return False if it did not exist."""
+        shard = self._shard(session_id)
+        with shard.lock:
+            return self._remove(shard, session_id) is not None
+
+    def revoke_user(self, user_id):
+        """End every session of ``user_id``; return how many were ended."""
+        index, lock = self._user_index(user_id)
+        with lock:
+            session_ids = index.pop(user_id, ())
+        return sum(self.revoke(session_id) for session_id in session_ids)
+
+    def sessions_of(self, user_id):
+        """Return the ids of the sessions ``user_id`` currently holds."""
+        index, lock = self._user_index(user_id)
+        with lock:
+            return list(index.get(user_id, ()))
+
+    def expire(self):
+        """Drop every session past its deadline; return how many went."""
+        expired = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired += self._advance(shard)
+        return expired
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _user_index(self, user_id):
+        stripe = hash(user_id) % len(self._user_locks)
+        return self._by_user[stripe], self._user_locks[stripe]
+
+    def _advance(self, shard):
+        fired = shard.wheel.advance(self._clock())
+        for session_id in fired:
+            self._remove(shard, session_id)
+        return len(fired)
+
+    def _remove(self, shard, session_id):
+        session = shard.sessions.pop(session_id, None)
+        if session is None:
+            return None
+        shard.wheel.cancel(session_id)
+        index, lock = self._user_index(session.user_id)
+        with lock:
+            ids = index.get(session.user_id)
+            if ids is not None:
+                ids.discard(session_id)
+                if not ids:
+                    del index[session.user_id]
+        return session
@@ -0,0 +1,462 @@
+"""User store partitioned across local worker processes by consistent hashing.
+
+Each shard is a child process holding a UserStore for its part of the
+table. The parent keeps a HashRing and routes every call over a pipe to
+the shard owning the id; batched calls go to all their shards at once
+and are gathered afterwards, so the shards work in parallel.
+"""
+
+import bisect
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import struct
+import threading
+from collections import Counter
+
+from user_store import User, UserStore, normalize_email, resolve_many
+
+_KEY = struct.Struct(">q")
+
+
+class HashRing:
+    """Consistent-hash ring placing user ids on named nodes.
+
+    Each node owns ``vnodes`` points on a 64-bit ring, hashed from its
+    name with 8-byte BLAKE2b, and an id belongs to the node owning the
+    first point at or after the id's own hash. Adding a node to N others
+    moves about 1/(N+1) of the ids, all of them to the new node; removing
+    one moves only its own ids. More virtual nodes even out the share
+    each node gets. Rings are immutable: ``with_node`` and
+    ``without_node`` return new ones.
+    """
+
+    def __init__(self, nodes=(), vnodes=128):
+        self.vnodes = vnodes
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted(
+            (_hash(f"{node}#{i}".encode()), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, user_id):
+        """Return the node that owns ``user_id``."""
+        if not self._owners:
+            raise LookupError("hash ring has no nodes")
+        i = bisect.bisect_left(self._points, _key_hash(user_id))
+        return self._owners[i if i < len(self._owners) else 0]
+
+    def with_node(self, node):
+        return HashRing(self.nodes + (node,), self.vnodes)
+
+    def without_node(self, node):
+        return HashRing([n for n in self.nodes if n != node], self.vnodes)
+
+
+class ShardedStore:
+    """User backend spread over ``shards`` worker processes.
+
+    ``get``, ``password_hash`` and the writes go to the one shard that
+    owns the id. ``get_many`` sends each shard its share of the ids in
+    one message, then collects the replies; name and email lookups,
+    ``scan`` and ``len`` ask every shard. Each shard has one pipe, used by
+    one caller at a time, so threads calling into different shards run
+    in parallel and those hitting the same shard queue.
+
+    Names and emails stay unique across shards: ``add`` and ``add_many``
+    check them with every shard before inserting, under a lock that
+    serialises writes. A batch spanning shards is all or none; the
+    shards that took their part are rolled back if another refuses.
+
+    ``add_shard`` and ``remove_shard`` copy the users that change owner,
+    switch to the new ring, and only then delete the old copies, so
+    reads carry on throughout. A lookup that raced the switch and found
+    nothing is retried on the new ring.
+
+    A shard whose worker dies fails its calls with ConnectionError; the
+    replies other shards owe a failed batch are still read, so they stay
+    usable. Workers are started with the ``spawn`` method unless
+    ``context`` names another; call ``close`` to stop them.
+    """
+
+    def __init__(self, shards=4, users=(), *, vnodes=128, context=None):
+        self._context = context or multiprocessing.get_context("spawn")
+        self._shards = {}
+        self._serial = itertools.count()
+        self._write_lock = threading.Lock()
+        try:
+            nodes = [self._spawn() for _ in range(shards)]
+            self._ring = HashRing(nodes, vnodes)
+            users = iter(users)
+            while batch := list(itertools.islice(users, 50_000)):
+                self.add_many(batch)
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self):
+        return sum(self._broadcast("__len__"))
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __iter__(self):
+        after = None
+        while users := self.scan(after, 1000):
+            yield from users
+            after = users[-1].id
+
+    @property
+    def nodes(self):
+        """Names of the shards, in ring order."""
+        return self._ring.nodes
+
+    def get(self, user_id):
+        return self._lookup(user_id, "get")
+
+    def get_many(self, user_ids, missing="none"):
+        user_ids = list(user_ids)
+        while True:
+            ring = self._ring
+            groups = {}
+            for user_id in dict.fromkeys(user_ids):
+                groups.setdefault(ring.node_for(user_id), []).append(user_id)
+            try:
+                replies = self._gather(
+                    [(node, "get_many", (ids,)) for node, ids in groups.items()]
+                )
+            except _Retired:
+                continue
+            found = {}
+            for ids, users in zip(groups.values(), _values(replies)):
+                found.update(zip(ids, users))
+            if ring is self._ring or None not in found.values():
+                return resolve_many(found, user_ids, missing)
+
+    def scan(self, after_id, limit):
+        pages = self._broadcast("scan", after_id, limit)
+        merged = heapq.merge(*pages, key=_user_id)
+        # A user being moved between shards is briefly on both.
+        unique = (next(same) for _, same in itertools.groupby(merged, key=_user_id))
+        return list(itertools.islice(unique, limit))
+
+    def get_by_name(self, name):
+        return _first(self._broadcast("get_by_name", name))
+
+    def get_by_email(self, email):
+        return _first(self._broadcast("get_by_email", email))
+
+    def add(self, user):
+        self.add_many([user])
+        return User.from_mapping(user)
+
+    def add_many(self, users):
+        users = [user if isinstance(user, User) else dict(user) for user in users]
+        if not users:
+            return
+        with self._write_lock:
+            self._check_unique(users)
+            ring = self._ring
+            groups = {}
+            for user in users:
+                groups.setdefault(ring.node_for(user["id"]), []).append(user)
+            calls = [(node, "add_many", (batch,)) for node, batch in groups.items()]
+            replies = self._gather(calls)
+            errors = [value for ok, value in replies if not ok]
+            if errors:
+                self._gather(
+                    [
+                        (node, "remove_many", ([user["id"] for user in batch],))
+                        for (node, _, (batch,)), (ok, _) in zip(calls, replies)
+                        if ok
+                    ]
+                )
+                raise errors[0]
+
+    def remove(self, user_id):
+        with self._write_lock:
+            return self._call(self._ring.node_for(user_id), "remove", user_id)
+
+    def password_hash(self, user_id):
+        return self._lookup(user_id, "password_hash")
+
+    def set_password_hash(self, user_id, encoded):
+        with self._write_lock:
+            node = self._ring.node_for(user_id)
+            self._call(node, "set_password_hash", user_id, encoded)
+
+    def replace_password_hash(self, user_id, old, new):
+        with self._write_lock:
+            node = self._ring.node_for(user_id)
+            return self._call(node, "replace_password_hash", user_id, old, new)
+
+    def hash_specs(self):
+        return +sum(map(Counter, self._broadcast("hash_specs")), Counter())
+
+    def add_shard(self):
+        """Start a new shard, move its share of users to it and return the
+        number moved."""
+        with self._write_lock:
+            node = self._spawn()
+            old = self._ring.nodes
+            ring = self._ring.with_node(node)
+            exports = _values(self._gather([(n, "export", (ring, n)) for n in old]))
+            self._call(node, "add_many", [user for part in exports for user in part])
+            self._ring = ring
+            self._gather(
+                [
+                    (n, "remove_many", ([user["id"] for user in part],))
+                    for n, part in zip(old, exports)
+                ]
+            )
+            return sum(map(len, exports))
+
+    def remove_shard(self, node):
+        """Move the users of shard ``node`` to the others, stop it and return
+        the number moved."""
+        with self._write_lock:
+            if node not in self._ring.nodes or len(self._ring.nodes) == 1:
+                raise ValueError(f"cannot remove shard {node!r}")
+            ring = self._ring.without_node(node)
+            users = self._call(node, "export", ring, node)
+            groups = {}
+            for user in users:
+                groups.setdefault(ring.node_for(user["id"]), []).append(user)
+            _values(
+                self._gather(
+                    [(n, "add_many", (part,)) for n, part in groups.items()]
+                )
+            )
+            self._ring = ring
+            self._stop(self._shards.pop(node))
+            return len(users)
+
+    def close(self):
+        """Stop every worker process."""
+        shards, self._shards = self._shards, {}
+        for shard in shards.values():
+            self._stop(shard)
+
+    def _lookup(self, user_id, op):
+        while True:
+            ring = self._ring
+            try:
+                value = self._call(ring.node_for(user_id), op, user_id)
+            except _Retired:
+                continue
+            if value is not None or ring is self._ring:
+                return value
+
+    def _broadcast(self, op, *args):
+        while True:
+            try:
+                replies = self._gather([(n, op, args) for n in self._ring.nodes])
+            except _Retired:
+                continue
+            return _values(replies)
+
+    def _check_unique(self, users):
+        names, emails = set(), set()
+        for user in users:
+            email = normalize_email(user["email"])
+            if user["name"] in names:
+                raise ValueError(f"duplicate user name {user['name']!r}")
+            if email in emails:
+                raise ValueError(f"duplicate user email {user['email']!r}")
+            names.add(user["name"])
+            emails.add(email)
+        for taken in self._broadcast("taken", names, emails):
+            if taken:
+                field, value = taken[0]
+                raise ValueError(f"duplicate user {field} {value!r}")
+
+    def _call(self, node, op, *args):
+        shard = self._shards.get(node)
+        if shard is None:
+            raise _Retired
+        with shard.lock:
+            _check(shard)
+            _send(shard, op, args)
+            ok, value = _recv(shard)
+        if not ok:
+            raise value
+        return value
+
+    def _gather(self, calls):
+        # Every shard appears at most once in ``calls``. Locks are taken in
+        # name order so concurrent gathers cannot deadlock. Once a request
+        # is sent its reply is read even if another shard fails, so no
+        # reply is left in a pipe for the next caller.
+        shards = [self._shards.get(node) for node, _, _ in calls]
+        if None in shards:
+            raise _Retired
+        locked = []
+        try:
+            for shard in sorted(shards, key=lambda shard: shard.name):
+                shard.lock.acquire()
+                locked.append(shard)
+                _check(shard)
+            sent, replies, error = [], [], None
+            for shard, (_, op, args) in zip(shards, calls):
+                try:
+                    _send(shard, op, args)
+                except BaseException as exc:
+                    error = exc
+                    break
+                sent.append(shard)
+            for shard in sent:
+                try:
+                    replies.append(_recv(shard))
+                except BaseException as exc:
+                    error = error or exc
+            if error is not None:
+                raise error
+            return replies
+        finally:
+            for shard in locked:
+                shard.lock.release()
+
+    def _spawn(self):
+        name = f"shard-{next(self._serial)}"
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_serve, args=(child,), name=f"auth-{name}", daemon=True
+        )
+        process.start()
+        child.close()
+        self._shards[name] = _Shard(name, process, parent)
+        return name
+
+    def _stop(self, shard):
+        with shard.lock:
+            conn, shard.conn = shard.conn, None
+            if conn is not None:
+                try:
+                    conn.send((None, ()))
+                except OSError:
+                    pass
+                conn.close()
+        shard.process.join(5)
+        if shard.process.is_alive():
+            shard.process.kill()
+
+
+class _Shard:
+    __slots__ = ("name", "process", "conn", "lock", "broken")
+
+    def __init__(self, name, process, conn):
+        self.name = name
+        self.process = process
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.broken = False
+
+
+class _Retired(Exception):
+    """The call was routed to a shard that has since been removed."""
+
+
+def _check(shard):
+    if shard.conn is None:
+        if shard.broken:
+            raise ConnectionError(f"{shard.name} worker is gone")
+        raise _Retired
+
+
+def _send(shard, op, args):
+    try:
+        shard.conn.send((op, args))
+    except OSError:
+        _break(shard)
+        raise
+
+
+def _recv(shard):
+    try:
+        return shard.conn.recv()
+    except EOFError as exc:
+        _break(shard)
+        raise ConnectionError(f"{shard.name} worker exited") from exc
+    except BaseException:
+        # The pipe may now hold part of a reply; it cannot be read again.
+        _break(shard)
+        raise
+
+
+def _break(shard):
+    shard.broken = True
+    conn, shard.conn = shard.conn, None
+    conn.close()
+
+
+def _serve(conn):
+    store = UserStore(frozen=False)
+    ops = {"taken": _taken, "export": _export, "remove_many": _remove_many}
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            return
+        if op is None:
+            return
+        try:
+            if op in ops:
+                value = ops[op](store, *args)
+            else:
+                value = getattr(store, op)(*args)
+        except Exception as exc:
+            conn.send((False, exc))
+        else:
+            conn.send((True, value))
+
+
+def _taken(store, names, emails):
+    taken = [("name", n) for n in names if store.get_by_name(n) is not None]
+    taken += [("email", e) for e in emails if store.get_by_email(e) is not None]
+    return taken
+
+
+def _export(store, ring, node):
+    # Users ``node`` no longer owns under ``ring``, with their hashes.
+    return [
+        dict(user.as_dict(), password_hash=store.password_hash(user.id))
+        for user in store
+        if ring.node_for(user.id) != node
+    ]
+
+
+def _remove_many(store, user_ids):
+    for user_id in user_ids:
+        if user_id in store:
+            store.remove(user_id)
+
+
+def _values(replies):
+    for ok, value in replies:
+        if not ok:
+            raise value
+    return [value for _, value in replies]
+
+
+def _first(values):
+    return next((value for value in values if value is not None), None)
+
+
+def _user_id(user):
+    return user.id
+
+
+def _key_hash(user_id):
+    try:
+        data = _KEY.pack(user_id)
+    except struct.error:
+        data = repr(user_id).encode()
+    return _hash(data)
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
@@ -0,0 +1,364 @@
+"""Local auth server on a Unix socket, for processes that do not embed auth.py.
+
+::
+
+    python -m sidecar /run/auth.sock --users users.snap
+
+Every message is a frame::
+
+    length: u32 | request id: u32 | code: u8 | body
+
+``length`` counts the bytes after itself. Requests carry an opcode and
+replies a status as ``code``; a reply echoes its request's id. Integers
+are big-endian and strings are UTF-8 with a u16 byte-length prefix.
+
+=================  ====================================  ==========================
+request            body                                  OK reply body
+=================  ====================================  ==========================
+1 AUTHENTICATE     username: str, password: str          u8 1 or 0
+2 GET_USER         id: i64                               u8 present, then user
+3 GET_USERS        count: u32, count x id: i64           count: u32, count x
+                                                         (u8 present, then user)
+=================  ====================================  ==========================
+
+A user is ``id: i64, name: str, email: str``. The statuses are 0 OK, 1
+ERROR, 2 BUSY (the auth executor is full) and 3 THROTTLED; the body of
+the last three is a message string without the length prefix.
+
+A client may send any number of requests without waiting for replies.
+The server works on up to ``max_inflight`` of them per connection at
+once and replies as each finishes, so replies can come back out of
+order; clients match them to requests by id. A request keeps its slot
+until its reply has drained to the socket, so a client that stops
+reading stops the server reading its requests. A client may shut down
+its write side after its last request and still gets every reply.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import struct
+
+import auth
+import reload
+from backends import SQLiteBackend
+from batch_loader import UserLoader
+from bounded_executor import BoundedExecutor, BusyError
+from throttle import ThrottledError
+from user_store import User
+
+AUTHENTICATE, GET_USER, GET_USERS = 1, 2, 3
+OK, ERROR, BUSY, THROTTLED = 0, 1, 2, 3
+MAX_FRAME = 16 << 20
+
+_HEADER = struct.Struct(">IIB")
+_ID = struct.Struct(">q")
+_COUNT = struct.Struct(">I")
+_LEN = struct.Struct(">H")
+
+
+class SidecarError(RuntimeError):
+    """The server answered a request with an ERROR status."""
+
+
+class SidecarServer:
+    """Serves ``auth`` over the sidecar protocol on the socket at ``path``.
+
+    Logins go through ``auth.authenticate_async``, so hashing runs on the
+    bounded async executor and a full queue answers BUSY. Single-user
+    lookups share a ``batch_loader.UserLoader``: GET_USER requests that
+    arrive together, pipelined on one connection or spread over many,
+    become one ``get_many`` on the store. GET_USERS is one ``get_many``.
+    """
+
+    def __init__(self, path, *, max_inflight=1024, loader=None):
+        self.path = path
+        self.max_inflight = max_inflight
+        self.loader = loader or UserLoader()
+        self.requests = 0
+        self._server = None
+        self._writers = set()
+        self._handlers = {
+            AUTHENTICATE: self._authenticate,
+            GET_USER: self._get_user,
+            GET_USERS: self._get_users,
+        }
+
+    async def start(self):
+        """Start listening; a stale socket file at ``path`` is replaced."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, self.path)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    @property
+    def connections(self):
+        return len(self._writers)
+
+    async def close(self):
+        """Stop listening and drop every open connection."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            os.unlink(self.path)
+
+    async def _serve(self, reader, writer):
+        self._writers.add(writer)
+        slots = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    length, request_id, op = _HEADER.unpack(
+                        await reader.readexactly(_HEADER.size)
+                    )
+                    if not 5 <= length <= MAX_FRAME:
+                        break
+                    body = await reader.readexactly(length - 5)
+                except asyncio.IncompleteReadError:
+                    # The client is done sending; answer what it sent.
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    break
+                except ConnectionError:
+                    break
+                await slots.acquire()
+                task = asyncio.create_task(
+                    self._answer(writer, write_lock, slots, request_id, op, body)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self._writers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _answer(self, writer, write_lock, slots, request_id, op, body):
+        # The slot is held until the reply is written and drained, so a
+        # client that reads slowly holds at most ``max_inflight`` replies.
+        self.requests += 1
+        try:
+            try:
+                handler = self._handlers.get(op)
+                if handler is None:
+                    raise ValueError(f"unknown opcode {op}")
+                status, payload = OK, await handler(body)
+            except BusyError as exc:
+                status, payload = BUSY, str(exc).encode()
+            except ThrottledError as exc:
+                status, payload = THROTTLED, str(exc).encode()
+            except Exception as exc:
+                status, payload = ERROR, f"{type(exc).__name__}: {exc}".encode()
+            frame = _HEADER.pack(len(payload) + 5, request_id, status) + payload
+            async with write_lock:
+                if not writer.is_closing():
+                    writer.write(frame)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    async def _authenticate(self, body):
+        username, offset = _read_str(body, 0)
+        password, _ = _read_str(body, offset)
+        ok = await auth.authenticate_async(username, password)
+        return b"\x01" if ok else b"\x00"
+
+    async def _get_user(self, body):
+        (user_id,) = _ID.unpack(body)
+        return _pack_user(await self.loader.load(user_id))
+
+    async def _get_users(self, body):
+        (count,) = _COUNT.unpack_from(body)
+        if len(body) != 4 + 8 * count:
+            raise ValueError("GET_USERS body does not match its count")
+        ids = struct.unpack_from(f">{count}q", body, 4)
+        users = await auth.get_users_async(ids)
+        return b"".join([_COUNT.pack(count), *map(_pack_user, users)])
+
+
+class SidecarClient:
+    """Asyncio client for a SidecarServer, with a pool of connections.
+
+    Calls are spread round-robin over ``pool_size`` connections, opened
+    on first use. Each connection multiplexes: any number of calls can
+    be in flight on it, and one reader task hands each reply to the call
+    with its request id. Errors come back as the exceptions auth itself
+    raises (BusyError, ThrottledError), or SidecarError for the rest; a
+    lost connection fails its pending calls with ConnectionError and is
+    reopened by the next call.
+    """
+
+    def __init__(self, path, *, pool_size=4):
+        self.path = path
+        self._connections = [None] * pool_size
+        self._next = itertools.cycle(range(pool_size))
+        self._ids = itertools.count(1)
+
+    async def authenticate(self, username, password):
+        body = _pack_str(username) + _pack_str(password)
+        return (await self._request(AUTHENTICATE, body)) == b"\x01"
+
+    async def get_user(self, user_id):
+        return _read_user(await self._request(GET_USER, _ID.pack(user_id)), 0)[0]
+
+    async def get_users(self, user_ids):
+        user_ids = list(user_ids)
+        body = _COUNT.pack(len(user_ids)) + struct.pack(f">{len(user_ids)}q", *user_ids)
+        payload = await self._request(GET_USERS, body)
+        (count,) = _COUNT.unpack_from(payload)
+        users, offset = [], 4
+        for _ in range(count):
+            user, offset = _read_user(payload, offset)
+            users.append(user)
+        return users
+
+    async def close(self):
+        for connection in self._connections:
+            if connection is not None:
+                await connection.close()
+        self._connections = [None] * len(self._connections)
+
+    async def _request(self, op, body):
+        slot = next(self._next)
+        connection = self._connections[slot]
+        if connection is None or connection.closed:
+            connection = self._connections[slot] = _Connection(self.path)
+        request_id = next(self._ids) & 0xFFFFFFFF
+        status, payload = await connection.request(request_id, op, body)
+        if status == OK:
+            return payload
+        message = payload.decode()
+        if status == BUSY:
+            raise BusyError(message)
+        if status == THROTTLED:
+            raise ThrottledError(message)
+        raise SidecarError(message)
+
+
+class _Connection:
+    """One client socket: writes frames, and a reader task resolves the
+    future waiting for each reply."""
+
+    def __init__(self, path):
+        self.closed = False
+        self._pending = {}
+        self._opened = asyncio.ensure_future(asyncio.open_unix_connection(path))
+        self._writer = None
+        self._reader_task = None
+
+    async def request(self, request_id, op, body):
+        if self._writer is None:
+            try:
+                reader, self._writer = await asyncio.shield(self._opened)
+            except OSError:
+                self.closed = True
+                raise
+            if self._reader_task is None:
+                self._reader_task = asyncio.create_task(self._read(reader))
+        if self.closed:
+            raise ConnectionError("sidecar connection closed")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(_HEADER.pack(len(body) + 5, request_id, op) + body)
+            await self._writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        self.closed = True
+        try:
+            _, writer = await self._opened
+        except OSError:
+            return
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    async def _read(self, reader):
+        error = ConnectionError("sidecar connection closed")
+        try:
+            while True:
+                length, request_id, status = _HEADER.unpack(
+                    await reader.readexactly(_HEADER.size)
+                )
+                payload = await reader.readexactly(length - 5)
+                future = self._pending.get(request_id)
+                if future is not None and not future.done():
+                    future.set_result((status, payload))
+        except (asyncio.IncompleteReadError, OSError) as exc:
+            error = ConnectionError(f"sidecar connection lost: {exc}")
+        finally:
+            self.closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+
+def _pack_str(text):
+    data = text.encode()
+    return _LEN.pack(len(data)) + data
+
+
+def _read_str(data, offset):
+    (length,) = _LEN.unpack_from(data, offset)
+    offset += 2
+    end = offset + length
+    if end > len(data):
+        raise ValueError("string runs past the end of the frame")
+    return bytes(data[offset:end]).decode(), end
+
+
+def _pack_user(user):
+    if user is None:
+        return b"\x00"
+    return b"\x01" + _ID.pack(user.id) + _pack_str(user.name) + _pack_str(user.email)
+
+
+def _read_user(data, offset):
+    if data[offset] == 0:
+        return None, offset + 1
+    (user_id,) = _ID.unpack_from(data, offset + 1)
+    name, offset = _read_str(data, offset + 9)
+    email, offset = _read_str(data, offset)
+    return User(user_id, name, email), offset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sidecar")
+    parser.add_argument("socket", help="path of the Unix socket to listen on")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--users", help="snapshot, CSV or JSONL file to serve")
+    source.add_argument("--sqlite", help="database written by backends.SQLiteBackend")
+    parser.add_argument("--max-inflight", type=int, default=1024)
+    parser.add_argument("--workers", type=int, help="auth executor threads")
+    parser.add_argument("--max-pending", type=int, help="auth executor queue")
+    args = parser.parse_args(argv)
+
+    auth.set_async_executor(BoundedExecutor(args.workers, args.max_pending))
+
+    if args.users:
+        auth.set_store(reload.load_file(args.users)())
+    elif args.sqlite:
+        auth.set_store(SQLiteBackend(args.sqlite))
+    server = SidecarServer(args.socket, max_inflight=args.max_inflight)
+    print(f"serving {len(auth.get_store()):,} users on {args.socket}")
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
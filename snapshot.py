@@ -0,0 +1,306 @@
+"""Read-only, memory-mapped user snapshots.
+
+A snapshot file is laid out as::
+
+    header | records | string heap | id index | name table | email table
+
+Records are fixed-width (id plus offset/length pairs into the heap for
+name, email and password hash) in insertion order. The id index is two
+parallel arrays, ids sorted ascending and the matching record numbers,
+searched with bisect. The name and email tables are open-addressing hash
+tables of record numbers plus one (0 marks an empty slot), hashed with
+8-byte BLAKE2b so every process agrees on the layout; emails are hashed
+in their ``normalize_email`` form. All integers are
+little-endian.
+
+Lookups read straight from the mapping, so every worker that opens the
+same file shares one copy in the page cache. Build files with
+``python -m snapshot build``.
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+
+from passwords import spec_of
+from user_store import User, normalize_email, resolve_many
+
+MAGIC = b"AUTHSNP1"
+VERSION = 2
+_HEADER = struct.Struct("<8sIIQQQQQQQ")
+_RECORD = struct.Struct("<qQIQIQI")
+
+
+class SnapshotStore:
+    """Read-only user backend serving lookups from a mapped snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._specs = None
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            record_size,
+            self._count,
+            self._records,
+            self._heap,
+            ids,
+            numbers,
+            names,
+            emails,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != _RECORD.size:
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} user snapshot")
+        view = memoryview(self._mm)
+        count = self._count
+        self._ids = view[ids : ids + 8 * count].cast("q")
+        self._numbers = view[numbers : numbers + 4 * count].cast("I")
+        self._name_slots = view[names:emails].cast("I")
+        self._email_slots = view[emails:].cast("I")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, user_id):
+        return self._find(user_id) is not None
+
+    def __iter__(self):
+        return (self._user(self._numbers[i]) for i in range(self._count))
+
+    def close(self):
+        self._ids.release()
+        self._numbers.release()
+        self._name_slots.release()
+        self._email_slots.release()
+        self._mm.close()
+
+    def get(self, user_id):
+        number = self._find(user_id)
+        return None if number is None else self._user(number)
+
+    def get_many(self, user_ids, missing="none"):
+        return resolve_many(_Lookup(self), user_ids, missing)
+
+    def scan(self, after_id, limit):
+        ids = self._ids
+        start = 0 if after_id is None else bisect.bisect_right(ids, after_id)
+        numbers = self._numbers[start : start + limit]
+        return [self._user(number) for number in numbers]
+
+    def get_by_name(self, name):
+        number = self._probe(self._name_slots, name, 1, None)
+        return None if number is None else self._user(number)
+
+    def get_by_email(self, email):
+        key = normalize_email(email)
+        number = self._probe(self._email_slots, key, 3, normalize_email)
+        return None if number is None else self._user(number)
+
+    def password_hash(self, user_id):
+        number = self._find(user_id)
+        return None if number is None else self._password(number)
+
+    def add(self, user):
+        raise TypeError("SnapshotStore is read-only")
+
+    add_many = remove = set_password_hash = replace_password_hash = add
+
+    def hash_specs(self):
+        if self._specs is None:
+            specs = Counter()
+            for number in range(self._count):
+                encoded = self._password(number)
+                if encoded is not None:
+                    specs[spec_of(encoded)] += 1
+            self._specs = specs
+        return dict(self._specs)
+
+    def _find(self, user_id):
+        ids = self._ids
+        try:
+            i = bisect.bisect_left(ids, user_id)
+        except TypeError:
+            # Not a number, so not an id here: None, as other backends say.
+            return None
+        if i < len(ids) and ids[i] == user_id:
+            return self._numbers[i]
+        return None
+
+    def _probe(self, slots, key, field, normalize):
+        mask = len(slots) - 1
+        slot = _hash(key.encode("utf-8")) & mask
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return None
+            fields = _RECORD.unpack_from(
+                self._mm, self._records + (entry - 1) * _RECORD.size
+            )
+            stored = self._string(fields[field], fields[field + 1])
+            if (stored if normalize is None else normalize(stored)) == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def _user(self, number):
+        user_id, name, name_len, email, email_len, _, _ = _RECORD.unpack_from(
+            self._mm, self._records + number * _RECORD.size
+        )
+        return User(
+            user_id, self._string(name, name_len), self._string(email, email_len)
+        )
+
+    def _password(self, number):
+        fields = _RECORD.unpack_from(self._mm, self._records + number * _RECORD.size)
+        return self._string(fields[5], fields[6]) if fields[6] else None
+
+    def _string(self, offset, length):
+        start = self._heap + offset
+        return self._mm[start : start + length].decode("utf-8")
+
+
+class _Lookup:
+    """Adapts a SnapshotStore to the mapping interface resolve_many expects."""
+
+    __slots__ = ("get",)
+
+    def __init__(self, store):
+        self.get = store.get
+
+    def __getitem__(self, user_id):
+        user = self.get(user_id)
+        if user is None:
+            raise KeyError(user_id)
+        return user
+
+
+def write_snapshot(path, users):
+    """Write ``users`` to a snapshot at ``path``, replacing it atomically.
+
+    ``users`` yields mappings with ``id``, ``name``, ``email`` and an
+    optional ``password_hash``. Records and the string heap are streamed to
+    disk; only the index arrays and the sort order, a few tens of bytes per
+    user, are held in memory.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    ids = array("q")
+    name_hashes = array("Q")
+    email_hashes = array("Q")
+    with (
+        tempfile.NamedTemporaryFile(dir=directory, delete=False) as out,
+        tempfile.TemporaryFile(dir=directory) as heap,
+    ):
+        try:
+            out.write(bytes(_HEADER.size))
+            heap_size = 0
+            for user in users:
+                fields = [user["id"]]
+                for key in ("name", "email", "password_hash"):
+                    data = (user.get(key) or "").encode("utf-8")
+                    heap.write(data)
+                    fields += (heap_size, len(data))
+                    heap_size += len(data)
+                out.write(_RECORD.pack(*fields))
+                ids.append(user["id"])
+                name_hashes.append(_hash(user["name"].encode("utf-8")))
+                email_key = normalize_email(user["email"])
+                email_hashes.append(_hash(email_key.encode("utf-8")))
+
+            count = len(ids)
+            records = _HEADER.size
+            heap_start = records + count * _RECORD.size
+            heap.seek(0)
+            while chunk := heap.read(1 << 20):
+                out.write(chunk)
+            _pad(out)
+
+            order = sorted(range(count), key=ids.__getitem__)
+            sorted_ids = array("q", (ids[i] for i in order))
+            if any(a == b for a, b in zip(sorted_ids, sorted_ids[1:])):
+                raise ValueError("duplicate user id in snapshot input")
+            offsets = []
+            for section in (
+                sorted_ids,
+                array("I", order),
+                _build_table(name_hashes, "name"),
+                _build_table(email_hashes, "email"),
+            ):
+                offsets.append(out.tell())
+                section.tofile(out)
+                _pad(out)
+            out.seek(0)
+            out.write(
+                _HEADER.pack(
+                    MAGIC, VERSION, _RECORD.size, count, records, heap_start, *offsets
+                )
+            )
+            out.flush()
+            os.fsync(out.fileno())
+        except BaseException:
+            os.unlink(out.name)
+            raise
+    os.replace(out.name, path)
+
+
+def _build_table(hashes, label):
+    capacity = 1 << max(3, (2 * len(hashes)).bit_length())
+    mask = capacity - 1
+    slots = array("I", bytes(4 * capacity))
+    for number, value in enumerate(hashes):
+        slot = value & mask
+        while slots[slot]:
+            if hashes[slots[slot] - 1] == value:
+                raise ValueError(f"duplicate user {label} in snapshot input")
+            slot = (slot + 1) & mask
+        slots[slot] = number + 1
+    return slots
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _pad(f):
+    f.write(bytes(-f.tell() % 8))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a snapshot file")
+    build.add_argument("output")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jsonl", help="one user object per line ('-' for stdin)")
+    source.add_argument("--sqlite", help="database written by backends.SQLiteBackend")
+    args = parser.parse_args(argv)
+
+    if args.jsonl:
+        stream = sys.stdin if args.jsonl == "-" else open(args.jsonl, encoding="utf-8")
+        with stream:
+            users = (json.loads(line) for line in stream if line.strip())
+            write_snapshot(args.output, users)
+    else:
+        db = sqlite3.connect(args.sqlite)
+        db.row_factory = sqlite3.Row
+        with db:
+            rows = db.execute("SELECT id, name, email, password_hash FROM users")
+            write_snapshot(args.output, (dict(row) for row in rows))
+        db.close()
+    store = SnapshotStore(args.output)
+    print(f"wrote {len(store)} users to {args.output}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
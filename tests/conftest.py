@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+import passwords  # noqa: E402
+from user_store import UserStore  # noqa: E402
+
+FAST_SPEC = "pbkdf2_sha256$i=1000"
+PASSWORD = "correct horse"
+
+
+def make_users(count):
+    return [
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def hasher():
+    return passwords.hasher_from_spec(FAST_SPEC)
+
+
+@pytest.fixture
+def store(monkeypatch, hasher):
+    """A mutable store installed in auth with a cheap hasher; user1 has
+    PASSWORD, user2 has no password. auth's globals are restored after."""
+    store = UserStore(make_users(10), frozen=False)
+    store.set_password_hash(1, hasher.hash(PASSWORD))
+    for name, value in (
+        ("_store", store),
+        ("_hasher", hasher),
+        ("_verify_cache", None),
+        ("_throttle", None),
+        ("_rehasher", None),
+        ("_latency", None),
+        ("_async_executor", None),
+    ):
+        monkeypatch.setattr(auth, name, value)
+    return store
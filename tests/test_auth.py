@@ -0,0 +1,206 @@
+import asyncio
+import threading
+
+import pytest
+
+import auth
+import passwords
+from conftest import FAST_SPEC, PASSWORD, make_users
+from latency import LatencyRecorder
+from throttle import Throttle, ThrottledError
+from user_store import UserStore
+
+
+class CountingHasher:
+    """Wraps a hasher, counting dummy verifications."""
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+        self.dummies = 0
+
+    def __getattr__(self, name):
+        return getattr(self.hasher, name)
+
+    def dummy_verify(self, password):
+        self.dummies += 1
+        return self.hasher.dummy_verify(password)
+
+
+def test_hash_round_trip(hasher):
+    encoded = hasher.hash(PASSWORD)
+    assert encoded.startswith(FAST_SPEC + "$")
+    assert passwords.spec_of(encoded) == FAST_SPEC
+    assert passwords.verify(PASSWORD, encoded)
+    assert not passwords.verify("wrong", encoded)
+
+
+def test_hashes_are_salted(hasher):
+    assert hasher.hash(PASSWORD) != hasher.hash(PASSWORD)
+
+
+def test_verify_uses_the_spec_stored_in_the_hash():
+    encoded = passwords.ScryptHasher(n=2**4).hash(PASSWORD)
+    assert passwords.verify(PASSWORD, encoded)
+    with pytest.raises(ValueError):
+        passwords.PBKDF2Hasher(1000).verify(PASSWORD, encoded)
+
+
+@pytest.mark.parametrize("spec", ["md5$x=1", "pbkdf2_sha256$i=abc", "scrypt$n=3"])
+def test_bad_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        passwords.hasher_from_spec(spec)
+
+
+def test_correct_password(store):
+    assert auth.authenticate("user1", PASSWORD) is True
+
+
+def test_wrong_password(store):
+    assert auth.authenticate("user1", "wrong") is False
+    assert auth.authenticate("user1", "") is False
+
+
+def test_unknown_user_still_pays_for_a_hash(store, monkeypatch, hasher):
+    counting = CountingHasher(hasher)
+    monkeypatch.setattr(auth, "_hasher", counting)
+    assert auth.authenticate("nobody", PASSWORD) is False
+    assert counting.dummies == 1
+
+
+def test_user_without_password_still_pays_for_a_hash(store, monkeypatch, hasher):
+    counting = CountingHasher(hasher)
+    monkeypatch.setattr(auth, "_hasher", counting)
+    assert store.password_hash(2) is None
+    assert auth.authenticate("user2", "") is False
+    assert auth.authenticate("user2", PASSWORD) is False
+    assert counting.dummies == 2
+
+
+def test_corrupt_digest_is_rejected(store, hasher):
+    spec, _, _ = hasher.hash(PASSWORD).rsplit("$", 2)
+    store.set_password_hash(1, f"{spec}$!!$??")
+    assert auth.authenticate("user1", PASSWORD) is False
+
+
+@pytest.mark.parametrize(
+    "encoded", ["garbage", "md5$x=1$aa$bb", "pbkdf2_sha256$i=abc$aa$bb"]
+)
+def test_malformed_stored_hash_never_authenticates(store, encoded):
+    store.set_password_hash(1, encoded)
+    with pytest.raises(ValueError):
+        auth.authenticate("user1", PASSWORD)
+
+
+def test_set_password(store):
+    auth.set_password(3, "s3cret")
+    assert auth.authenticate("user3", "s3cret")
+    assert not auth.authenticate("user3", PASSWORD)
+
+
+def test_authenticate_many(store):
+    pairs = [("user1", PASSWORD), ("user1", "wrong"), ("nobody", PASSWORD)]
+    assert auth.authenticate_many(pairs) == [True, False, False]
+
+
+def test_authenticate_async(store):
+    async def main():
+        return await asyncio.gather(
+            auth.authenticate_async("user1", PASSWORD),
+            auth.authenticate_async("user1", "wrong"),
+            auth.authenticate_async("nobody", PASSWORD),
+            auth.authenticate_async("user2", ""),
+        )
+
+    assert asyncio.run(main()) == [True, False, False, False]
+
+
+def test_authenticate_async_reads_the_store_off_the_loop(store, monkeypatch):
+    threads = set()
+    get_by_name = store.get_by_name
+
+    class Spy:
+        def __getattr__(self, name):
+            return getattr(store, name)
+
+        def get_by_name(self, name):
+            threads.add(threading.current_thread())
+            return get_by_name(name)
+
+    monkeypatch.setattr(auth, "_store", Spy())
+
+    async def main():
+        return await auth.authenticate_async("user1", PASSWORD)
+
+    assert asyncio.run(main())
+    assert threads and threading.main_thread() not in threads
+
+
+def test_throttle_rejects_before_hashing(store, monkeypatch):
+    throttle = Throttle(per_user=(0.001, 2), per_source=None)
+    monkeypatch.setattr(auth, "_throttle", throttle)
+    assert not auth.authenticate("user1", "wrong")
+    assert not auth.authenticate("user1", "wrong")
+    with pytest.raises(ThrottledError):
+        auth.authenticate("user1", PASSWORD)
+
+
+def test_timed_logins_record_every_phase(store, monkeypatch):
+    recorder = LatencyRecorder()
+    monkeypatch.setattr(auth, "_latency", recorder)
+    assert auth.authenticate("user1", PASSWORD)
+    assert not auth.authenticate("user1", "wrong")
+
+    async def main():
+        return await auth.authenticate_async("nobody", PASSWORD)
+
+    assert not asyncio.run(main())
+    counts = {name: snap.count for name, snap in auth.latency_stats().items()}
+    assert counts == {
+        "authenticate": 2,
+        "authenticate_async": 1,
+        "authenticate.lookup": 3,
+        "authenticate.cache": 3,
+        "authenticate.hash": 3,
+        "authenticate.failed": 2,
+    }
+
+
+def test_iter_users_pages_through_every_user(store):
+    assert [u.id for u in auth.iter_users(batch_size=3)] == list(range(10))
+    assert [u.id for u in auth.iter_users(4, batch_size=3)] == [5, 6, 7, 8, 9]
+    pages = list(auth.iter_user_pages(batch_size=5))
+    assert [[u.id for u in users] for users, _ in pages] == [
+        [0, 1, 2, 3, 4],
+        [5, 6, 7, 8, 9],
+    ]
+
+
+def test_cursor_resumes_after_its_page(store):
+    (first, cursor), *_ = auth.iter_user_pages(batch_size=4)
+    assert [u.id for u in first] == [0, 1, 2, 3]
+    assert cursor.startswith("u1.")
+    resumed = [u.id for u in auth.iter_users(batch_size=4, cursor=cursor)]
+    assert resumed == [4, 5, 6, 7, 8, 9]
+    for user_id in (-1, 0, 2**63 - 1):
+        assert auth._decode_cursor(auth._encode_cursor(user_id)) == user_id
+
+
+@pytest.mark.parametrize("cursor", ["", "garbage", "u2.AAAAAAAAAAA", "u1.!!", "u1.AA"])
+def test_invalid_cursors_are_rejected(store, cursor):
+    with pytest.raises(ValueError):
+        list(auth.iter_users(cursor=cursor))
+
+
+def test_iter_users_checks_its_arguments(store):
+    cursor = auth._encode_cursor(3)
+    with pytest.raises(ValueError):
+        list(auth.iter_users(3, cursor=cursor))
+    with pytest.raises(ValueError):
+        list(auth.iter_user_pages(batch_size=0))
+
+
+def test_scan_stays_on_the_store_it_started_on(store):
+    users = auth.iter_users(batch_size=2)
+    assert next(users).id == 0
+    auth.set_store(UserStore(make_users(3)))
+    assert [u.id for u in users] == list(range(1, 10))
@@ -0,0 +1,109 @@
+import random
+from collections import Counter
+
+import pytest
+
+from backends import SQLiteBackend
+from conftest import make_users
+from passwords import spec_of
+from user_store import UserStore
+
+SPECS = ["pbkdf2_sha256$i=1000", "pbkdf2_sha256$i=2000", "scrypt$n=16,r=8,p=1"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield UserStore(make_users(50), frozen=False)
+        return
+    backend = SQLiteBackend(str(tmp_path / "users.db"))
+    backend.add_many(make_users(50))
+    try:
+        yield backend
+    finally:
+        backend.close()
+
+
+def _encoded(spec, n):
+    return f"{spec}$c2FsdA${n:08x}"
+
+
+def _true_specs(backend):
+    hashes = (backend.password_hash(user.id) for user in backend)
+    return Counter(spec_of(encoded) for encoded in hashes if encoded)
+
+
+def test_hash_spec_counts_follow_every_write(backend):
+    rng = random.Random(1)
+    backend.add_many(
+        dict(user, password_hash=_encoded(SPECS[0], user["id"]))
+        for user in make_users(80)[50:]
+    )
+    for n in range(300):
+        user_id = rng.randrange(80)
+        if user_id not in backend:
+            continue
+        action = rng.random()
+        if action < 0.5:
+            backend.set_password_hash(user_id, _encoded(rng.choice(SPECS), n))
+        elif action < 0.8:
+            old = backend.password_hash(user_id)
+            backend.replace_password_hash(user_id, old, _encoded(rng.choice(SPECS), n))
+        elif action < 0.9:
+            assert not backend.replace_password_hash(user_id, "stale", "x$y$z$w")
+        else:
+            backend.remove(user_id)
+        assert dict(backend.hash_specs()) == dict(_true_specs(backend))
+
+
+def test_set_password_hash_on_unknown_user_changes_nothing(backend):
+    backend.set_password_hash(1, _encoded(SPECS[0], 1))
+    with pytest.raises(KeyError):
+        backend.set_password_hash(999, _encoded(SPECS[1], 2))
+    assert dict(backend.hash_specs()) == {SPECS[0]: 1}
+
+
+def test_sqlite_spec_counts_survive_reopening(tmp_path):
+    path = str(tmp_path / "users.db")
+    backend = SQLiteBackend(path)
+    backend.add_many(
+        dict(user, password_hash=_encoded(SPECS[user["id"] % 2], 0))
+        for user in make_users(10)
+    )
+    backend.close()
+    backend = SQLiteBackend(path)
+    try:
+        assert backend.hash_specs() == {SPECS[0]: 5, SPECS[1]: 5}
+    finally:
+        backend.close()
+
+
+def test_scan_pages_stay_full_after_removals(backend):
+    for user_id in range(0, 50, 3):
+        backend.remove(user_id)
+    remaining = [i for i in range(50) if i % 3]
+    pages, after = [], None
+    while page := backend.scan(after, 7):
+        pages.append([user.id for user in page])
+        after = page[-1].id
+    assert [len(page) for page in pages[:-1]] == [7] * (len(pages) - 1)
+    assert sum(pages, []) == remaining
+
+
+def test_scan_follows_interleaved_writes(backend):
+    rng = random.Random(2)
+    live = set(range(50))
+    backend.scan(None, 1)
+    for n in range(3000):
+        user_id = rng.randrange(400)
+        if user_id in live:
+            backend.remove(user_id)
+            live.remove(user_id)
+        else:
+            backend.add({"id": user_id, "name": f"n{n}", "email": f"n{n}@example.com"})
+            live.add(user_id)
+        if n % 50 == 0:
+            after = rng.choice([None, rng.randrange(400)])
+            page = [user.id for user in backend.scan(after, 25)]
+            expected = sorted(i for i in live if after is None or i > after)[:25]
+            assert page == expected
@@ -0,0 +1,23 @@
+from bloom import BloomFilteredBackend
+from conftest import make_users
+from user_store import UserStore
+
+
+def test_bloom_wrapper_rebuilds_after_removals():
+    wrapped = BloomFilteredBackend(UserStore(make_users(100), frozen=False))
+    for user_id in range(30):
+        wrapped.remove(user_id)
+    assert wrapped.rebuilds == 2
+    assert wrapped.get_by_name("user5") is None
+    assert wrapped.get_by_name("user50").id == 50
+
+
+def test_bulk_inserts_grow_the_filter_for_the_whole_batch():
+    wrapped = BloomFilteredBackend(UserStore(frozen=False))
+    wrapped.add_many(make_users(10_000))
+    wrapped.add_many(make_users(25_000)[10_000:])
+    assert wrapped.filter.capacity >= 25_000
+    assert all(wrapped.get_by_name(f"user{i}") is not None for i in range(0, 25_000, 7))
+    unknown = [f"nobody{i}" for i in range(5000)]
+    false_positives = sum(name in wrapped.filter for name in unknown)
+    assert false_positives / len(unknown) < 0.03
@@ -0,0 +1,124 @@
+import io
+import json
+
+import pytest
+
+from backends import SQLiteBackend
+from importer import import_users
+from user_store import UserStore
+
+HASH = "pbkdf2_sha256$i=1000$c2FsdA$ZGlnZXN0"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield UserStore(frozen=False)
+        return
+    backend = SQLiteBackend(str(tmp_path / "users.db"))
+    try:
+        yield backend
+    finally:
+        backend.close()
+
+
+def _csv(*rows):
+    return io.StringIO("id,name,email,password_hash\n" + "".join(rows))
+
+
+def _jsonl(*records):
+    return io.StringIO(
+        "".join(r if isinstance(r, str) else json.dumps(r) + "\n" for r in records)
+    )
+
+
+def _ids(store):
+    return sorted(user.id for user in store)
+
+
+def test_csv_import_with_invalid_rows(store):
+    source = _csv(
+        f"1,ann,ann@example.com,{HASH}\n",
+        "x,bob,bob@example.com,\n",
+        "3,,cat@example.com,\n",
+        "4,dan,not-an-address,\n",
+        "5,eve,eve@example.com,garbage\n",
+        "\n",
+        "6,fay,fay@example.com,\n",
+        f"{2**63},gus,gus@example.com,\n",
+    )
+    report = import_users(store, source, format="csv")
+    assert (report.rows, report.imported, report.invalid) == (7, 2, 5)
+    assert [line for line, _ in report.errors] == [3, 4, 5, 6, 9]
+    assert "not an integer" in report.errors[0][1]
+    assert _ids(store) == [1, 6]
+    assert store.password_hash(1) == HASH
+    assert store.password_hash(6) is None
+
+
+def test_jsonl_import_with_invalid_lines(store):
+    source = _jsonl(
+        {"id": 1, "name": "ann", "email": "ann@example.com"},
+        "\n",
+        "{not json\n",
+        "[1, 2]\n",
+        {"id": True, "name": "bob", "email": "bob@example.com"},
+        {"id": "7", "name": "cat", "email": "cat@example.com", "password_hash": HASH},
+    )
+    report = import_users(store, source, format="jsonl")
+    assert (report.rows, report.imported, report.invalid) == (5, 2, 3)
+    assert [line for line, _ in report.errors] == [3, 4, 5]
+    assert _ids(store) == [1, 7]
+    assert store.password_hash(7) == HASH
+
+
+def test_duplicates_within_a_batch_keep_the_first_row(store):
+    source = _jsonl(
+        {"id": 1, "name": "ann", "email": "ann@example.com"},
+        {"id": 1, "name": "ann2", "email": "ann2@example.com"},
+        {"id": 2, "name": "ann", "email": "bob@example.com"},
+        {"id": 3, "name": "cat", "email": "ANN@example.com"},
+        {"id": 4, "name": "dan", "email": "dan@example.com"},
+    )
+    report = import_users(store, source, format="jsonl")
+    assert (report.imported, report.duplicates, report.batches) == (2, 3, 1)
+    assert [line for line, _ in report.errors] == [2, 3, 4]
+    assert _ids(store) == [1, 4]
+    assert store.get(1).name == "ann"
+
+
+def test_duplicates_across_batches_and_existing_rows(store):
+    store.add({"id": 100, "name": "old", "email": "old@example.com"})
+    records = [
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(20)
+    ]
+    records[9] = {"id": 2, "name": "again", "email": "again@example.com"}
+    records[13] = {"id": 50, "name": "user3", "email": "x@example.com"}
+    records[17] = {"id": 51, "name": "new", "email": "OLD@example.com"}
+    records[18] = {"id": 100, "name": "dup", "email": "dup@example.com"}
+    batches = []
+    report = import_users(
+        store,
+        _jsonl(*records),
+        format="jsonl",
+        batch_size=4,
+        progress=lambda report: batches.append(report.imported),
+    )
+    assert (report.rows, report.imported, report.duplicates) == (20, 16, 4)
+    assert sorted(line for line, _ in report.errors) == [10, 14, 18, 19]
+    assert report.batches == 5 and len(batches) == 5
+    expected = [i for i in range(20) if i not in (9, 13, 17, 18)] + [100]
+    assert _ids(store) == expected
+    assert store.get(100).name == "old"
+
+
+def test_format_comes_from_the_file_name(store, tmp_path):
+    path = tmp_path / "users.jsonl"
+    path.write_text(json.dumps({"id": 1, "name": "a", "email": "a@b"}) + "\n")
+    assert import_users(store, str(path)).imported == 1
+    (tmp_path / "users.txt").write_text("")
+    with pytest.raises(ValueError):
+        import_users(store, str(tmp_path / "users.txt"))
+    with pytest.raises(ValueError):
+        import_users(store, io.StringIO(""), format="xml")
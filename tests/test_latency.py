@@ -0,0 +1,89 @@
+import random
+import threading
+
+import latency
+from latency import LatencyRecorder, bucket_bounds, bucket_index
+
+
+def _samples():
+    rng = random.Random(7)
+    exact = list(range(200)) + [2**k + d for k in range(6, 40) for d in (-1, 0, 1)]
+    return exact + [rng.randrange(1 << rng.randrange(1, 40)) for _ in range(5000)]
+
+
+def test_every_duration_falls_inside_its_bucket():
+    for ns in _samples():
+        index = bucket_index(ns)
+        low, high = bucket_bounds(index)
+        assert low <= ns < high
+        assert high - low == 1 if ns < 64 else (high - low) * 32 <= low
+
+
+def test_buckets_are_contiguous_and_clamped():
+    last = latency._BUCKETS - 1
+    for index in range(last):
+        assert bucket_bounds(index)[1] == bucket_bounds(index + 1)[0]
+    assert bucket_index(latency._MAX_NS) == last
+    assert bucket_index(10**15) == last
+
+
+def test_record_matches_bucket_index():
+    recorder = LatencyRecorder()
+    expected = [0] * latency._BUCKETS
+    for ns in _samples() + [10**15]:
+        recorder.record("op", ns)
+        expected[bucket_index(ns)] += 1
+    assert recorder.snapshot()["op"].counts == expected
+
+
+def test_percentiles_mean_and_buckets():
+    recorder = LatencyRecorder()
+    for ns in range(1, 61):
+        recorder.record("op", ns)
+    recorder.record("op", 1000)
+    snap = recorder.snapshot()["op"]
+    assert (snap.count, snap.total, snap.max) == (61, 1830 + 1000, 1000)
+    assert snap.mean == (1830 + 1000) / 61
+    assert snap.percentile(0.5) == 30
+    assert snap.percentile(0.0) == 1
+    assert snap.percentile(1.0) == 1000
+    low, high = bucket_bounds(bucket_index(1000))
+    assert low <= 1000 < high
+    buckets = list(snap.buckets())
+    assert buckets[:3] == [(2, 1), (3, 2), (4, 3)]
+    assert buckets[-1] == (high, 61)
+    assert snap.as_dict()["p99"] == 60 and snap.as_dict()["p999"] == 1000
+    assert LatencyRecorder().snapshot() == {}
+
+
+def test_snapshot_reset_starts_empty_histograms():
+    recorder = LatencyRecorder()
+    recorder.record("a", 100)
+    recorder.record("b", 200)
+    first = recorder.snapshot(reset=True)
+    assert sorted(first) == ["a", "b"] and first["a"].count == 1
+    assert recorder.snapshot() == {}
+    recorder.record("a", 300)
+    assert recorder.snapshot()["a"].total == 300
+
+
+def test_shards_of_exited_threads_are_folded():
+    recorder = LatencyRecorder()
+
+    def work(ns):
+        for _ in range(100):
+            recorder.record("op", ns)
+
+    for round_ in range(2):
+        threads = [threading.Thread(target=work, args=(ns,)) for ns in (10, 20, 30)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snap = recorder.snapshot()["op"]
+        assert snap.count == 300 * (round_ + 1)
+        assert snap.total == 6000 * (round_ + 1) and snap.max == 30
+        assert recorder._threads == []
+        assert len(recorder._retired) == 1
+    recorder.record("op", 5)
+    assert recorder.snapshot()["op"].count == 601
@@ -0,0 +1,94 @@
+import urllib.request
+
+import pytest
+
+import auth
+from conftest import PASSWORD
+from latency import LatencyRecorder
+from prometheus import BUCKETS, PrometheusExporter
+
+
+@pytest.fixture
+def recorder(store, monkeypatch):
+    recorder = LatencyRecorder()
+    monkeypatch.setattr(auth, "_latency", recorder)
+    return recorder
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def _buckets(samples, entry):
+    prefix = f'auth_call_duration_seconds_bucket{{entry="{entry}",le="'
+    return {
+        name[len(prefix) : -2]: value
+        for name, value in samples.items()
+        if name.startswith(prefix)
+    }
+
+
+def test_histogram_buckets_are_cumulative(recorder):
+    for ns in (500, 500, 3000, 40_000_000, 20_000_000_000):
+        recorder.record("get_user", ns)
+    samples = _samples(PrometheusExporter().render())
+    buckets = _buckets(samples, "get_user")
+    assert list(buckets) == [repr(le) for le in BUCKETS] + ["+Inf"]
+    assert buckets["1e-06"] == 2
+    assert buckets["2.5e-06"] == 2
+    assert buckets["5e-06"] == 3
+    assert buckets["0.025"] == 3 and buckets["0.05"] == 4
+    assert buckets["10.0"] == 4
+    assert buckets["+Inf"] == 5
+    values = list(buckets.values())
+    assert values == sorted(values)
+    entry = '{entry="get_user"}'
+    assert samples[f"auth_call_duration_seconds_count{entry}"] == 5
+    assert samples[f"auth_call_duration_seconds_sum{entry}"] == pytest.approx(
+        (1000 + 3000 + 40_000_000 + 20_000_000_000) / 1e9
+    )
+    assert samples[f"auth_calls_total{entry}"] == 5
+
+
+def test_entries_counters_and_gauges(recorder):
+    assert auth.authenticate("user1", PASSWORD)
+    assert not auth.authenticate("user1", "wrong")
+    recorder.record('odd"name', 10)
+    text = PrometheusExporter().render()
+    samples = _samples(text)
+    assert samples["auth_login_failures_total"] == 1
+    assert samples["auth_verify_cache_hits_total"] == 0
+    assert samples["auth_outdated_hashes"] == 0
+    assert samples['auth_calls_total{entry="authenticate"}'] == 2
+    assert samples['auth_calls_total{entry="odd\\"name"}'] == 1
+    assert 'entry="authenticate.failed"' not in text
+    assert "# TYPE auth_call_duration_seconds histogram\n" in text
+    assert text.count("# TYPE auth_calls_total counter\n") == 1
+
+
+def test_exporter_installs_a_recorder(store):
+    assert auth.get_latency() is None
+    PrometheusExporter()
+    assert isinstance(auth.get_latency(), LatencyRecorder)
+
+
+def test_write_and_serve_the_same_text(recorder, tmp_path):
+    recorder.record("get_user", 500)
+    exporter = PrometheusExporter()
+    path = tmp_path / "auth.prom"
+    exporter.write(str(path))
+    assert path.read_text() == exporter.render()
+    assert [p.name for p in tmp_path.iterdir()] == ["auth.prom"]
+    server = exporter.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.read().decode() == exporter.render()
+    finally:
+        server.shutdown()
+        server.server_close()
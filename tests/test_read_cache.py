@@ -0,0 +1,235 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import make_users
+from read_cache import CachedBackend
+from user_store import UserStore
+
+
+class GatedBackend:
+    """Records ``get`` and ``get_many`` calls; each reads the store, then
+    blocks until ``release`` is set."""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = 0
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def get(self, user_id):
+        self.calls += 1
+        user = self.store.get(user_id)
+        self.entered.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return user
+
+    def get_many(self, user_ids, missing="none"):
+        self.batches.append(list(user_ids))
+        users = self.store.get_many(user_ids, missing)
+        self.entered.set()
+        self.release.wait(5)
+        return users
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out waiting for callers to coalesce")
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def backend():
+    return GatedBackend(UserStore(make_users(10), frozen=False))
+
+
+def test_concurrent_thread_misses_share_one_fetch(backend):
+    cache = CachedBackend(backend)
+    backend.release.clear()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(3)))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    backend.entered.wait(5)
+    _wait_for(lambda: cache.stats()["coalesced"] == 19)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 1
+    assert [user.id for user in results] == [3] * 20
+    assert cache.get(3).id == 3
+    assert backend.calls == 1
+
+
+def test_concurrent_async_misses_share_one_fetch(backend):
+    cache = CachedBackend(backend)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_async(4) for _ in range(50)))
+
+    users = asyncio.run(main())
+    assert backend.calls == 1
+    assert {user.id for user in users} == {4}
+
+
+def test_ttl_and_negative_ttl(backend):
+    clock = Clock()
+    cache = CachedBackend(backend, ttl=10, negative_ttl=1, clock=clock)
+    assert cache.get(99) is None
+    assert cache.get(1).id == 1
+    assert backend.calls == 2
+    clock.now = 0.5
+    cache.get(99), cache.get(1)
+    assert backend.calls == 2
+    clock.now = 2
+    cache.get(99), cache.get(1)
+    assert backend.calls == 3
+    clock.now = 11
+    cache.get(1)
+    assert backend.calls == 4
+
+
+def test_writes_invalidate(backend):
+    cache = CachedBackend(backend)
+    assert cache.get(50) is None
+    cache.add({"id": 50, "name": "new", "email": "new@example.com"})
+    assert cache.get(50).name == "new"
+    cache.remove(50)
+    assert cache.get(50) is None
+
+
+def test_fetch_that_raced_a_write_is_not_cached(backend):
+    cache = CachedBackend(backend)
+    backend.release.clear()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(cache.get(5)))
+    thread.start()
+    backend.entered.wait(5)
+    cache.remove(5)
+    backend.release.set()
+    thread.join()
+    assert result[0].id == 5
+    assert cache.get(5) is None
+    assert backend.calls == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_cached(backend):
+    cache = CachedBackend(backend)
+    backend.error = RuntimeError("backend down")
+    backend.release.clear()
+    errors = []
+
+    def call():
+        try:
+            cache.get(6)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    backend.entered.wait(5)
+    _wait_for(lambda: cache.stats()["coalesced"] == 4)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 5 and backend.calls == 1
+    backend.error = None
+    assert cache.get(6).id == 6
+
+
+def test_get_many_uses_and_fills_the_cache(backend):
+    cache = CachedBackend(backend)
+    cache.get(1)
+    users = cache.get_many([1, 2, 99, 2])
+    assert [u and u.id for u in users] == [1, 2, None, 2]
+    cache.get(2)
+    assert backend.calls == 1
+    with pytest.raises(KeyError):
+        cache.get_many([1, 99], missing="raise")
+
+
+def _run_blocked(backend, cache, calls):
+    # Start each call in its own thread while the backend is held, wait
+    # until all but the first have joined a flight, then let it go.
+    backend.release.clear()
+    results = [None] * len(calls)
+
+    def run(n, call):
+        results[n] = call()
+
+    threads = [
+        threading.Thread(target=run, args=(n, call)) for n, call in enumerate(calls)
+    ]
+    threads[0].start()
+    backend.entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for(lambda: cache.stats()["coalesced"] >= len(calls) - 1)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_get_many_joins_a_get_in_flight(backend):
+    cache = CachedBackend(backend)
+    single, many = _run_blocked(
+        backend, cache, [lambda: cache.get(3), lambda: cache.get_many([3])]
+    )
+    assert single.id == 3 and [u.id for u in many] == [3]
+    assert backend.calls == 1 and backend.batches == []
+
+
+def test_concurrent_get_many_calls_share_fetches(backend):
+    cache = CachedBackend(backend)
+    first, second = _run_blocked(
+        backend,
+        cache,
+        [lambda: cache.get_many([1, 2]), lambda: cache.get_many([2, 1, 99])],
+    )
+    assert [u.id for u in first] == [1, 2]
+    assert [u and u.id for u in second] == [2, 1, None]
+    assert backend.batches == [[1, 2], [99]]
+    assert cache.get_many([1, 2, 99]) == second[1::-1] + [None]
+    assert len(backend.batches) == 2
+
+
+def test_get_joins_a_get_many_in_flight(backend):
+    cache = CachedBackend(backend)
+    many, single = _run_blocked(
+        backend, cache, [lambda: cache.get_many([5, 6]), lambda: cache.get(6)]
+    )
+    assert [u.id for u in many] == [5, 6] and single.id == 6
+    assert backend.calls == 0 and backend.batches == [[5, 6]]
+
+
+def test_eviction_keeps_max_size(backend):
+    cache = CachedBackend(backend, max_size=3)
+    for user_id in range(6):
+        cache.get(user_id)
+    stats = cache.stats()
+    assert stats["size"] == 3 and stats["evictions"] == 3
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+import auth
+from conftest import make_users
+from reload import Reloader, load_file
+from snapshot import SnapshotStore, write_snapshot
+from user_store import UserStore
+
+
+def _write_jsonl(path, users):
+    path.write_text("".join(json.dumps(user) + "\n" for user in users))
+    return str(path)
+
+
+def test_failed_load_keeps_the_old_store(store):
+    def load():
+        raise OSError("disk gone")
+
+    reloader = Reloader(load)
+    stats = reloader.reload()
+    assert stats.error == "OSError: disk gone"
+    assert (reloader.reloads, reloader.failures) == (0, 1)
+    assert reloader.last is stats
+    assert auth.get_store() is store
+
+
+def test_rejected_rows_fail_the_load(store, tmp_path):
+    users = make_users(3) + [{"id": 1, "name": "again", "email": "a@example.com"}]
+    reloader = Reloader(load_file(_write_jsonl(tmp_path / "users.jsonl", users)))
+    stats = reloader.reload()
+    assert stats.error.startswith("ValueError:") and "line 4" in stats.error
+    assert auth.get_store() is store
+
+
+def test_jsonl_load_publishes_a_frozen_store(store, tmp_path):
+    path = _write_jsonl(tmp_path / "users.jsonl", make_users(25))
+    stats = Reloader(load_file(path)).reload()
+    assert stats.error is None and stats.users == 25
+    published = auth.get_store()
+    assert isinstance(published, UserStore) and published is not store
+    assert auth.get_user(24)["name"] == "user24"
+    assert auth.get_user_by_name("user3")["id"] == 3
+
+
+def test_snapshot_load_publishes_the_mapped_file(store, tmp_path):
+    path = str(tmp_path / "users.snap")
+    write_snapshot(path, make_users(40))
+    stats = Reloader(load_file(path)).reload()
+    assert stats.error is None and stats.users == 40
+    assert isinstance(auth.get_store(), SnapshotStore)
+    assert auth.get_user(39)["email"] == "user39@example.com"
+    assert auth.get_user(40) is None
+
+
+def test_readers_never_see_a_missing_store_during_swaps(store):
+    stop = threading.Event()
+    misses = []
+    stores = [UserStore(make_users(50)) for _ in range(2)]
+    loads = iter(stores * 10)
+    auth.set_store(stores[1])
+
+    def read():
+        while not stop.is_set():
+            for user_id in range(0, 50, 7):
+                user = auth.get_user(user_id)
+                if user is None or user["id"] != user_id:
+                    misses.append(user_id)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    try:
+        reloader = Reloader(lambda: next(loads))
+        for _ in range(20):
+            assert reloader.reload().error is None
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert misses == []
+    assert reloader.reloads == 20
+
+
+def test_background_thread_reloads_on_request(store):
+    fresh = UserStore(make_users(5))
+    reloader = Reloader(lambda: fresh, interval=60)
+    reloader.start()
+    try:
+        reloader.request()
+        deadline = time.monotonic() + 5
+        while reloader.reloads == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        reloader.stop()
+    assert auth.get_store() is fresh
@@ -0,0 +1,95 @@
+import pytest
+
+import auth
+from sessions import SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def sessions(clock):
+    return SessionStore(ttl=10, shards=4, clock=clock)
+
+
+def _index_is_empty(sessions):
+    return all(not index for index in sessions._by_user)
+
+
+def test_get_stops_serving_at_the_deadline(sessions, clock):
+    session_id = sessions.create(7, data={"role": "admin"})
+    session = sessions.get(session_id)
+    assert (session.user_id, session.data) == (7, {"role": "admin"})
+    clock.now += 9.5
+    assert sessions.get(session_id) is not None
+    clock.now += 0.5
+    assert sessions.get(session_id) is None
+    clock.now += 1
+    sessions.get(session_id)
+    assert len(sessions) == 0
+    assert sessions.sessions_of(7) == [] and _index_is_empty(sessions)
+
+
+def test_expire_drops_only_sessions_past_their_deadline(sessions, clock):
+    short = [sessions.create(user_id, ttl=5) for user_id in range(20)]
+    long = [sessions.create(user_id, ttl=50) for user_id in range(20)]
+    clock.now += 6
+    assert sessions.expire() == 20
+    assert len(sessions) == 20
+    assert all(sessions.get(session_id) is None for session_id in short)
+    assert all(sessions.get(session_id) for session_id in long)
+    assert sorted(sessions.sessions_of(3)) == [long[3]]
+    clock.now += 100
+    assert sessions.expire() == 20
+    assert len(sessions) == 0 and _index_is_empty(sessions)
+
+
+def test_touch_extends_a_live_session(sessions, clock):
+    session_id = sessions.create(1)
+    clock.now += 8
+    assert sessions.touch(session_id)
+    clock.now += 8
+    assert sessions.expire() == 0
+    assert sessions.get(session_id).expires == clock.now + 2
+    assert sessions.touch(session_id, ttl=100)
+    clock.now += 99
+    assert sessions.get(session_id) is not None
+    clock.now += 2
+    assert not sessions.touch(session_id)
+    assert not sessions.touch("unknown")
+    assert len(sessions) == 0
+
+
+def test_revoke_and_revoke_user(sessions):
+    mine = [sessions.create(1) for _ in range(3)]
+    theirs = sessions.create(2)
+    assert sessions.revoke(mine[0])
+    assert not sessions.revoke(mine[0])
+    assert sorted(sessions.sessions_of(1)) == sorted(mine[1:])
+    assert sessions.revoke_user(1) == 2
+    assert sessions.revoke_user(1) == 0
+    assert all(sessions.get(session_id) is None for session_id in mine)
+    assert sessions.get(theirs).user_id == 2
+    assert sessions.sessions_of(1) == []
+    assert sessions.revoke(theirs)
+    assert _index_is_empty(sessions)
+
+
+def test_auth_sessions_need_an_existing_user(store, sessions, monkeypatch):
+    monkeypatch.setattr(auth, "_sessions", sessions)
+    with pytest.raises(KeyError):
+        auth.create_session(999)
+    session_id = auth.create_session(3)
+    assert auth.get_session(session_id).user_id == 3
+    assert auth.revoke_user_sessions(3) == 1
+    assert auth.get_session(session_id) is None
@@ -0,0 +1,138 @@
+import random
+import threading
+
+import pytest
+
+from conftest import make_users
+from sharded import HashRing, ShardedStore
+
+USERS = 2000
+
+
+@pytest.fixture
+def sharded():
+    store = ShardedStore(shards=3, users=make_users(USERS))
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+def test_ring_moves_only_the_new_nodes_share():
+    ring = HashRing(["a", "b", "c"])
+    grown = ring.with_node("d")
+    moved = [i for i in range(20_000) if ring.node_for(i) != grown.node_for(i)]
+    assert all(grown.node_for(i) == "d" for i in moved)
+    assert 0.15 < len(moved) / 20_000 < 0.35
+    assert grown.without_node("d").node_for(123) == ring.node_for(123)
+    with pytest.raises(LookupError):
+        HashRing().node_for(1)
+
+
+def test_reads_route_to_the_owning_shard(sharded):
+    assert len(sharded) == USERS
+    assert sharded.get(7).name == "user7"
+    assert sharded.get(USERS) is None
+    users = sharded.get_many([5, USERS, 1999, 5])
+    assert [u and u.id for u in users] == [5, None, 1999, 5]
+    assert sharded.get_by_name("user42").id == 42
+    assert sharded.get_by_email("USER43@example.com").id == 43
+    assert [u.id for u in sharded.scan(10, 5)] == [11, 12, 13, 14, 15]
+    assert [u.id for u in sharded] == list(range(USERS))
+
+
+def test_names_and_emails_are_unique_across_shards(sharded):
+    with pytest.raises(ValueError):
+        sharded.add({"id": USERS, "name": "user1", "email": "new@example.com"})
+    with pytest.raises(ValueError):
+        sharded.add({"id": USERS, "name": "new", "email": "User1@example.com"})
+    assert sharded.get(USERS) is None
+
+
+def test_add_many_is_all_or_none_across_shards(sharded):
+    fresh = [
+        {"id": USERS + i, "name": f"new{i}", "email": f"new{i}@example.com"}
+        for i in range(30)
+    ]
+    clash = {"id": 3, "name": "other", "email": "other@example.com"}
+    with pytest.raises(ValueError):
+        sharded.add_many(fresh + [clash])
+    assert sharded.get_many(user["id"] for user in fresh) == [None] * 30
+    assert len(sharded) == USERS
+
+
+def test_add_shard_moves_a_share_to_the_new_shard(sharded):
+    sharded.set_password_hash(11, "pbkdf2_sha256$i=1000$c2FsdA$ZGlnZXN0")
+    old_ring = sharded._ring
+    moved = sharded.add_shard()
+    new_ring = sharded._ring
+    (new,) = set(new_ring.nodes) - set(old_ring.nodes)
+    owners = {i for i in range(USERS) if new_ring.node_for(i) == new}
+    assert moved == len(owners)
+    assert 0.15 * USERS < moved < 0.35 * USERS
+    assert all(
+        old_ring.node_for(i) == new_ring.node_for(i)
+        for i in range(USERS)
+        if i not in owners
+    )
+    assert sharded._call(new, "__len__") == moved
+    assert len(sharded) == USERS
+    assert [u.id for u in sharded] == list(range(USERS))
+    assert sharded.password_hash(11) == "pbkdf2_sha256$i=1000$c2FsdA$ZGlnZXN0"
+
+
+def test_remove_shard_hands_its_users_to_the_rest(sharded):
+    node = sharded.nodes[0]
+    owned = sum(sharded._ring.node_for(i) == node for i in range(USERS))
+    assert sharded.remove_shard(node) == owned
+    assert node not in sharded.nodes
+    assert len(sharded) == USERS
+    assert sharded.get_many(range(USERS), missing="raise")
+    with pytest.raises(ValueError):
+        sharded.remove_shard(node)
+
+
+def test_readers_see_every_user_through_rebalancing(sharded):
+    stop = threading.Event()
+    misses = []
+
+    def read(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            user_id = rng.randrange(USERS)
+            if sharded.get(user_id) is None:
+                misses.append(user_id)
+            ids = rng.sample(range(USERS), 20)
+            misses.extend(i for i, u in zip(ids, sharded.get_many(ids)) if u is None)
+
+    readers = [threading.Thread(target=read, args=(seed,)) for seed in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        first = sharded.nodes[0]
+        sharded.add_shard()
+        sharded.add_shard()
+        sharded.remove_shard(first)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert misses == []
+    assert len(sharded) == USERS
+
+
+def test_a_dead_worker_does_not_leave_stale_replies(sharded):
+    dead = sharded.nodes[-1]
+    sharded._shards[dead].process.kill()
+    sharded._shards[dead].process.join()
+    with pytest.raises(ConnectionError):
+        sharded.get_many(range(300))
+    ring = sharded._ring
+    for user_id in range(300):
+        if ring.node_for(user_id) == dead:
+            with pytest.raises(ConnectionError):
+                sharded.get(user_id)
+        else:
+            assert sharded.get(user_id).id == user_id
+    with pytest.raises(ConnectionError):
+        len(sharded)
@@ -0,0 +1,136 @@
+import asyncio
+import struct
+
+import pytest
+
+import sidecar
+from batch_loader import UserLoader
+from conftest import PASSWORD
+from sidecar import SidecarClient, SidecarError, SidecarServer
+
+
+@pytest.fixture
+def serve(store, tmp_path):
+    """Run ``body(server, path)`` on a fresh event loop with a started
+    server for the ``store`` fixture's users."""
+    path = str(tmp_path / "auth.sock")
+
+    def run(body):
+        async def main():
+            server = SidecarServer(path, loader=UserLoader())
+            await server.start()
+            try:
+                return await body(server, path)
+            finally:
+                await server.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+def _frame(request_id, op, body):
+    return sidecar._HEADER.pack(len(body) + 5, request_id, op) + body
+
+
+async def _read_frames(reader):
+    frames = {}
+    while header := await reader.read(sidecar._HEADER.size):
+        header += await reader.readexactly(sidecar._HEADER.size - len(header))
+        length, request_id, status = sidecar._HEADER.unpack(header)
+        frames[request_id] = (status, await reader.readexactly(length - 5))
+    return frames
+
+
+def test_client_round_trips(serve):
+    async def body(server, path):
+        client = SidecarClient(path, pool_size=2)
+        try:
+            return await asyncio.gather(
+                client.authenticate("user1", PASSWORD),
+                client.authenticate("user1", "wrong"),
+                client.authenticate("nobody", PASSWORD),
+                client.get_user(4),
+                client.get_user(99),
+                client.get_users([3, 99, 5]),
+            )
+        finally:
+            await client.close()
+
+    good, bad, unknown, user, missing, users = serve(body)
+    assert (good, bad, unknown) == (True, False, False)
+    assert (user.id, user.name, user.email) == (4, "user4", "user4@example.com")
+    assert missing is None
+    assert [u and u.name for u in users] == ["user3", None, "user5"]
+
+
+def test_many_concurrent_calls_on_few_connections(serve):
+    async def body(server, path):
+        client = SidecarClient(path, pool_size=2)
+        try:
+            users = await asyncio.gather(*(client.get_user(i % 12) for i in range(200)))
+            return users, server.connections, server.loader.batches
+        finally:
+            await client.close()
+
+    users, connections, batches = serve(body)
+    assert [u and u.id for u in users] == [
+        i % 12 if i % 12 < 10 else None for i in range(200)
+    ]
+    assert connections == 2
+    assert batches < 200
+
+
+def test_pipelined_frames_are_all_answered_after_eof(serve):
+    async def body(server, path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        ids = [7, 1, 99, 3, 0]
+        writer.write(
+            b"".join(
+                _frame(100 + n, sidecar.GET_USER, struct.pack(">q", user_id))
+                for n, user_id in enumerate(ids)
+            )
+        )
+        writer.write_eof()
+        frames = await _read_frames(reader)
+        writer.close()
+        return ids, frames
+
+    ids, frames = serve(body)
+    assert sorted(frames) == [100, 101, 102, 103, 104]
+    for n, user_id in enumerate(ids):
+        status, payload = frames[100 + n]
+        assert status == sidecar.OK
+        user, _ = sidecar._read_user(payload, 0)
+        assert (user and user.id) == (user_id if user_id < 10 else None)
+
+
+def test_bad_requests_get_error_replies(serve):
+    async def body(server, path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(_frame(1, 42, b""))
+        writer.write(_frame(2, sidecar.GET_USER, b"\x00\x01"))
+        writer.write(_frame(3, sidecar.GET_USERS, struct.pack(">I", 3)))
+        writer.write(_frame(4, sidecar.GET_USER, struct.pack(">q", 2)))
+        writer.write_eof()
+        frames = await _read_frames(reader)
+        writer.close()
+        return frames
+
+    frames = serve(body)
+    assert [frames[i][0] for i in (1, 2, 3)] == [sidecar.ERROR] * 3
+    assert b"unknown opcode 42" in frames[1][1]
+    assert frames[4][0] == sidecar.OK
+
+
+def test_client_raises_sidecar_error(serve):
+    async def body(server, path):
+        client = SidecarClient(path, pool_size=1)
+        try:
+            with pytest.raises(SidecarError):
+                await client._request(42, b"")
+            return await client.get_user(1)
+        finally:
+            await client.close()
+
+    assert serve(body).name == "user1"
@@ -0,0 +1,12 @@
+from conftest import make_users
+from snapshot import SnapshotStore, write_snapshot
+
+
+def test_snapshot_lookups_with_non_integer_ids(tmp_path):
+    path = str(tmp_path / "users.snap")
+    write_snapshot(path, make_users(10))
+    store = SnapshotStore(path)
+    assert store.get(3).name == "user3"
+    assert store.get("3") is None
+    assert store.get(None) is None
+    assert store.get_many([1, "x", 2]) == [store.get(1), None, store.get(2)]
@@ -0,0 +1,61 @@
+import math
+import random
+
+import pytest
+
+from timing_wheel import TimingWheel
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_brute_force_model(seed):
+    rng = random.Random(seed)
+    slots, levels = rng.choice([4, 8, 64]), rng.choice([2, 3])
+    wheel = TimingWheel(slots=slots, levels=levels)
+    span = slots**levels
+    due = {}
+    now = 0.0
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.5:
+            key = rng.randrange(40)
+            horizon = rng.choice([10, span // 3, span, 5 * span])
+            deadline = now + rng.uniform(0, horizon)
+            wheel.schedule(key, deadline)
+            due[key] = max(math.ceil(deadline), math.floor(now) + 1)
+        elif action < 0.6:
+            key = rng.randrange(40)
+            assert wheel.cancel(key) == (key in due)
+            due.pop(key, None)
+        else:
+            now += rng.choice([0.4, 1, 3, slots, span // 3, 2 * span])
+            expected = sorted(k for k, d in due.items() if d <= math.floor(now))
+            assert sorted(wheel.advance(now)) == expected
+            for key in expected:
+                del due[key]
+        assert len(wheel) == len(due)
+        assert all(key in wheel for key in due)
+
+
+def test_reschedule_replaces_the_timer():
+    wheel = TimingWheel()
+    wheel.schedule("a", 10)
+    wheel.schedule("a", 100)
+    assert wheel.advance(50) == []
+    assert wheel.advance(100) == ["a"]
+    assert len(wheel) == 0
+
+
+def test_deadline_in_the_past_fires_on_the_next_tick():
+    wheel = TimingWheel(start=100)
+    wheel.schedule("a", 5)
+    assert wheel.advance(100.5) == []
+    assert wheel.advance(101) == ["a"]
+
+
+def test_idle_advance_skips_empty_ticks():
+    # Stepping tick by tick, this would be 10**12 iterations.
+    wheel = TimingWheel()
+    assert wheel.advance(10**12) == []
+    wheel.schedule("late", 10**12 + 10**9)
+    assert wheel.advance(10**12 + 10**9 - 1) == []
+    assert wheel.advance(10**12 + 10**9) == ["late"]
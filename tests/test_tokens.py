@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import hmac
+
+import pytest
+
+import tokens
+from tokens import TokenKeyring
+
+KEY = b"k" * 32
+
+
+def _forge(kid, key, payload_bytes):
+    payload = base64.urlsafe_b64encode(payload_bytes).rstrip(b"=").decode()
+    signed = f"{kid}.{payload}"
+    mac = hmac.new(key, signed.encode(), hashlib.sha256).digest()
+    return f"{signed}.{base64.urlsafe_b64encode(mac).rstrip(b'=').decode()}"
+
+
+def _tamper(text, index):
+    return text[:index] + ("A" if text[index] != "A" else "B") + text[index + 1 :]
+
+
+def test_round_trip():
+    ring = TokenKeyring(KEY)
+    assert ring.verify(ring.issue(42)) == 42
+    assert ring.verify(ring.issue(-7)) == -7
+
+
+def test_tampered_payload_or_signature_is_rejected():
+    ring = TokenKeyring(KEY)
+    token = ring.issue(42)
+    kid, payload, signature = token.split(".")
+    for index in range(len(payload)):
+        assert ring.verify(f"{kid}.{_tamper(payload, index)}.{signature}") is None
+    for index in range(len(signature)):
+        assert ring.verify(f"{kid}.{payload}.{_tamper(signature, index)}") is None
+    assert ring.verify(f"{kid}.{ring.issue(43).split('.')[1]}.{signature}") is None
+
+
+def test_token_signed_with_another_key_is_rejected():
+    token = TokenKeyring(b"other" * 8).issue(42)
+    assert TokenKeyring(KEY).verify(token) is None
+
+
+def test_expired_tokens_are_rejected(monkeypatch):
+    ring = TokenKeyring(KEY)
+    now = 1_700_000_000.0
+    monkeypatch.setattr(tokens.time, "time", lambda: now)
+    token = ring.issue(42, ttl=60)
+    assert ring.verify(token) == 42
+    now += 59.5
+    assert ring.verify(token) == 42
+    now += 0.5
+    assert ring.verify(token) is None
+    assert ring.verify(ring.issue(42, ttl=-1)) is None
+
+
+def test_rotation_with_add_and_retire():
+    ring = TokenKeyring(KEY, kid="old")
+    old = ring.issue(1)
+    ring.add("new", b"n" * 32)
+    new = ring.issue(2)
+    assert new.startswith("new.") and ring.active_kid == "new"
+    assert ring.verify(old) == 1 and ring.verify(new) == 2
+    ring.retire("old")
+    assert ring.verify(old) is None
+    assert ring.verify(new) == 2
+    with pytest.raises(ValueError):
+        ring.retire("new")
+    with pytest.raises(KeyError):
+        ring.retire("old")
+
+
+def test_inactive_keys_verify_but_do_not_sign():
+    ring = TokenKeyring(KEY, kid="a")
+    ring.add("b", b"b" * 32, active=False)
+    assert ring.issue(1).startswith("a.")
+    assert ring.verify(_forge("b", b"b" * 32, tokens._PAYLOAD.pack(5, 2**40))) == 5
+    with pytest.raises(ValueError):
+        ring.add("c.d", b"c" * 32)
+
+
+def test_unknown_kid_is_rejected():
+    ring = TokenKeyring(KEY, kid="a")
+    assert ring.verify(_forge("zz", KEY, tokens._PAYLOAD.pack(5, 2**40))) is None
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "0",
+        "0.abc",
+        "0.a.b.c",
+        "...",
+        "0..",
+        "0.!!!.???",
+        "0.é.x",
+        "é.abc.def",
+        "0.\x00.\x00",
+        "0." + "A" * 10_000 + ".x",
+    ],
+)
+def test_malformed_tokens_are_rejected(token):
+    assert TokenKeyring(KEY).verify(token) is None
+
+
+def test_non_ascii_signature_is_rejected():
+    ring = TokenKeyring(KEY)
+    kid, payload, _ = ring.issue(42).split(".")
+    assert ring.verify(f"{kid}.{payload}.é") is None
+
+
+@pytest.mark.parametrize("payload", [b"", b"short", b"x" * 17, b"x" * 32])
+def test_validly_signed_payload_of_the_wrong_size_is_rejected(payload):
+    assert TokenKeyring(KEY).verify(_forge("0", KEY, payload)) is None
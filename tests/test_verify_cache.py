@@ -0,0 +1,97 @@
+import pytest
+
+import auth
+from conftest import PASSWORD
+from verify_cache import VerifyCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_only_within_the_ttl():
+    clock = Clock()
+    cache = VerifyCache(ttl=10, clock=clock)
+    cache.add("ann", "pw", "h1")
+    clock.now = 9.9
+    assert cache.check("ann", "pw", "h1")
+    clock.now = 10
+    assert not cache.check("ann", "pw", "h1")
+    assert len(cache) == 0 and cache._keys_by_user == {}
+
+
+def test_only_the_verified_password_hits():
+    cache = VerifyCache()
+    cache.add("ann", "pw", "h1")
+    assert not cache.check("ann", "other", "h1")
+    assert not cache.check("bob", "pw", "h1")
+    assert cache.check("ann", "pw", "h1")
+
+
+def test_no_hit_once_the_stored_hash_changes():
+    cache = VerifyCache()
+    cache.add("ann", "pw", "h1")
+    assert not cache.check("ann", "pw", "h2")
+    assert len(cache) == 0
+    assert not cache.check("ann", "pw", "h1")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerifyCache(max_size=2)
+    cache.add("a", "pw", "h")
+    cache.add("b", "pw", "h")
+    assert cache.check("a", "pw", "h")
+    cache.add("c", "pw", "h")
+    assert not cache.check("b", "pw", "h")
+    assert cache.check("a", "pw", "h") and cache.check("c", "pw", "h")
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "size": 2}
+    assert set(cache._keys_by_user) == {"a", "c"}
+
+
+def test_invalidate_drops_every_entry_for_the_user():
+    cache = VerifyCache()
+    cache.add("ann", "pw1", "h")
+    cache.add("ann", "pw2", "h")
+    cache.add("bob", "pw1", "h")
+    cache.invalidate("ann")
+    cache.invalidate("nobody")
+    assert len(cache) == 1
+    assert cache.check("bob", "pw1", "h") and not cache.check("ann", "pw1", "h")
+
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        VerifyCache(max_size=0)
+
+
+@pytest.fixture
+def cache(store, monkeypatch):
+    cache = VerifyCache()
+    monkeypatch.setattr(auth, "_verify_cache", cache)
+    return cache
+
+
+def test_repeat_logins_hit_the_cache(cache):
+    assert auth.authenticate("user1", PASSWORD)
+    assert auth.authenticate("user1", PASSWORD)
+    assert not auth.authenticate("user1", "wrong")
+    assert cache.stats()["hits"] == 1 and len(cache) == 1
+
+
+def test_set_password_invalidates_the_user(cache):
+    assert auth.authenticate("user1", PASSWORD)
+    assert len(cache) == 1
+    auth.set_password(1, "new password")
+    assert len(cache) == 0
+    assert not auth.authenticate("user1", PASSWORD)
+
+
+def test_hash_changed_behind_the_cache_is_not_served(cache, store, hasher):
+    assert auth.authenticate("user1", PASSWORD)
+    store.set_password_hash(1, hasher.hash("new password"))
+    assert not auth.authenticate("user1", PASSWORD)
+    assert auth.authenticate("user1", "new password")
@@ -0,0 +1,94 @@
+"""Token-bucket throttling checked before any password hashing."""
+
+import threading
+import time
+
+
+class ThrottledError(RuntimeError):
+    """Raised when a login attempt is over its rate limit."""
+
+
+class TokenBuckets:
+    """Token buckets for an unbounded key space in bounded memory.
+
+    Each bucket refills at ``rate`` tokens per second up to ``burst``. A
+    bucket is kept as a single float, the time it will next be full (the
+    GCRA form of a token bucket), so refill happens lazily when the key is
+    next checked. Keys are spread over ``shards`` dicts with a lock each.
+    A full bucket is the same as no bucket, so when a shard outgrows its
+    share of ``max_keys`` the full ones are dropped; if that is not
+    enough, the oldest keys go.
+    """
+
+    def __init__(
+        self, rate, burst, *, shards=64, max_keys=1_000_000, clock=time.monotonic
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self.rate = rate
+        self.burst = burst
+        self._interval = 1.0 / rate
+        self._window = burst * self._interval
+        self._clock = clock
+        self._mask = shards - 1
+        self._shard_limit = max(1, max_keys // shards)
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def __len__(self):
+        return sum(map(len, self._shards))
+
+    def allow(self, key, cost=1):
+        """Take ``cost`` tokens from ``key``'s bucket; False if it has too few."""
+        index = hash(key) & self._mask
+        shard = self._shards[index]
+        now = self._clock()
+        with self._locks[index]:
+            full_at = max(shard.get(key, now), now) + cost * self._interval
+            if full_at - now > self._window:
+                return False
+            shard[key] = full_at
+            if len(shard) > self._shard_limit:
+                self._evict(shard, now)
+            return True
+
+    def reset(self, key):
+        """Refill ``key``'s bucket, e.g. after a successful login."""
+        index = hash(key) & self._mask
+        with self._locks[index]:
+            self._shards[index].pop(key, None)
+
+    def _evict(self, shard, now):
+        for key in [key for key, full_at in shard.items() if full_at <= now]:
+            del shard[key]
+        excess = len(shard) - self._shard_limit * 9 // 10
+        if excess > 0:
+            for key in list(shard)[:excess]:
+                del shard[key]
+
+
+class Throttle:
+    """Per-account and per-source login limits.
+
+    ``per_user`` and ``per_source`` are ``(rate, burst)`` pairs; either may
+    be None to skip that dimension. The source is whatever key the caller
+    trusts to identify the client, typically its IP address.
+    """
+
+    def __init__(self, per_user=(0.2, 10), per_source=(2.0, 50), **options):
+        self.users = per_user and TokenBuckets(*per_user, **options)
+        self.sources = per_source and TokenBuckets(*per_source, **options)
+        self.rejections = 0
+
+    def allow(self, username, source=None):
+        """Return False if either the account or the source is over its limit."""
+        if source is not None and self.sources is not None:
+            if not self.sources.allow(source):
+                self.rejections += 1
+                return False
+        if self.users is not None and not self.users.allow(username):
+            self.rejections += 1
+            return False
+        return True
@@ -0,0 +1,91 @@
+"""Stateless HMAC-signed session tokens."""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import struct
+import threading
+import time
+
+_PAYLOAD = struct.Struct(">qQ")
+
+
+class TokenKeyring:
+    """Signing keys for session tokens, addressed by key id.
+
+    A token is ``<kid>.<payload>.<signature>``: the payload is the user id
+    and expiry (Unix seconds), the signature is HMAC-SHA256 over the first
+    two fields, both base64url without padding. New tokens are signed with
+    the active key; any key still in the ring verifies. To rotate, ``add``
+    a new key as active and ``retire`` the old id once its tokens have
+    expired.
+
+    Each key is kept as a ready-keyed HMAC object that verification copies,
+    so the key schedule is not recomputed per token.
+    """
+
+    def __init__(self, key=None, kid="0"):
+        self._macs = {}
+        self._lock = threading.Lock()
+        self.active_kid = None
+        self.add(kid, key or secrets.token_bytes(32))
+
+    def add(self, kid, key, *, active=True):
+        """Add ``key`` under ``kid``, making it the signing key if ``active``."""
+        if "." in kid:
+            raise ValueError("kid must not contain '.'")
+        with self._lock:
+            macs = dict(self._macs)
+            macs[kid] = hmac.new(key, digestmod=hashlib.sha256)
+            self._macs = macs
+            if active:
+                self.active_kid = kid
+
+    def retire(self, kid):
+        """Stop accepting tokens signed with ``kid``."""
+        with self._lock:
+            if kid == self.active_kid:
+                raise ValueError("cannot retire the active key")
+            macs = dict(self._macs)
+            del macs[kid]
+            self._macs = macs
+
+    def issue(self, user_id, ttl=3600):
+        """Return a token for ``user_id`` that expires in ``ttl`` seconds."""
+        kid = self.active_kid
+        payload = _b64encode(_PAYLOAD.pack(user_id, int(time.time() + ttl)))
+        signed = f"{kid}.{payload}"
+        return f"{signed}.{self._sign(self._macs[kid], signed)}"
+
+    def verify(self, token):
+        """Return the user id in ``token``, or None if it is invalid or expired."""
+        try:
+            kid, payload, signature = token.split(".")
+        except ValueError:
+            return None
+        mac = self._macs.get(kid)
+        if mac is None:
+            return None
+        try:
+            expected = self._sign(mac, token[: len(kid) + len(payload) + 1])
+            if not hmac.compare_digest(expected, signature):
+                return None
+            user_id, expires = _PAYLOAD.unpack(
+                base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+            )
+        except (TypeError, ValueError, struct.error):
+            return None
+        if expires <= time.time():
+            return None
+        return user_id
+
+    @staticmethod
+    def _sign(mac, signed):
+        mac = mac.copy()
+        mac.update(signed.encode("ascii"))
+        return _b64encode(mac.digest())
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
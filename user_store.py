@@ -0,0 +1,302 @@
+"""In-memory user store indexed by id, name and email."""
+
+import bisect
+import math
+import threading
+import unicodedata
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from passwords import spec_of
+
+_FIELDS = ("id", "name", "email")
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class User(Mapping):
+    """Immutable user record that also reads as a ``{"id", "name", "email"}``
+    mapping, for callers written against the old dict records.
+
+    With ``__slots__`` and no per-instance dict, a record costs a fixed
+    56 bytes plus its strings, against roughly 180 for a three-key dict.
+    """
+
+    id: int
+    name: str
+    email: str
+
+    @classmethod
+    def from_mapping(cls, user):
+        """Build a User from any mapping with id, name and email keys."""
+        if isinstance(user, cls):
+            return user
+        return cls(user["id"], user["name"], user["email"])
+
+    def __getitem__(self, key):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(_FIELDS)
+
+    def __len__(self):
+        return len(_FIELDS)
+
+    def as_dict(self):
+        """Return the record as a new plain dict."""
+        return {"id": self.id, "name": self.name, "email": self.email}
+
+
+class UserStore:
+    """Snapshot of user records with secondary indexes by name and email.
+
+    The store is built once and frozen by default. Records are immutable
+    ``User`` objects, so lookups hand out the shared record instead of
+    copying it. Pass ``frozen=False`` to allow ``add`` and ``remove``;
+    readers never lock, writers serialise on an internal lock. A write
+    checks every key before touching any index, so a rejected insert
+    leaves all three indexes as they were.
+
+    The email index is keyed by ``normalize_email``, so lookups and the
+    uniqueness check ignore case and Unicode compatibility differences.
+
+    This is the in-memory ``backends.UserBackend``.
+
+    Password hashes live beside the records rather than in them, so they
+    never leak through lookups and can rotate while the store is frozen.
+    """
+
+    __slots__ = (
+        "_by_id",
+        "_by_name",
+        "_by_email",
+        "_passwords",
+        "_specs",
+        "_id_index",
+        "_dead_ids",
+        "_frozen",
+        "_lock",
+    )
+
+    def __init__(self, users=(), *, frozen=True):
+        self._by_id = {}
+        self._by_name = {}
+        self._by_email = {}
+        self._passwords = {}
+        self._specs = Counter()
+        self._id_index = None
+        self._dead_ids = 0
+        self._lock = threading.Lock()
+        self._frozen = False
+        self.add_many(users)
+        self._frozen = frozen
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, user_id):
+        return user_id in self._by_id
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def freeze(self):
+        """Make the store read-only."""
+        self._frozen = True
+
+    def get(self, user_id):
+        """Return the user with ``user_id``, or None."""
+        return self._by_id.get(user_id)
+
+    def get_many(self, user_ids, missing="none"):
+        """Return the users for ``user_ids`` in input order, in one pass.
+
+        ``missing`` picks what happens to unknown ids: ``"none"`` leaves a
+        None in their place, ``"skip"`` drops them and ``"raise"`` raises
+        KeyError for the first one.
+        """
+        return resolve_many(self._by_id, user_ids, missing)
+
+    def scan(self, after_id, limit):
+        """Return up to ``limit`` users with ids above ``after_id`` (None for
+        the start), in ascending id order.
+
+        The sorted id list behind this is built on first use. Writes keep it
+        current without re-sorting: new ids go into a small sorted list,
+        merged in at read time and into the main list once it passes four
+        times the square root of its length; removed ids stay as tombstones
+        that pages skip and make up from further along, until they pass
+        an eighth of the list. A short page always means the end.
+        """
+        index = self._id_index
+        if index is None:
+            with self._lock:
+                index = self._id_index
+                if index is None:
+                    index = self._id_index = (sorted(self._by_id), [])
+        base, added = index
+        i = j = 0
+        if after_id is not None:
+            i = bisect.bisect_right(base, after_id)
+            j = bisect.bisect_right(added, after_id)
+        users = []
+        while len(users) < limit and (i < len(base) or j < len(added)):
+            need = limit - len(users)
+            ids = base[i : i + need]
+            if j < len(added):
+                ids = sorted(ids + added[j : j + need])[:need]
+            i = bisect.bisect_right(base, ids[-1], i)
+            j = bisect.bisect_right(added, ids[-1], j)
+            users += [user for user in map(self._by_id.get, ids) if user is not None]
+        return users
+
+    def get_by_name(self, name):
+        """Return the user called ``name``, or None."""
+        return self._by_name.get(name)
+
+    def get_by_email(self, email):
+        """Return the user with ``email`` (compared normalised), or None."""
+        return self._by_email.get(normalize_email(email))
+
+    def add(self, user):
+        """Insert ``user``; its id, name and email must not be taken."""
+        with self._lock:
+            self._check_writable()
+            return self._insert(user)
+
+    def add_many(self, users):
+        """Insert ``users`` under one lock hold, all or none.
+
+        A mapping with a ``password_hash`` key has that hash stored too.
+        """
+        with self._lock:
+            self._check_writable()
+            inserted = []
+            try:
+                for user in users:
+                    inserted.append(self._insert(user))
+                    if not isinstance(user, User) and user.get("password_hash"):
+                        self._store_hash(inserted[-1].id, user["password_hash"])
+            except BaseException:
+                for record in inserted:
+                    self._unindex(record)
+                raise
+
+    def remove(self, user_id):
+        """Delete and return the user with ``user_id``."""
+        with self._lock:
+            self._check_writable()
+            record = self._by_id[user_id]
+            self._unindex(record)
+        return record
+
+    def password_hash(self, user_id):
+        """Return the encoded password hash of ``user_id``, or None."""
+        return self._passwords.get(user_id)
+
+    def set_password_hash(self, user_id, encoded):
+        """Store ``encoded`` as the password hash of ``user_id``."""
+        with self._lock:
+            if user_id not in self._by_id:
+                raise KeyError(user_id)
+            self._store_hash(user_id, encoded)
+
+    def replace_password_hash(self, user_id, old, new):
+        """Swap the hash of ``user_id`` from ``old`` to ``new``.
+
+        Returns False, changing nothing, if the stored hash is no longer
+        ``old``.
+        """
+        with self._lock:
+            if user_id not in self._by_id or self._passwords.get(user_id) != old:
+                return False
+            self._store_hash(user_id, new)
+            return True
+
+    def hash_specs(self):
+        """Return how many stored hashes use each hasher spec."""
+        with self._lock:
+            return +self._specs
+
+    def _store_hash(self, user_id, encoded):
+        old = self._passwords.pop(user_id, None)
+        if old is not None:
+            self._specs[spec_of(old)] -= 1
+        if encoded is not None:
+            self._passwords[user_id] = encoded
+            self._specs[spec_of(encoded)] += 1
+
+    def _insert(self, user):
+        record = User.from_mapping(user)
+        user_id, name, email = record.id, record.name, normalize_email(record.email)
+        if user_id in self._by_id:
+            raise ValueError(f"duplicate user id {user_id!r}")
+        if name in self._by_name:
+            raise ValueError(f"duplicate user name {name!r}")
+        if email in self._by_email:
+            raise ValueError(f"duplicate user email {record.email!r}")
+        self._by_id[user_id] = record
+        self._by_name[name] = record
+        self._by_email[email] = record
+        if self._id_index is not None:
+            self._index_id(user_id)
+        return record
+
+    def _unindex(self, record):
+        del self._by_id[record.id]
+        del self._by_name[record.name]
+        del self._by_email[normalize_email(record.email)]
+        self._store_hash(record.id, None)
+        if self._id_index is not None:
+            self._dead_ids += 1
+            if self._dead_ids > len(self._id_index[0]) // 8:
+                base, added = self._id_index
+                live = filter(self._by_id.__contains__, base + added)
+                self._id_index = (sorted(live), [])
+                self._dead_ids = 0
+
+    def _index_id(self, user_id):
+        # Readers hold on to the lists they got, so they are replaced,
+        # never changed in place.
+        base, added = self._id_index
+        for ids in (base, added):
+            i = bisect.bisect_left(ids, user_id)
+            if i < len(ids) and ids[i] == user_id:
+                # A removed id coming back; its tombstone is live again.
+                self._dead_ids -= 1
+                return
+        added = added.copy()
+        bisect.insort(added, user_id)
+        if len(added) > 4 * max(16, math.isqrt(len(base))):
+            # Two sorted runs: timsort merges them in linear time.
+            base, added = sorted(base + added), []
+        self._id_index = (base, added)
+
+    def _check_writable(self):
+        if self._frozen:
+            raise TypeError("UserStore is frozen")
+
+
+def normalize_email(email):
+    """Return the lookup key for ``email``: NFKC-normalised and case-folded."""
+    if email.isascii():
+        # NFKC leaves ASCII alone, and casefold() of ASCII is lower().
+        return email.strip().lower()
+    return unicodedata.normalize("NFKC", email).strip().casefold()
+
+
+def resolve_many(records, user_ids, missing="none"):
+    """Look ``user_ids`` up in the ``records`` mapping, applying ``missing``."""
+    if missing == "none":
+        return list(map(records.get, user_ids))
+    if missing == "skip":
+        return [user for user in map(records.get, user_ids) if user is not None]
+    if missing == "raise":
+        return list(map(records.__getitem__, user_ids))
+    raise ValueError(f"unknown missing-id policy {missing!r}")
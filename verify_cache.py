@@ -0,0 +1,98 @@
+"""Cache of recently verified credentials, so repeats skip the KDF."""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifyCache:
+    """LRU cache of successful verifications with a TTL.
+
+    Entries are keyed by an HMAC of username and password under a secret
+    drawn at start-up, so neither the password nor an offline-crackable
+    hash of it is ever held. Each entry also remembers the stored hash it
+    was checked against and only hits while that hash is current, so a
+    password change invalidates it even without calling ``invalidate``.
+    """
+
+    def __init__(self, max_size=10_000, ttl=60.0, *, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def check(self, username, password, encoded):
+        """Return True if this login was verified against ``encoded`` recently."""
+        key = self._key(username, password)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == encoded and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return False
+
+    def add(self, username, password, encoded):
+        """Record that ``password`` verified against ``encoded`` for ``username``."""
+        key = self._key(username, password)
+        expires = self._clock() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (expires, encoded, username)
+            self._keys_by_user.setdefault(username, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, username):
+        """Forget every cached verification for ``username``."""
+        with self._lock:
+            for key in self._keys_by_user.pop(username, ()):
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        """Return the hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+    def _key(self, username, password):
+        user = username.encode("utf-8")
+        secret = password if isinstance(password, bytes) else password.encode("utf-8")
+        message = len(user).to_bytes(4, "big") + user + secret
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def _drop(self, key):
+        username = self._entries.pop(key)[2]
+        keys = self._keys_by_user[username]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[username]